@@ -1,4 +1,5 @@
 """
 Configuration module.
 """
-from .database import Base, SessionLocal, engine
+from .database import (Base, SessionLocal, engine, get_async_db,
+                       get_async_sessionmaker, get_db)
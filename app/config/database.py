@@ -6,6 +6,7 @@ from pathlib import Path
 
 import dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 # Load environment variables from .env file
@@ -15,12 +16,100 @@ dotenv_file = os.path.join(BASE_DIR, ".env")
 if os.path.isfile(dotenv_file):
     dotenv.load_dotenv(dotenv_file)
 
+
+def env_flag(name, default="false"):
+    """
+    Read a boolean environment variable.
+    """
+    return os.environ.get(name, default).lower() in ["1", "true", "yes"]
+
+
 # Engine connection string
-engine = create_engine(
+DATABASE_URL = os.environ.get(
+    "DATABASE_URL",
     f'postgresql://{os.environ.get("DATABASE_USER")}:{os.environ.get("DATABASE_PASSWORD")}@{os.environ.get("DATABASE_HOST")}/{os.environ.get("DATABASE_NAME")}',
-    echo=True,
 )
+DATABASE_ECHO = env_flag("DATABASE_ECHO")
+
+# Connection pool settings
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 10))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", 20))
+DATABASE_POOL_TIMEOUT = int(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", 1800))
+DATABASE_POOL_PRE_PING = env_flag("DATABASE_POOL_PRE_PING", "true")
+
+# Optional async engine, e.g. postgresql+asyncpg:// or sqlite+aiosqlite://
+DATABASE_ASYNC = env_flag("DATABASE_ASYNC")
+ASYNC_DATABASE_URL = os.environ.get(
+    "ASYNC_DATABASE_URL", DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
+)
+
+
+def engine_options(url):
+    """
+    Engine keyword arguments for a connection string.
+
+    SQLite, used as a local stand-in, has no connection pool to tune and is
+    shared between the request threads.
+    """
+    options = {"echo": DATABASE_ECHO}
+
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        return options
+
+    options.update(
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_timeout=DATABASE_POOL_TIMEOUT,
+        pool_recycle=DATABASE_POOL_RECYCLE,
+        pool_pre_ping=DATABASE_POOL_PRE_PING,
+    )
+    return options
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Create a configured "Session" class
 Base = declarative_base()
 SessionLocal = sessionmaker(bind=engine)
+
+async_engine = None
+AsyncSessionLocal = None
+
+
+def get_db():
+    """
+    Provide a database session for the duration of a request.
+    """
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def get_async_sessionmaker():
+    """
+    Return the async session factory, creating the async engine on first use.
+    """
+    global async_engine, AsyncSessionLocal
+
+    # created on first use so the sync path does not need an async driver
+    if AsyncSessionLocal is None:
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL)
+        )
+        AsyncSessionLocal = sessionmaker(
+            bind=async_engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    return AsyncSessionLocal
+
+
+async def get_async_db():
+    """
+    Provide an async database session for the duration of a request.
+    """
+    async with get_async_sessionmaker()() as session:
+        yield session
@@ -1,9 +1,12 @@
 """
 Poly data model.
 """
-from sqlalchemy import Column, Float, Integer, String, Text
+import time
+
+from sqlalchemy import Column, Float, Index, Integer, LargeBinary, String, Text
 
 from app.config import Base
+from app.utils.vertex_encoding import encode_vertices_base64
 
 
 class Poly(Base):
@@ -12,16 +15,53 @@ class Poly(Base):
     """
 
     __tablename__ = "poly"
+    __table_args__ = (
+        # keyset pagination filtered by algorithm
+        Index("ix_poly_algorithm_id", "algorithm", "id"),
+        # name prefix filtering with LIKE 'prefix%'
+        Index(
+            "ix_poly_name_pattern",
+            "name",
+            postgresql_ops={"name": "varchar_pattern_ops"},
+        ),
+        # area range filtering
+        Index("ix_poly_area", "area"),
+        # rows written since the last spatial index sync
+        Index("ix_poly_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False, unique=True)
+    # JSON text of fractional vertices, or of the regions of a composite
     npinput = Column(Text, nullable=True)
+    # int32 row, column pairs, see app.utils.vertex_encoding
+    npvertices = Column(LargeBinary, nullable=True)
     xsize = Column(Integer, nullable=True)
     ysize = Column(Integer, nullable=True)
+    xoffset = Column(Integer, nullable=True)
+    yoffset = Column(Integer, nullable=True)
     imagefile = Column(String(255), nullable=True)
     arrayfile = Column(String(255), nullable=True)
+    fileformat = Column(String(16), nullable=True, default="npy")
     exectime = Column(Float, nullable=True)
     algorithm = Column(String(255), nullable=False, unique=False)
+    # engine that filled the mask, auto resolves to one of the others
+    engine = Column(String(16), nullable=True)
+    predictedtime = Column(Float, nullable=True)
+    # analytic statistics of the vertices, see app.services.polygon_stats
+    area = Column(Float, nullable=True)
+    perimeter = Column(Float, nullable=True)
+    xcentroid = Column(Float, nullable=True)
+    ycentroid = Column(Float, nullable=True)
+    # epoch seconds of the last insert or update
+    updated_at = Column(Float, nullable=True, default=time.time, onupdate=time.time)
+
+    @property
+    def npbinary(self):
+        """
+        Base64 text of the stored vertices.
+        """
+        return encode_vertices_base64(self.npvertices)
 
     def __repr__(self):
         """
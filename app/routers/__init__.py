@@ -1,5 +1,8 @@
 """
 Endpoints module.
 """
-from .poly_router import db
+from .composite_router import router as composite_router
+from .metrics_router import router as metrics_router
+from .poly_async_router import router as poly_async_router
 from .poly_router import router as poly_router
+from .set_operation_router import router as set_operation_router
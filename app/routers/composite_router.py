@@ -0,0 +1,95 @@
+"""
+Endpoints for labelled composites of many regions.
+"""
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from app.config import get_db
+from app.models import Poly
+from app.routers.poly_items import (check_poly_name, describe_poly_item,
+                                    poly_canvas, record_poly_stages)
+from app.serializers import CompositeSerializer
+from app.services.composite_fill import OVERLAP_POLICIES
+from app.services.job_service import process_composite
+from app.services.metrics_service import StageTimer
+from app.utils.vertex_encoding import decode_vertices_list
+
+# Create a new router
+router = APIRouter()
+
+
+@router.post("/polys/composite", status_code=status.HTTP_201_CREATED)
+def create_poly_composite(
+    composite: CompositeSerializer, db: Session = Depends(get_db)
+):
+    """
+    Create a labelled raster of many regions as a single poly item.
+
+    All the regions are filled in one scanline pass into a uint16 label
+    raster, stored as one npy file. Holes are cut out with the even-odd rule.
+
+    params CompositeSerializer composite: the labelled regions to fill.
+    return dict: The created poly item.
+    """
+    timer = StageTimer()
+    overlap = composite.overlap or "last"
+
+    with timer.span("validate"):
+        check_poly_name(db, composite.name)
+        poly_canvas(composite)
+        if overlap not in OVERLAP_POLICIES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid overlap policy. Pick one of: {', '.join(OVERLAP_POLICIES)}",
+            )
+
+    try:
+        with timer.span("parse"):
+            regions = [
+                (
+                    region.label,
+                    [
+                        decode_vertices_list(ring)
+                        for ring in [region.vertices, *(region.holes or [])]
+                    ],
+                )
+                for region in composite.regions
+            ]
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid input array. {error}",
+        )
+
+    result = process_composite(regions, overlap, poly_canvas(composite))
+
+    new_poly = Poly(
+        name=composite.name,
+        npinput=json.dumps([region.dict() for region in composite.regions]),
+        xsize=result["shape"][0],
+        ysize=result["shape"][1],
+        xoffset=result["offset"][0],
+        yoffset=result["offset"][1],
+        imagefile=result["file"],
+        arrayfile=result["plot"],
+        fileformat="npy",
+        exectime=result["exectime"],
+        algorithm="composite",
+    )
+    with timer.span("db_commit"):
+        db.add(new_poly)
+        db.commit()
+
+    return JSONResponse(
+        {
+            "message": "Poly item created successfully.",
+            **describe_poly_item(new_poly, result),
+            "regions": len(regions),
+            "overlap": overlap,
+            "stages": record_poly_stages("composite", timer, result),
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
@@ -0,0 +1,23 @@
+"""
+Endpoints for the service metrics.
+"""
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics_service import stage_metrics
+
+# Create a new router
+router = APIRouter()
+
+# media type of the Prometheus text exposition format
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", status_code=status.HTTP_200_OK)
+def get_metrics():
+    """
+    Retrieve the stage duration histograms in the Prometheus text format.
+
+    return PlainTextResponse: The histograms by algorithm and stage.
+    """
+    return PlainTextResponse(stage_metrics.render(), media_type=METRICS_MEDIA_TYPE)
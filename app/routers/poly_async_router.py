@@ -0,0 +1,97 @@
+"""
+Async database endpoints for the poly API.
+
+Served instead of their sync counterparts when DATABASE_ASYNC is set, so
+reads do not hold a threadpool worker while waiting on the database.
+"""
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_async_db
+from app.models import Poly
+from app.serializers import PolySerializer
+from app.services.fill_cache import fill_cache
+from app.services.query_service import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                                        poly_list_statement)
+
+# Create a new router
+router = APIRouter()
+
+
+@router.get(
+    "/polys",
+    response_model=List[PolySerializer],
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_200_OK,
+)
+async def get_all_polys(
+    response: Response,
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+    algorithm: Optional[str] = Query(None),
+    name_prefix: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    min_area: Optional[float] = Query(None),
+    max_area: Optional[float] = Query(None),
+    min_perimeter: Optional[float] = Query(None),
+    max_perimeter: Optional[float] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve a page of poly items.
+
+    Same parameters and X-Next-After-Id header as the sync listing.
+    """
+    try:
+        statement = poly_list_statement(
+            after_id,
+            limit,
+            algorithm,
+            name_prefix,
+            fields,
+            min_area,
+            max_area,
+            min_perimeter,
+            max_perimeter,
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+    polys = [dict(row._mapping) for row in await db.execute(statement)]
+    if len(polys) == limit:
+        response.headers["X-Next-After-Id"] = str(polys[-1]["id"])
+
+    return polys
+
+
+# declared ahead of /polys/{poly_id}, which would otherwise match it when this
+# router is included before the sync one
+@router.get("/polys/cache", status_code=status.HTTP_200_OK)
+async def get_fill_cache_stats():
+    """
+    Retrieve the fill cache counters.
+
+    return dict: hit, miss and eviction counters of the memory and disk tiers.
+    """
+    return fill_cache.stats()
+
+
+@router.get(
+    "/polys/{poly_id}", response_model=PolySerializer, status_code=status.HTTP_200_OK
+)
+async def get_poly_details(poly_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve details related to poly item.
+
+    param int poly_id: The id of the poly item.
+    return Poly poly: The poly item.
+    """
+    poly = await db.get(Poly, poly_id)
+
+    if poly is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Poly not found"
+        )
+    return poly
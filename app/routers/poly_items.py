@@ -0,0 +1,294 @@
+"""
+Helpers building and storing poly items, shared by the endpoints.
+"""
+import json
+from pathlib import Path
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.config import SessionLocal
+from app.models import Poly
+from app.serializers import PolySerializer
+from app.services.file_management import FILE_FORMATS
+from app.services.filling_service import (ALGORITHMS, CANVAS_SHAPE,
+                                          MAX_CANVAS_SIZE)
+from app.services.metrics_service import StageTimer, stage_metrics
+from app.services.polygon_stats import polygon_statistics
+from app.services.spatial_index import spatial_index
+from app.utils.vertex_encoding import (decode_vertices_base64,
+                                       decode_vertices_json,
+                                       decode_vertices_list, encode_vertices)
+
+
+def get_poly_mask_file(db: Session, poly_id: int):
+    """
+    Retrieve a poly item and the path of its mask file.
+
+    param Session db: The database session.
+    param int poly_id: The id of the poly item.
+    return tuple: The poly item and the path of its mask file.
+    """
+    poly = db.query(Poly).filter(Poly.id == poly_id).first()
+
+    if poly is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Poly not found"
+        )
+
+    path = Path(poly.imagefile or "")
+    if not path.is_file():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Mask file not found"
+        )
+    return poly, path
+
+
+def validate_poly(db: Session, poly: PolySerializer):
+    """
+    Validate a poly item before filling it.
+
+    params Session db: The database session.
+    params PolySerializer poly: poly item to validate.
+    return str: The storage format of the mask file.
+    """
+    check_poly_name(db, poly.name)
+
+    return validate_poly_fields(poly)
+
+
+def check_poly_name(db: Session, name: str):
+    """
+    Check no poly item is stored under a name.
+
+    params Session db: The database session.
+    params str name: name of the new poly item.
+    """
+    # check db duplicates
+    poly_check = db.query(Poly).filter(Poly.name == name).first()
+    if poly_check is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Poly with that name already exists",
+        )
+
+
+def validate_poly_fields(poly: PolySerializer):
+    """
+    Validate the fields of a poly item without touching the database.
+
+    params PolySerializer poly: poly item to validate.
+    return str: The storage format of the mask file.
+    """
+    if poly.algorithm not in ALGORITHMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid algorithm. Pick one of: {', '.join(ALGORITHMS)}",
+        )
+
+    file_format = poly.fileformat or "npy"
+    if file_format not in FILE_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid file format. Pick one of: {', '.join(FILE_FORMATS)}",
+        )
+
+    poly_canvas(poly)
+
+    return file_format
+
+
+def poly_canvas(poly):
+    """
+    Canvas shape of a poly item.
+
+    params poly: poly item with optional xsize and ysize canvas fields.
+    return tuple: The (rows, columns) shape of the canvas.
+    """
+    if poly.xsize is None and poly.ysize is None:
+        return CANVAS_SHAPE
+
+    if poly.xsize is None or poly.ysize is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send both xsize and ysize to set the canvas size",
+        )
+    if not (0 < poly.xsize <= MAX_CANVAS_SIZE and 0 < poly.ysize <= MAX_CANVAS_SIZE):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"The canvas size must be between 1 and {MAX_CANVAS_SIZE}",
+        )
+
+    return (poly.xsize, poly.ysize)
+
+
+def decode_poly_vertices(poly: PolySerializer):
+    """
+    Decode the vertices of a poly item into an array.
+
+    params PolySerializer poly: poly item with one vertex source.
+    return ndarray: The (N, 2) vertex array.
+    """
+    # check exactly one vertex source is given
+    sources = [poly.npinput, poly.vertices, poly.npbinary]
+    if sum(source is not None for source in sources) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send the vertices in one of: npinput, vertices, npbinary",
+        )
+
+    try:
+        if poly.npbinary is not None:
+            return decode_vertices_base64(poly.npbinary)
+        if poly.vertices is not None:
+            return decode_vertices_list(poly.vertices)
+        return decode_vertices_json(poly.npinput)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid input array. {error}",
+        )
+
+
+def stored_npinput(points, npvertices):
+    """
+    JSON text the vertices of a poly item are stored as.
+
+    Vertices are stored once, whole numbers as int32 bytes in npvertices
+    and only fractional vertices as JSON text.
+
+    params ndarray points: the vertices of the poly item.
+    params bytes npvertices: the encoded vertices, None when fractional.
+    return str: The JSON text, None when the vertices are stored as bytes.
+    """
+    if npvertices is not None:
+        return None
+
+    return json.dumps(points.tolist())
+
+
+def build_poly_item(poly: PolySerializer, points, file_format: str, result: dict):
+    """
+    Build the database row of a filled poly item.
+
+    params PolySerializer poly: the poly item that was filled.
+    params ndarray points: the decoded vertices of the poly item.
+    params str file_format: storage format of the mask file.
+    params dict result: the result of process_poly.
+    return Poly: The poly row, not yet added to a session.
+    """
+    statistics = polygon_statistics(points)
+    npvertices = encode_vertices(points)
+
+    return Poly(
+        name=poly.name,
+        npinput=stored_npinput(points, npvertices),
+        npvertices=npvertices,
+        xsize=result["shape"][0],
+        ysize=result["shape"][1],
+        xoffset=result["offset"][0],
+        yoffset=result["offset"][1],
+        imagefile=result["file"],
+        arrayfile=result["plot"],
+        fileformat=file_format,
+        exectime=result["exectime"],
+        algorithm=poly.algorithm,
+        engine=result["engine"],
+        predictedtime=result["predicted"],
+        area=statistics["area"],
+        perimeter=statistics["perimeter"],
+        xcentroid=statistics["centroid_row"],
+        ycentroid=statistics["centroid_column"],
+    )
+
+
+def describe_poly_item(new_poly: Poly, result: dict):
+    """
+    Describe a created poly item.
+
+    params Poly new_poly: the stored poly row.
+    params dict result: the result of process_poly.
+    return dict: The created poly item description.
+    """
+    return {
+        "id": new_poly.id,
+        "file_url": result["file"],
+        "plot_url": result["plot"],
+        "execution_speed": f"{str(result['exectime'])} seconds",
+        "offset": list(result["offset"]),
+        "shape": list(result["shape"]),
+        "algorithm": new_poly.algorithm,
+        "engine": new_poly.engine,
+        "predicted_speed": (
+            None
+            if new_poly.predictedtime is None
+            else f"{str(new_poly.predictedtime)} seconds"
+        ),
+        "file_format": new_poly.fileformat,
+        "area": new_poly.area,
+        "perimeter": new_poly.perimeter,
+        "centroid": (
+            None
+            if new_poly.xcentroid is None
+            else [new_poly.xcentroid, new_poly.ycentroid]
+        ),
+    }
+
+
+def record_poly_stages(algorithm: str, timer: StageTimer, result: dict):
+    """
+    Add the processing stages to a request timer and count them in the metrics.
+
+    params str algorithm: algorithm the poly item was filled with.
+    params StageTimer timer: stages timed while handling the request.
+    params dict result: the result of process_poly.
+    return dict: The stage durations with their total.
+    """
+    timer.merge(result["stages"])
+    stages = timer.to_dict()
+    stage_metrics.observe_stages(algorithm, stages)
+
+    return stages
+
+
+def save_poly_item(
+    session,
+    poly: PolySerializer,
+    points,
+    file_format: str,
+    result: dict,
+    timer: StageTimer,
+):
+    """
+    Store a filled poly item.
+
+    params Session session: database session to store the item with.
+    params PolySerializer poly: the poly item that was filled.
+    params ndarray points: the decoded vertices of the poly item.
+    params str file_format: storage format of the mask file.
+    params dict result: the result of process_poly.
+    params StageTimer timer: stages timed while handling the request.
+    return dict: The created poly item description.
+    """
+    new_poly = build_poly_item(poly, points, file_format, result)
+    with timer.span("db_commit"):
+        session.add(new_poly)
+        session.commit()
+    spatial_index.insert(new_poly.id, points)
+
+    stages = record_poly_stages(poly.algorithm, timer, result)
+
+    return {**describe_poly_item(new_poly, result), "stages": stages}
+
+
+def save_poly_job(
+    poly: PolySerializer, points, file_format: str, result: dict, timer: StageTimer
+):
+    """
+    Store the poly item of a finished fill job with its own session.
+    """
+    session = SessionLocal()
+    try:
+        return save_poly_item(session, poly, points, file_format, result, timer)
+    finally:
+        session.close()
@@ -1,40 +1,130 @@
 """
 Endpoints for the poly API.
 """
-import json
-from typing import List
+import time
+from pathlib import Path
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import JSONResponse
+import numpy as np
+from fastapi import (APIRouter, Body, Depends, HTTPException, Query, Request,
+                     status)
+from fastapi.responses import (FileResponse, JSONResponse, Response,
+                               StreamingResponse)
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
 
-from app.config import SessionLocal
+from app.config import get_db
 from app.models import Poly
-from app.serializers import PolySerializer
-from app.services.file_management import (save_matplot_figure,
-                                          save_nparray_to_file)
-from app.services.filling_service import fill_polyline
+from app.routers.poly_items import (build_poly_item, decode_poly_vertices,
+                                    describe_poly_item, get_poly_mask_file,
+                                    poly_canvas, record_poly_stages,
+                                    save_poly_item, save_poly_job,
+                                    stored_npinput, validate_poly,
+                                    validate_poly_fields)
+from app.serializers import (PointsSerializer, PolyEditSerializer,
+                             PolySerializer)
+from app.services.edit_service import poly_edit_lock, process_poly_edit
+from app.services.file_management import (FILE_FORMATS, MaskFileRows,
+                                          encode_npy, iter_file_range,
+                                          parse_byte_range, read_mask_window)
+from app.services.fill_cache import fill_cache
+from app.services.job_service import (get_job, process_poly, run_fill_batch,
+                                      submit_fill_job)
+from app.services.metrics_service import StageTimer
+from app.services.polygon_stats import polygon_statistics
+from app.services.preview_service import (PREVIEW_MAX_SIZE, PREVIEW_MODE,
+                                          PREVIEW_MODES, preview_path,
+                                          render_preview, save_preview_image)
+from app.services.query_service import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+                                        poly_list_statement)
+from app.services.spatial_index import (spatial_index, stored_vertices,
+                                        sync_spatial_index)
+from app.services.stream_service import MaskStream
+from app.utils.vertex_encoding import (VERTEX_MEDIA_TYPE,
+                                       decode_vertices_binary, encode_vertices)
 
 # Create a new router
 router = APIRouter()
-db = SessionLocal()
+
+# largest tile side served by the tile endpoint
+MAX_TILE_SIZE = 4096
 
 
 @router.get(
-    "/polys", response_model=List[PolySerializer], status_code=status.HTTP_200_OK
+    "/polys",
+    response_model=List[PolySerializer],
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_200_OK,
 )
-def get_all_polys():
+def get_all_polys(
+    response: Response,
+    after_id: Optional[int] = Query(None, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, gt=0, le=MAX_PAGE_SIZE),
+    algorithm: Optional[str] = Query(None),
+    name_prefix: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
+    min_area: Optional[float] = Query(None),
+    max_area: Optional[float] = Query(None),
+    min_perimeter: Optional[float] = Query(None),
+    max_perimeter: Optional[float] = Query(None),
+    db: Session = Depends(get_db),
+):
     """
-    Retrieve all poly items.
+    Retrieve a page of poly items.
+
+    The id of the last item is sent in the X-Next-After-Id header
+    when more items may follow.
+
+    param int after_id: Only list the items with a greater id.
+    param int limit: Largest number of items to list.
+    param str algorithm: Only list the items filled with this algorithm.
+    param str name_prefix: Only list the items whose name starts with it.
+    param str fields: Comma separated columns to list, npinput is only
+        listed when selected.
+    param float min_area: Only list the items with at least this area.
+    param float max_area: Only list the items with at most this area.
+    param float min_perimeter: Only list the items with at least this
+        perimeter.
+    param float max_perimeter: Only list the items with at most this
+        perimeter.
+    return List[PolySerializer]: The poly items.
     """
-    polys = db.query(Poly).all()
+    try:
+        statement = poly_list_statement(
+            after_id,
+            limit,
+            algorithm,
+            name_prefix,
+            fields,
+            min_area,
+            max_area,
+            min_perimeter,
+            max_perimeter,
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(error))
+
+    polys = [dict(row._mapping) for row in db.execute(statement)]
+    if len(polys) == limit:
+        response.headers["X-Next-After-Id"] = str(polys[-1]["id"])
 
     return polys
 
 
+@router.get("/polys/cache", status_code=status.HTTP_200_OK)
+def get_fill_cache_stats():
+    """
+    Retrieve the fill cache counters.
+
+    return dict: hit, miss and eviction counters of the memory and disk tiers.
+    """
+    return fill_cache.stats()
+
+
 @router.get(
     "/polys/{poly_id}", response_model=PolySerializer, status_code=status.HTTP_200_OK
 )
-def get_poly_details(poly_id: int):
+def get_poly_details(poly_id: int, db: Session = Depends(get_db)):
     """
     Retrieve details related to poly item.
 
@@ -50,8 +140,163 @@ def get_poly_details(poly_id: int):
     return poly
 
 
+@router.post("/polys/contains", status_code=status.HTTP_200_OK)
+def get_containing_polys(query: PointsSerializer, db: Session = Depends(get_db)):
+    """
+    Find the poly items containing each of many points.
+
+    Candidates come from the spatial index of the bounding boxes and are
+    tested exactly against the stored vertices, mask files are not read.
+    Points on an edge or a vertex are contained. Composites are not indexed.
+
+    param PointsSerializer query: the (row, column) points.
+    return dict: Sorted ids of the poly items containing every point.
+    """
+    sync_spatial_index(db)
+
+    points = np.asarray(query.points, dtype=np.float64)
+    matches = spatial_index.query(points[:, 0], points[:, 1])
+
+    # drop the items deleted by other processes
+    ids = {poly_id for poly_ids in matches for poly_id in poly_ids}
+    existing = set()
+    if ids:
+        existing = {
+            poly_id for (poly_id,) in db.query(Poly.id).filter(Poly.id.in_(ids))
+        }
+    for poly_id in ids - existing:
+        spatial_index.remove(poly_id)
+
+    return {
+        "matches": [
+            [poly_id for poly_id in poly_ids if poly_id in existing]
+            for poly_ids in matches
+        ]
+    }
+
+
+@router.get("/polys/{poly_id}/mask", status_code=status.HTTP_200_OK)
+def get_poly_mask(poly_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Download the stored mask file of a poly item.
+
+    A single byte range can be requested with the Range header.
+
+    param int poly_id: The id of the poly item.
+    param Request request: the incoming request.
+    return StreamingResponse: The mask file or the requested range of it.
+    """
+    poly, path = get_poly_mask_file(db, poly_id)
+    size = path.stat().st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="{poly.name}{path.suffix}"',
+    }
+
+    byte_range = None
+    if "range" in request.headers:
+        try:
+            byte_range = parse_byte_range(request.headers["range"], size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+    status_code = status.HTTP_200_OK
+    first, last = 0, size - 1
+    if byte_range is not None:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        first, last = byte_range
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+    headers["Content-Length"] = str(last - first + 1)
+
+    return StreamingResponse(
+        iter_file_range(path, first, last),
+        status_code=status_code,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+@router.get("/polys/{poly_id}/mask/tile", status_code=status.HTTP_200_OK)
+def get_poly_mask_tile(
+    poly_id: int,
+    row: int = Query(0, ge=0),
+    col: int = Query(0, ge=0),
+    size: int = Query(256, gt=0, le=MAX_TILE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve a square window of the canvas of a poly item as a .npy file.
+
+    Only the window is read from the stored mask file.
+
+    param int poly_id: The id of the poly item.
+    param int row: First canvas row of the window.
+    param int col: First canvas column of the window.
+    param int size: Number of rows and columns of the window.
+    return Response: The window serialized as a .npy file.
+    """
+    poly, path = get_poly_mask_file(db, poly_id)
+    window = read_mask_window(
+        path, row, col, size, size, (poly.xoffset or 0, poly.yoffset or 0)
+    )
+
+    return Response(
+        encode_npy(window),
+        media_type="application/octet-stream",
+        headers={"X-Tile-Row": str(row), "X-Tile-Col": str(col)},
+    )
+
+
+@router.get("/polys/{poly_id}/preview", status_code=status.HTTP_200_OK)
+def get_poly_preview(
+    poly_id: int,
+    max_size: Optional[int] = Query(None, gt=0, le=MAX_TILE_SIZE),
+    mode: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve the PNG preview of a poly item.
+
+    The default preview is rendered on first request and stored, previews
+    with a custom size or mode are rendered on every request.
+
+    param int poly_id: The id of the poly item.
+    param int max_size: Largest width or height of the image.
+    param str mode: Downsampling mode, max or mean.
+    return Response: The PNG image.
+    """
+    poly, path = get_poly_mask_file(db, poly_id)
+
+    if mode is not None and mode not in PREVIEW_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid preview mode. Pick one of: {', '.join(PREVIEW_MODES)}",
+        )
+
+    if max_size is not None or mode is not None:
+        image = render_preview(
+            MaskFileRows(path),
+            max_size or PREVIEW_MAX_SIZE,
+            mode or PREVIEW_MODE,
+        )
+        return Response(image, media_type="image/png")
+
+    if not poly.arrayfile or not Path(poly.arrayfile).is_file():
+        preview = preview_path(path)
+        if not preview.is_file():
+            preview = save_preview_image(MaskFileRows(path), path)
+
+        poly.arrayfile = str(preview)
+        db.commit()
+
+    return FileResponse(poly.arrayfile, media_type="image/png")
+
+
 @router.delete("/polys/{poly_id}")
-def delete_poly(poly_id: int):
+def delete_poly(poly_id: int, db: Session = Depends(get_db)):
     """
     Delete a poly item.
     """
@@ -64,70 +309,408 @@ def delete_poly(poly_id: int):
 
     db.delete(poly_to_delete)
     db.commit()
+    spatial_index.remove(poly_id)
 
     return JSONResponse({"message": "Item deleted."}, status_code=status.HTTP_200_OK)
 
 
-@router.post("/polys", status_code=status.HTTP_201_CREATED)
-def create_poly(poly: PolySerializer):
+@router.patch("/polys/{poly_id}", status_code=status.HTTP_200_OK)
+def edit_poly(poly_id: int, edit: PolyEditSerializer, db: Session = Depends(get_db)):
     """
-    Create filled poly item.
+    Move vertices of a poly item.
 
-    params PolySerializer poly: poly item to create.
-    return PolySerializer: The created poly item.
+    Only the windows around the moved edges are filled again, straight into
+    the stored mask when the bounding box of the polygon does not change.
+    Edits of the same poly item are applied one at a time.
+
+    param int poly_id: The id of the poly item.
+    param PolyEditSerializer edit: the vertex moves.
+    return dict: The updated poly item with the refilled windows.
     """
-    # check array is valid
-    if not isinstance(poly.npinput, str):
+    timer = StageTimer()
+
+    with poly_edit_lock(poly_id):
+        poly = db.query(Poly).filter(Poly.id == poly_id).first()
+        if poly is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Poly not found"
+            )
+
+        with timer.span("validate"):
+            points = stored_vertices(poly)
+            if points is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Only poly items with stored vertices can be edited",
+                )
+
+            # other poly items of the same fill share the mask file
+            shared = (
+                db.query(Poly.id)
+                .filter(Poly.imagefile == poly.imagefile, Poly.id != poly.id)
+                .first()
+                is not None
+            )
+
+        try:
+            result = process_poly_edit(
+                points,
+                [(vertex_edit.index, vertex_edit.vertex) for vertex_edit in edit.edits],
+                poly.engine or poly.algorithm,
+                poly.fileformat or "npy",
+                poly_canvas(poly),
+                Path(poly.imagefile or ""),
+                (poly.xoffset or 0, poly.yoffset or 0),
+                shared,
+            )
+        except ValueError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid vertex edit. {error}",
+            )
+
+        new_points = result["vertices"]
+        poly.npvertices = encode_vertices(new_points)
+        poly.npinput = stored_npinput(new_points, poly.npvertices)
+        poly.xoffset, poly.yoffset = result["offset"]
+        poly.imagefile = result["file"]
+        poly.arrayfile = result["plot"]
+        poly.exectime = result["exectime"]
+        poly.engine = result["engine"]
+        poly.predictedtime = result["predicted"]
+        statistics = polygon_statistics(new_points)
+        poly.area = statistics["area"]
+        poly.perimeter = statistics["perimeter"]
+        poly.xcentroid = statistics["centroid_row"]
+        poly.ycentroid = statistics["centroid_column"]
+        with timer.span("db_commit"):
+            db.commit()
+        spatial_index.insert(poly.id, new_points)
+
+    return {
+        "message": "Poly item updated.",
+        **describe_poly_item(poly, result),
+        "windows": result["windows"],
+        "pixels": result["pixels"],
+        "stages": record_poly_stages(poly.algorithm, timer, result),
+    }
+
+
+@router.get("/polys/jobs/{job_id}", status_code=status.HTTP_200_OK)
+def get_poly_job(job_id: str):
+    """
+    Retrieve the status of a fill job.
+
+    param str job_id: The id of the job.
+    return dict: The job status and timings.
+    """
+    job = get_job(job_id)
+
+    if job is None:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Input array must be a string",
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return job.to_dict()
+
+
+@router.post("/polys/batch", status_code=status.HTTP_200_OK)
+def create_poly_batch(polys: List[PolySerializer], db: Session = Depends(get_db)):
+    """
+    Create many filled poly items at once.
+
+    Invalid items are reported without failing the rest of the batch.
+
+    params List[PolySerializer] polys: poly items to create.
+    return dict: The status and timing of every item.
+    """
+    items = [{"name": poly.name, "status": "queued"} for poly in polys]
+
+    # check db and batch duplicates with a single query
+    names = [poly.name for poly in polys]
+    existing = {
+        name for (name,) in db.query(Poly.name).filter(Poly.name.in_(names)).all()
+    }
+
+    fills = {}
+    timers = {}
+    for index, poly in enumerate(polys):
+        if poly.name in existing:
+            items[index].update(
+                status="failed", detail="Poly with that name already exists"
+            )
+            continue
+        existing.add(poly.name)
+
+        timers[index] = StageTimer()
+        try:
+            with timers[index].span("validate"):
+                file_format = validate_poly_fields(poly)
+            with timers[index].span("parse"):
+                poly_arr = decode_poly_vertices(poly)
+        except HTTPException as error:
+            items[index].update(status="failed", detail=error.detail)
+            continue
+
+        fills[index] = (
+            poly_arr,
+            poly.algorithm,
+            file_format,
+            poly_canvas(poly),
         )
 
-    # check db duplicates
-    poly_check = db.query(Poly).filter(Poly.name == poly.name).first()
-    if poly_check is not None:
+    # fill and save the masks concurrently in the worker pool
+    results = run_fill_batch(list(fills.values()))
+
+    new_polys = {}
+    for index, outcome in zip(fills, results):
+        if "error" in outcome:
+            items[index].update(status="failed", detail=outcome["error"])
+            continue
+
+        poly = polys[index]
+        new_polys[index] = (
+            build_poly_item(poly, fills[index][0], fills[index][2], outcome["result"]),
+            outcome["result"],
+        )
+
+    # insert every row in one transaction
+    commit_start = time.perf_counter()
+    db.add_all([new_poly for new_poly, _ in new_polys.values()])
+    try:
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Poly with that name already exists",
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Something went wrong storing the poly items. Please try again.",
+        )
+
+    commit_time = time.perf_counter() - commit_start
+
+    for index, (new_poly, result) in new_polys.items():
+        spatial_index.insert(new_poly.id, fills[index][0])
+
+        # every item waited for the whole transaction
+        timers[index].record("db_commit", commit_time)
+        items[index].update(
+            status="created",
+            processing_time=result["finished_at"] - result["started_at"],
+            stages=record_poly_stages(new_poly.algorithm, timers[index], result),
+            **describe_poly_item(new_poly, result),
         )
 
-    if poly.algorithm not in ["rourke", "flood", "fast"]:
+    return {
+        "created": len(new_polys),
+        "failed": len(items) - len(new_polys),
+        "items": items,
+    }
+
+
+def stream_poly_item(
+    db: Session,
+    poly: PolySerializer,
+    poly_arr,
+    file_format: str,
+    timer: StageTimer,
+):
+    """
+    Send the mask file of a poly item band by band while it is filled.
+
+    The poly item is stored once the last band was sent, the stored file
+    holds the same bytes.
+
+    params Session db: The database session.
+    params PolySerializer poly: poly item to create.
+    params ndarray poly_arr: the decoded vertices of the poly item.
+    params str file_format: storage format of the mask file, packed or rle.
+    params StageTimer timer: stages timed while handling the request.
+    return StreamingResponse: The mask file.
+    """
+    try:
+        mask_stream = MaskStream(
+            poly_arr, poly.algorithm, file_format, poly_canvas(poly)
+        )
+    except ValueError as error:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid algorithm. Pick one of: rourke, flood, fast",
+            detail=f"Invalid streamed poly item. {error}",
         )
 
-    # process array
-    poly_arr = json.loads(poly.npinput)
-    results = fill_polyline(poly_arr, poly.algorithm)
-    save_file = save_nparray_to_file(results[0], poly.name)
-    save_plot = save_matplot_figure(results[0], poly.name)
-
-    if save_file:
-        new_poly = Poly(
-            name=poly.name,
-            npinput=poly.npinput,
-            xsize=results[0].shape[0],
-            ysize=results[0].shape[1],
-            imagefile=str(save_file),
-            arrayfile=str(save_plot),
-            exectime=results[1],
-            algorithm=poly.algorithm,
-        )
-        db.add(new_poly)
-        db.commit()
+    def send_mask():
+        yield from mask_stream
+        # the response has started, a failed insert can only roll back
+        try:
+            save_poly_item(db, poly, poly_arr, file_format, mask_stream.result, timer)
+        except SQLAlchemyError:
+            db.rollback()
+
+    headers = {
+        "Content-Disposition": (
+            f'attachment; filename="{poly.name}{FILE_FORMATS[file_format]}"'
+        ),
+        "X-Fill-Engine": mask_stream.engine,
+    }
+    if mask_stream.content_length() is not None:
+        headers["Content-Length"] = str(mask_stream.content_length())
+
+    return StreamingResponse(
+        send_mask(),
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+def create_poly_item(
+    db: Session,
+    request: Request,
+    poly: PolySerializer,
+    poly_arr,
+    file_format: str,
+    run_async: bool,
+    timer: StageTimer,
+    stream: bool = False,
+):
+    """
+    Fill and store a validated poly item, or queue it as a fill job.
+
+    params Session db: The database session.
+    params Request request: the incoming request.
+    params PolySerializer poly: poly item to create.
+    params ndarray poly_arr: the decoded vertices of the poly item.
+    params str file_format: storage format of the mask file.
+    params bool run_async: queue the fill in the worker pool and return a job.
+    params StageTimer timer: stages timed while handling the request.
+    params bool stream: send the mask file band by band while it is filled.
+    return JSONResponse: The created poly item or the queued job.
+    """
+    if stream:
+        if run_async:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="A streamed poly item cannot be queued",
+            )
+        return stream_poly_item(db, poly, poly_arr, file_format, timer)
+
+    if run_async:
+        job = submit_fill_job(
+            poly_arr,
+            poly.algorithm,
+            poly.name,
+            file_format,
+            on_done=lambda result: save_poly_job(
+                poly, poly_arr, file_format, result, timer
+            ),
+            shape=poly_canvas(poly),
+        )
 
         return JSONResponse(
             {
-                "message": "Poly item created successfully.",
-                "file_url": str(save_file),
-                "plot_url": str(save_file),
-                "execution_speed": f"{str(results[1])} seconds",
-                "algorithm": poly.algorithm,
+                "message": "Poly item queued.",
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": str(request.url_for("get_poly_job", job_id=job.id)),
             },
-            status_code=status.HTTP_201_CREATED,
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+
+    try:
+        result = process_poly(poly_arr, poly.algorithm, file_format, poly_canvas(poly))
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid poly item. {error}",
+        )
+    created = save_poly_item(db, poly, poly_arr, file_format, result, timer)
+
+    return JSONResponse(
+        {"message": "Poly item created successfully.", **created},
+        status_code=status.HTTP_201_CREATED,
+    )
+
+
+@router.post("/polys/binary", status_code=status.HTTP_201_CREATED)
+def create_poly_binary(
+    request: Request,
+    name: str = Query(...),
+    algorithm: str = Query(...),
+    fileformat: Optional[str] = Query(None),
+    xsize: Optional[int] = Query(None),
+    ysize: Optional[int] = Query(None),
+    run_async: bool = Query(False, alias="async"),
+    stream: bool = Query(False),
+    body: bytes = Body(..., media_type=VERTEX_MEDIA_TYPE),
+    db: Session = Depends(get_db),
+):
+    """
+    Create filled poly item from a raw vertex array body.
+
+    The body holds little endian int32 row, column pairs and is used
+    without parsing or copying.
+
+    params Request request: the incoming request.
+    params str name: name of the poly item.
+    params str algorithm: algorithm to fill the poly item with.
+    params str fileformat: storage format of the mask file.
+    params int xsize: number of rows of the canvas.
+    params int ysize: number of columns of the canvas.
+    params bool run_async: queue the fill in the worker pool and return a job.
+    params bool stream: send the mask file band by band while it is filled.
+    params bytes body: the vertex array.
+    return PolySerializer: The created poly item.
+    """
+    timer = StageTimer()
+    poly = PolySerializer(
+        name=name, algorithm=algorithm, fileformat=fileformat, xsize=xsize, ysize=ysize
+    )
+    if not body:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send the vertices as the request body",
         )
-    return HTTPException(
-        {"message": "Something went wrong creating the poly item. Please try again."},
-        status_code=status.HTTP_400_BAD_REQUEST,
+
+    try:
+        with timer.span("parse"):
+            poly_arr = decode_vertices_binary(body)
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid input array. {error}",
+        )
+
+    with timer.span("validate"):
+        file_format = validate_poly(db, poly)
+
+    return create_poly_item(
+        db, request, poly, poly_arr, file_format, run_async, timer, stream
+    )
+
+
+@router.post("/polys", status_code=status.HTTP_201_CREATED)
+def create_poly(
+    poly: PolySerializer,
+    request: Request,
+    run_async: bool = Query(False, alias="async"),
+    stream: bool = Query(False),
+    db: Session = Depends(get_db),
+):
+    """
+    Create filled poly item.
+
+    params PolySerializer poly: poly item to create.
+    params Request request: the incoming request.
+    params bool run_async: queue the fill in the worker pool and return a job.
+    params bool stream: send the mask file band by band while it is filled.
+    return PolySerializer: The created poly item.
+    """
+    timer = StageTimer()
+    with timer.span("validate"):
+        file_format = validate_poly(db, poly)
+
+    # process array
+    with timer.span("parse"):
+        poly_arr = decode_poly_vertices(poly)
+
+    return create_poly_item(
+        db, request, poly, poly_arr, file_format, run_async, timer, stream
     )
@@ -0,0 +1,134 @@
+"""
+Endpoints comparing and combining the masks of poly items.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+
+from app.config import get_db
+from app.models import Poly
+from app.routers.poly_items import (check_poly_name, describe_poly_item,
+                                    get_poly_mask_file, poly_canvas,
+                                    record_poly_stages)
+from app.serializers import SetOperationSerializer
+from app.services.file_management import FILE_FORMATS
+from app.services.job_service import process_set_operation
+from app.services.mask_operations import SET_OPERATIONS, mask_statistics
+from app.services.metrics_service import StageTimer
+
+# Create a new router
+router = APIRouter()
+
+
+@router.get("/polys/{poly_id}/compare/{other_id}", status_code=status.HTTP_200_OK)
+def compare_polys(poly_id: int, other_id: int, db: Session = Depends(get_db)):
+    """
+    Compare the masks of two poly items.
+
+    Both masks are counted once and only the overlap of their bounding
+    boxes is read together.
+
+    param int poly_id: The id of the first poly item.
+    param int other_id: The id of the second poly item.
+    return dict: Pixel counts of the set operations and the IoU.
+    """
+    first, first_path = get_poly_mask_file(db, poly_id)
+    second, second_path = get_poly_mask_file(db, other_id)
+    check_same_canvas(first, second)
+
+    return {
+        "first": first.id,
+        "second": second.id,
+        **mask_statistics(
+            (first_path, (first.xoffset or 0, first.yoffset or 0)),
+            (second_path, (second.xoffset or 0, second.yoffset or 0)),
+        ),
+    }
+
+
+def check_same_canvas(first: Poly, second: Poly):
+    """
+    Check two poly items are filled on canvases of the same size.
+
+    param Poly first: the first poly item.
+    param Poly second: the second poly item.
+    """
+    if poly_canvas(first) != poly_canvas(second):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The poly items are filled on canvases of different sizes",
+        )
+
+
+@router.post("/polys/combine", status_code=status.HTTP_201_CREATED)
+def create_poly_set_operation(
+    combination: SetOperationSerializer, db: Session = Depends(get_db)
+):
+    """
+    Create a poly item from the union, intersection or difference of two.
+
+    The masks are combined over the smallest window holding the result,
+    reading only the overlap of the second mask with it.
+
+    params SetOperationSerializer combination: the operation and its operands.
+    return dict: The created poly item.
+    """
+    timer = StageTimer()
+    file_format = combination.fileformat or "npy"
+
+    with timer.span("validate"):
+        check_poly_name(db, combination.name)
+        if combination.operation not in SET_OPERATIONS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid set operation. Pick one of: {', '.join(SET_OPERATIONS)}",
+            )
+        if file_format not in FILE_FORMATS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid file format. Pick one of: {', '.join(FILE_FORMATS)}",
+            )
+        first, first_path = get_poly_mask_file(db, combination.first)
+        second, second_path = get_poly_mask_file(db, combination.second)
+        check_same_canvas(first, second)
+
+    try:
+        result = process_set_operation(
+            combination.operation,
+            (first_path, (first.xoffset or 0, first.yoffset or 0)),
+            (second_path, (second.xoffset or 0, second.yoffset or 0)),
+            file_format,
+            poly_canvas(first),
+        )
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid set operation. {error}",
+        )
+
+    new_poly = Poly(
+        name=combination.name,
+        xsize=result["shape"][0],
+        ysize=result["shape"][1],
+        xoffset=result["offset"][0],
+        yoffset=result["offset"][1],
+        imagefile=result["file"],
+        arrayfile=result["plot"],
+        fileformat=file_format,
+        exectime=result["exectime"],
+        algorithm=combination.operation,
+    )
+    with timer.span("db_commit"):
+        db.add(new_poly)
+        db.commit()
+
+    return JSONResponse(
+        {
+            "message": "Poly item created successfully.",
+            **describe_poly_item(new_poly, result),
+            "first": first.id,
+            "second": second.id,
+            "stages": record_poly_stages(combination.operation, timer, result),
+        },
+        status_code=status.HTTP_201_CREATED,
+    )
@@ -1,4 +1,9 @@
 """
 Serializer module.
 """
+from .composite_serializer import (CompositeRegionSerializer,
+                                   CompositeSerializer)
+from .edit_serializer import PolyEditSerializer, VertexEditSerializer
+from .points_serializer import PointsSerializer
 from .poly_serializer import PolySerializer
+from .set_operation_serializer import SetOperationSerializer
@@ -0,0 +1,28 @@
+"""
+Composite serializer.
+"""
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, conint, conlist
+
+
+class CompositeRegionSerializer(BaseModel):
+    """
+    Labelled region of a composite.
+    """
+
+    label: conint(ge=1, le=65535)
+    vertices: List[Tuple[float, float]]
+    holes: Optional[List[List[Tuple[float, float]]]]
+
+
+class CompositeSerializer(BaseModel):
+    """
+    Composite serializer.
+    """
+
+    name: str
+    regions: conlist(CompositeRegionSerializer, min_items=1)
+    overlap: Optional[str]
+    xsize: Optional[int]
+    ysize: Optional[int]
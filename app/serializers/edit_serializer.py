@@ -0,0 +1,26 @@
+"""
+Poly edit serializer.
+"""
+from typing import Tuple
+
+from pydantic import BaseModel, conint, conlist
+
+# largest number of vertex moves of one edit
+MAX_VERTEX_EDITS = 10000
+
+
+class VertexEditSerializer(BaseModel):
+    """
+    Move of one vertex to a new (row, column) position.
+    """
+
+    index: conint(ge=0)
+    vertex: Tuple[float, float]
+
+
+class PolyEditSerializer(BaseModel):
+    """
+    Vertex moves of a poly item.
+    """
+
+    edits: conlist(VertexEditSerializer, min_items=1, max_items=MAX_VERTEX_EDITS)
@@ -0,0 +1,17 @@
+"""
+Points serializer.
+"""
+from typing import Tuple
+
+from pydantic import BaseModel, conlist
+
+# largest number of points of a containment query
+MAX_QUERY_POINTS = 100000
+
+
+class PointsSerializer(BaseModel):
+    """
+    Points of a containment query.
+    """
+
+    points: conlist(Tuple[float, float], min_items=1, max_items=MAX_QUERY_POINTS)
@@ -1,7 +1,7 @@
 """
 Poly serializer.
 """
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from pydantic import BaseModel
 
@@ -11,12 +11,26 @@ class PolySerializer(BaseModel):
     Poly serializer.
     """
 
+    id: Optional[int]
     name: str
     npinput: Optional[str]
+    vertices: Optional[List[Tuple[float, float]]]
+    npbinary: Optional[str]
+    xsize: Optional[int]
+    ysize: Optional[int]
+    xoffset: Optional[int]
+    yoffset: Optional[int]
     imagefile: Optional[str]
     arrayfile: Optional[str]
+    fileformat: Optional[str]
     exectime: Optional[float]
     algorithm: Optional[str]
+    engine: Optional[str]
+    predictedtime: Optional[float]
+    area: Optional[float]
+    perimeter: Optional[float]
+    xcentroid: Optional[float]
+    ycentroid: Optional[float]
 
     class Config:
         """
@@ -0,0 +1,18 @@
+"""
+Set operation serializer.
+"""
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class SetOperationSerializer(BaseModel):
+    """
+    Set operation of two stored poly items, stored as a new poly item.
+    """
+
+    name: str
+    operation: str
+    first: int
+    second: int
+    fileformat: Optional[str]
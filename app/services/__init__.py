@@ -1,5 +1,37 @@
 """
 Services module.
+
+The names below are imported from their service on first access, so that
+importing one service does not load the fill engines and the renderers.
 """
-from .file_management import save_matplot_figure, save_nparray_to_file
-from .filling_service import fill_polyline
+import importlib
+
+# service module of every re-exported name
+EXPORTS = {
+    "FILE_FORMATS": "file_management",
+    "load_mask_file": "file_management",
+    "save_mask_to_file": "file_management",
+    "save_nparray_to_file": "file_management",
+    "CroppedMask": "filling_service",
+    "fill_polyline": "filling_service",
+    "fill_polyline_cropped": "filling_service",
+    "render_preview": "preview_service",
+    "save_preview_image": "preview_service",
+    "SpanList": "span_list",
+    "fill_polyline_spans": "span_list",
+}
+
+__all__ = list(EXPORTS)
+
+
+def __getattr__(name):
+    """
+    Import a re-exported name from its service.
+    """
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f"{__name__}.{EXPORTS[name]}"), name)
+    globals()[name] = value
+
+    return value
@@ -0,0 +1,240 @@
+"""
+Fill cost model service.
+
+Predicts the fill time of every engine from features of the polygon, with
+coefficients calibrated by the fill benchmark (python -m benchmarks.calibrate),
+and picks the cheapest engine filling the pixels of the even-odd rule.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+# fill engines, the algorithms besides auto
+ENGINES = ["rourke", "flood", "fast", "scanline"]
+
+# features every engine's time is linear in
+COST_TERMS = {
+    # Python point in polygon test of every bounding box pixel
+    "rourke": ["constant", "pixels", "pixels_vertices"],
+    # Bresenham outline, then one flood step per span
+    "flood": ["constant", "perimeter", "crossings", "pixels"],
+    # scikit-image point in polygon test of every bounding box pixel
+    "fast": ["constant", "pixels", "pixels_vertices"],
+    # one entry per edge and scanline crossed, then a span fill
+    "scanline": ["constant", "vertices", "crossings", "pixels"],
+}
+
+# coefficients bundled with the service
+COST_MODEL_FILE = os.environ.get(
+    "COST_MODEL_FILE", str(Path(__file__).with_name("cost_model.json"))
+)
+
+
+def shape_features(points, bbox):
+    """
+    Compute the cost model features of a polygon.
+
+    Parameters
+    ----------
+    points : ndarray
+        (N, 2) array of (row, column) vertices.
+    bbox : tuple
+        (min_row, min_column, max_row, max_column) pixel bounding box of the
+        polygon on the canvas, see bounding_box.
+
+    Returns
+    -------
+    dict
+        Feature values by name.
+    """
+    rows = np.asarray(points[:, 0], dtype=np.float64)
+    columns = np.asarray(points[:, 1], dtype=np.float64)
+    min_row, min_column, max_row, max_column = bbox
+
+    vertices = float(rows.shape[0])
+    pixels = float((max_row - min_row) * (max_column - min_column))
+    edge_rows = np.roll(rows, -1) - rows
+    edge_columns = np.roll(columns, -1) - columns
+
+    return {
+        "constant": 1.0,
+        "vertices": vertices,
+        "pixels": pixels,
+        "pixels_vertices": pixels * vertices,
+        "perimeter": float(np.hypot(edge_rows, edge_columns).sum()),
+        # scanlines crossed by the edges, twice the rows of a convex polygon
+        "crossings": float(np.abs(edge_rows).sum()),
+    }
+
+
+def eligible_engines(engines=None):
+    """
+    Engines auto may fill a polygon with.
+
+    The even-odd engines fill a polygon with the same pixels. The flood
+    fill sets the pixels of a Bresenham outline, which differ on the edges,
+    so auto never picks it. That holds for convex polygons too, so the
+    choice no longer depends on the polygon and the convexity check that
+    used to admit flood was removed.
+
+    Parameters
+    ----------
+    engines : list
+        Engines to pick from, ENGINES by default.
+
+    Returns
+    -------
+    list
+        The engines filling the pixels of the even-odd rule.
+    """
+    return [engine for engine in engines or ENGINES if engine != "flood"]
+
+
+class CostModel:
+    """
+    Linear fill time model of every engine.
+
+    Attributes
+    ----------
+    coefficients : dict
+        Seconds per unit of every term of COST_TERMS, by engine.
+    """
+
+    def __init__(self, coefficients):
+        self.coefficients = coefficients
+
+    def predict(self, engine, features):
+        """
+        Predict the fill time of an engine.
+
+        Parameters
+        ----------
+        engine : str
+            One of ENGINES.
+        features : dict
+            Features of the polygon, see shape_features.
+
+        Returns
+        -------
+        float
+            Predicted seconds, None when the engine is not calibrated.
+        """
+        coefficients = self.coefficients.get(engine)
+        if coefficients is None:
+            return None
+
+        return sum(
+            coefficient * features[term] for term, coefficient in coefficients.items()
+        )
+
+    def choose(self, features, engines=None):
+        """
+        Pick the engine predicted to be the fastest among the correct ones.
+
+        Parameters
+        ----------
+        features : dict
+            Features of the polygon, see shape_features.
+        engines : list
+            Engines to pick from, ENGINES by default.
+
+        Returns
+        -------
+        engine : str
+            The chosen engine.
+        predicted : float
+            Its predicted fill time in seconds.
+        """
+        predictions = {
+            engine: self.predict(engine, features)
+            for engine in eligible_engines(engines)
+        }
+        predictions = {
+            engine: seconds
+            for engine, seconds in predictions.items()
+            if seconds is not None
+        }
+        if not predictions:
+            raise ValueError("No calibrated engine can fill the polygon.")
+
+        engine = min(predictions, key=predictions.get)
+
+        return engine, predictions[engine]
+
+    def to_dict(self):
+        """
+        Coefficients as stored in the model file.
+        """
+        return {"coefficients": self.coefficients}
+
+
+def fit_cost_model(samples):
+    """
+    Fit the coefficients of every engine to measured fill times.
+
+    Coefficients are fitted with non-negative least squares on the relative
+    error, so that small and large polygons weigh the same and no term can
+    predict a negative time.
+
+    Parameters
+    ----------
+    samples : list of tuple
+        (engine, features, seconds) of every measured fill.
+
+    Returns
+    -------
+    CostModel
+        The fitted model, engines without samples are left out.
+    """
+    # only the calibration needs SciPy
+    from scipy.optimize import nnls
+
+    coefficients = {}
+    for engine, terms in COST_TERMS.items():
+        measured = [
+            (features, seconds)
+            for sample_engine, features, seconds in samples
+            if sample_engine == engine and seconds > 0
+        ]
+        if not measured:
+            continue
+
+        design = np.array(
+            [
+                [features[term] / seconds for term in terms]
+                for features, seconds in measured
+            ]
+        )
+        scale = np.abs(design).max(axis=0)
+        scale[scale == 0] = 1.0
+        solution, _ = nnls(design / scale, np.ones(len(measured)))
+
+        coefficients[engine] = {
+            term: float(value) for term, value in zip(terms, solution / scale)
+        }
+
+    return CostModel(coefficients)
+
+
+def load_cost_model(path=COST_MODEL_FILE):
+    """
+    Load the calibrated coefficients.
+
+    Parameters
+    ----------
+    path : str
+        JSON file written by python -m benchmarks.calibrate.
+
+    Returns
+    -------
+    CostModel
+        The calibrated model.
+    """
+    with open(path, encoding="utf-8") as file:
+        return CostModel(json.load(file)["coefficients"])
+
+
+# process wide calibrated model
+cost_model = load_cost_model()
@@ -0,0 +1,291 @@
+"""
+Poly edit service.
+
+Moving vertices only changes the pixels around the moved edges. The windows
+around them are filled again straight into the stored npy mask through a
+memory map of their rows, instead of filling and writing the whole mask again.
+"""
+import threading
+import time
+
+import numpy as np
+
+from app.services.cost_model import cost_model, shape_features
+from app.services.file_management import (cached_mask_file,
+                                          checkout_cached_file,
+                                          commit_cached_file, open_mask_rows)
+from app.services.fill_cache import fill_cache
+from app.services.filling_service import (BAND_ALGORITHMS, bounding_box,
+                                          fill_cache_key, fill_rows,
+                                          vertex_array)
+from app.services.job_service import process_poly, processing_result
+from app.services.metrics_service import StageTimer
+from app.utils.vertex_encoding import integral_vertices
+
+# edits of the same poly item are applied one at a time
+edit_locks = {}
+edit_locks_lock = threading.Lock()
+
+
+def poly_edit_lock(poly_id):
+    """
+    Lock serializing the edits of a poly item within the process.
+    """
+    with edit_locks_lock:
+        return edit_locks.setdefault(poly_id, threading.Lock())
+
+
+def apply_vertex_edits(points, edits):
+    """
+    Move vertices of a polygon.
+
+    Parameters
+    ----------
+    points : ndarray
+        (N, 2) array of (row, column) vertices.
+    edits : list of tuple
+        (index, (row, column)) of every moved vertex, a later edit of the
+        same vertex wins.
+
+    Returns
+    -------
+    new_points : numpy.ndarray
+        The moved vertices, int32 when they are all whole numbers.
+    indices : list
+        Sorted indices of the moved vertices.
+    """
+    moves = dict(edits)
+    if any(index >= points.shape[0] for index in moves):
+        raise ValueError(f"Vertex indices must be below {points.shape[0]}.")
+
+    new_points = np.array(points, dtype=np.float64)
+    for index, vertex in moves.items():
+        new_points[index] = vertex
+    if not np.isfinite(new_points).all():
+        raise ValueError("Vertices must be finite.")
+
+    return integral_vertices(new_points), sorted(moves)
+
+
+def dirty_windows(points, new_points, indices, shape):
+    """
+    Canvas windows whose pixels can change when vertices move.
+
+    Moving a vertex only changes the pixels between its old and new edges,
+    which lie in the bounding box of the old and new positions of the
+    vertex and of its two neighbours. Moving several vertices is the same as
+    moving them one after the other.
+
+    Parameters
+    ----------
+    points : ndarray
+        (N, 2) vertices before the edit.
+    new_points : ndarray
+        (N, 2) vertices after the edit.
+    indices : list
+        Indices of the moved vertices.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    list of tuple
+        (min_row, min_column, max_row, max_column) of every window, with
+        exclusive maximums.
+    """
+    windows = []
+
+    for index in indices:
+        around = [(index + step) % points.shape[0] for step in (-1, 0, 1)]
+        corners = np.concatenate([points[around], new_points[around]]).astype(
+            np.float64
+        )
+        window = bounding_box(corners[:, 0], corners[:, 1], shape)
+        if window not in windows:
+            windows.append(window)
+
+    return windows
+
+
+def refill_windows(mask, engine, points, offset, windows):
+    """
+    Fill windows of a cropped mask again.
+
+    Parameters
+    ----------
+    mask : ndarray
+        Cropped mask to update in place, e.g. a memory-mapped npy file.
+    engine : str
+        One of BAND_ALGORITHMS, their pixels only depend on the polygon.
+    points : ndarray
+        (N, 2) vertices of the polygon on the canvas.
+    offset : tuple
+        (row, column) position of the mask within the canvas.
+    windows : list of tuple
+        Canvas windows to fill, see dirty_windows.
+
+    Returns
+    -------
+    int
+        Number of pixels filled again.
+    """
+    points = vertex_array(points)
+    pixels = 0
+
+    for min_row, min_column, max_row, max_column in windows:
+        # the window within the mask
+        first_row = max(min_row - offset[0], 0)
+        first_column = max(min_column - offset[1], 0)
+        stop_row = min(max_row - offset[0], mask.shape[0])
+        stop_column = min(max_column - offset[1], mask.shape[1])
+        if first_row >= stop_row or first_column >= stop_column:
+            continue
+
+        # the window is filled like a mask starting at its first pixel
+        window = np.zeros((stop_row - first_row, stop_column - first_column), np.uint8)
+        fill_rows(
+            engine,
+            points[:, 0] - offset[0] - first_row,
+            points[:, 1] - offset[1] - first_column,
+            window,
+        )
+        mask[first_row:stop_row, first_column:stop_column] = window
+        pixels += window.size
+
+    return pixels
+
+
+def process_poly_edit(
+    points,
+    edits,
+    engine,
+    file_format,
+    shape,
+    mask_file,
+    offset,
+    shared=True,
+):
+    """
+    Move vertices of a stored polygon and update its mask.
+
+    The windows around the moved edges are filled again in the stored npy
+    mask, memory mapped. Mask files are shared cache entries named after the
+    fill, so the file is copied when other poly items use it, moved
+    otherwise, and stored under the key of the new fill. The mask is filled
+    and saved whole when the bounding box of the polygon changes, when it is
+    not stored as npy or when the engine does not fill row by row.
+
+    Parameters
+    ----------
+    points : ndarray
+        (N, 2) vertices before the edit.
+    edits : list of tuple
+        (index, (row, column)) of every moved vertex.
+    engine : str
+        Engine the mask was filled with.
+    file_format : str
+        Storage format of the mask file.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    mask_file : Path
+        Stored mask file of the polygon.
+    offset : tuple
+        (row, column) position of the stored mask within the canvas.
+    shared : bool
+        Whether other poly items use the mask file.
+
+    Returns
+    -------
+    dict
+        The description of process_poly with the new vertices, the refilled
+        windows and the number of refilled pixels, no windows when the mask
+        was filled whole.
+    """
+    started_at = time.time()
+    counters = fill_cache.snapshot()
+    timer = StageTimer()
+
+    with timer.span("edit"):
+        new_points, indices = apply_vertex_edits(points, edits)
+        windows = dirty_windows(points, new_points, indices, shape)
+        rows, columns = new_points[:, 0], new_points[:, 1]
+        min_row, min_column, max_row, max_column = bounding_box(rows, columns, shape)
+
+    # the stored mask can only be updated when it keeps its window
+    in_place = file_format == "npy" and engine in BAND_ALGORITHMS
+    if in_place and mask_file.is_file():
+        stored_shape = np.load(mask_file, mmap_mode="r").shape
+        in_place = (min_row, min_column) == tuple(offset) and stored_shape == (
+            max_row - min_row,
+            max_column - min_column,
+        )
+    else:
+        in_place = False
+
+    if not in_place:
+        result = process_poly(new_points, engine, file_format, shape)
+        result["stages"] = {**timer.stages, **result["stages"]}
+
+        return {**result, "vertices": new_points, "windows": None, "pixels": None}
+
+    with timer.span("file_lookup"):
+        key = fill_cache_key(new_points, engine, shape=shape)
+        save_file = cached_mask_file(key, file_format)
+
+    execution_time = 0.0
+    pixels = 0
+    if save_file is None:
+        start_time = time.perf_counter()
+        with timer.span("checkout"):
+            temp_path = checkout_cached_file(mask_file, key, copy=shared)
+
+        # only the rows of every window are mapped and written back
+        with timer.span("rasterize"):
+            for window in windows:
+                first_row = max(window[0] - offset[0], 0)
+                stop_row = min(window[2] - offset[0], stored_shape[0])
+                if first_row >= stop_row:
+                    continue
+                rows = open_mask_rows(temp_path, first_row, stop_row)
+                pixels += refill_windows(
+                    rows,
+                    engine,
+                    new_points,
+                    (offset[0] + first_row, offset[1]),
+                    [window],
+                )
+                rows.flush()
+                del rows
+
+        with timer.span("save"):
+            save_file = commit_cached_file(temp_path, key, file_format)
+        execution_time = time.perf_counter() - start_time
+
+    # only the windows are filled, the prediction is theirs
+    predicted = [
+        cost_model.predict(engine, shape_features(new_points, window))
+        for window in windows
+    ]
+    predicted = None if None in predicted else sum(predicted)
+
+    # the preview of the old mask is stale, the new one is rendered on request
+    result = processing_result(
+        save_file,
+        None,
+        (min_row, min_column),
+        shape,
+        execution_time,
+        counters,
+        timer,
+        started_at,
+        preview=False,
+    )
+
+    return {
+        **result,
+        "engine": engine,
+        "predicted": predicted,
+        "vertices": new_points,
+        "windows": windows,
+        "pixels": pixels,
+    }
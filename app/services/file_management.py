@@ -1,12 +1,29 @@
 """
 File management service.
 """
+import io
+import os
+import shutil
+import uuid
 from pathlib import Path
 
 import numpy as np
-from matplotlib import pyplot as plt
 from numpy import save
 
+from app.services.fill_cache import fill_cache
+from app.services.filling_service import CroppedMask
+from app.services.mask_encoding import (PACKED, RLE, decode_packed, decode_rle,
+                                        encode_packed, encode_rle, mask_runs,
+                                        pack_header, read_header,
+                                        read_packed_window, read_rle_window)
+from app.services.span_list import decode_spans, encode_spans
+
+# supported storage formats and their file suffix
+FILE_FORMATS = {"npy": ".npy", "packed": ".npb", "rle": ".rle"}
+
+# size of the chunks file downloads are streamed in
+CHUNK_SIZE = 1024 * 1024
+
 
 def save_nparray_to_file(nparray: "nparray", filename: str):
     """
@@ -31,25 +48,612 @@ def save_nparray_to_file(nparray: "nparray", filename: str):
         raise ValueError("Something went wrong saving the file. Please try again.")
 
 
-def save_matplot_figure(nparr: "nparray", filename: str):
+def save_mask_to_file(cropped: CroppedMask, filename: str, file_format="npy"):
     """
-    Save matplotlib figure to file.
+    Save a cropped mask to file in one of the storage formats.
 
     Parameters
     ----------
-    nparr : nparray
-        Numpy array to save.
+    cropped : CroppedMask
+        Cropped mask to save.
     filename : str
-        The filename to save the plot to.
+        The filename to save the mask to.
+    file_format : str
+        One of npy (raw numpy array), packed (bit-packed rows) or
+        rle (row-wise run-length encoding).
     """
+    if file_format not in FILE_FORMATS:
+        raise ValueError("Invalid file format.")
+
+    if file_format == "npy":
+        return save_nparray_to_file(cropped.mask, filename)
+
     try:
-        loc_path = Path(__file__).parents[1] / f"data/{filename}-plot.png"
+        loc_path = Path(__file__).parents[1] / f"data/{filename}"
+        loc_path = loc_path.with_suffix(FILE_FORMATS[file_format])
+
+        if file_format == "packed":
+            loc_path.write_bytes(encode_packed(cropped))
+        else:
+            loc_path.write_bytes(encode_rle(cropped))
+
+        return loc_path
+    except:
+        raise ValueError("Something went wrong saving the file. Please try again.")
 
-        # check all the ones in the nparray and add them to the plot
-        poly_check = np.where(nparr == 1)
-        plt.plot(poly_check[0], poly_check[1])
-        plt.savefig(loc_path)
 
+def cached_mask_file(key: str, file_format="npy"):
+    """
+    Look up the disk tier of the fill cache.
+
+    Parameters
+    ----------
+    key : str
+        Cache key of the fill result.
+    file_format : str
+        Storage format of the mask file.
+
+    Returns
+    -------
+    Path or None
+        Path of the already written mask file, None when missing.
+    """
+    if file_format not in FILE_FORMATS:
+        raise ValueError("Invalid file format.")
+
+    loc_path = Path(__file__).parents[1] / f"data/{key}{FILE_FORMATS[file_format]}"
+    if loc_path.is_file():
+        fill_cache.record("disk_hits")
         return loc_path
+
+    fill_cache.record("disk_misses")
+    return None
+
+
+def save_cached_mask(cropped: CroppedMask, key: str, file_format="npy"):
+    """
+    Save a mask to the disk tier of the fill cache.
+
+    The file is named after the cache key and written atomically, so any
+    number of poly items and processes can share it.
+
+    Parameters
+    ----------
+    cropped : CroppedMask
+        Cropped mask to save.
+    key : str
+        Cache key of the fill result.
+    file_format : str
+        Storage format of the mask file.
+    """
+    temp_path = save_mask_to_file(cropped, f"{key}-{uuid.uuid4().hex}", file_format)
+
+    return commit_cached_file(temp_path, key, file_format)
+
+
+def save_cached_spans(spans, key: str):
+    """
+    Save a span list to the disk tier of the fill cache, in the rle format.
+
+    The runs are written as they are, the mask is never expanded.
+
+    Parameters
+    ----------
+    spans : SpanList
+        Runs of the filled polygon.
+    key : str
+        Cache key of the fill result.
+    """
+    try:
+        temp_path = Path(__file__).parents[1] / f"data/{key}-{uuid.uuid4().hex}"
+        temp_path = temp_path.with_suffix(FILE_FORMATS["rle"])
+        temp_path.write_bytes(encode_spans(spans))
     except:
         raise ValueError("Something went wrong saving the file. Please try again.")
+
+    return commit_cached_file(temp_path, key, "rle")
+
+
+def open_cached_memmap(key: str, mask_shape):
+    """
+    Open a disk-backed npy array to write a mask of the disk tier in place.
+
+    Parameters
+    ----------
+    key : str
+        Cache key of the fill result.
+    mask_shape : tuple
+        (rows, columns) shape of the mask.
+
+    Returns
+    -------
+    numpy.memmap
+        Zeroed uint8 array backed by a temporary file, its filename is
+        committed with commit_cached_file once written.
+    """
+    temp_path = Path(__file__).parents[1] / f"data/{key}-{uuid.uuid4().hex}.npy"
+
+    return np.lib.format.open_memmap(
+        temp_path, mode="w+", dtype=np.uint8, shape=tuple(mask_shape)
+    )
+
+
+class EncodedMaskFile:
+    """
+    Packed or rle mask file written band by band.
+
+    Assigning a band of rows encodes it and appends it to the file, so only
+    the band is held in memory. Bands must be assigned in order, as
+    fill_polyline_chunked writes them. Used as a context manager, the file
+    is closed on leaving the block and removed when the block failed.
+
+    Attributes
+    ----------
+    filename : Path
+        Path the file is written to.
+    file_format : str
+        packed or rle.
+    shape : tuple
+        (rows, columns) of the mask.
+    """
+
+    def __init__(self, path, file_format, mask_shape, offset, shape):
+        self.filename = Path(path)
+        self.file_format = file_format
+        self.shape = (int(mask_shape[0]), int(mask_shape[1]))
+        self.next_row = 0
+
+        code = {"packed": PACKED, "rle": RLE}[file_format]
+        # kept open while the bands are written, closed by flush or __exit__
+        self.file = open(self.filename, "wb")  # pylint: disable=consider-using-with
+        try:
+            self.file.write(pack_header(code, self.shape, offset, shape))
+        except Exception:
+            self.file.close()
+            self.filename.unlink()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+
+        # a partly written file must not be committed to the cache
+        if exc_type is not None:
+            self.filename.unlink(missing_ok=True)
+
+    def __setitem__(self, rows, window):
+        """
+        Encode the next band of rows and append it to the file.
+        """
+        first_row, stop_row, _ = rows.indices(self.shape[0])
+        if first_row != self.next_row:
+            raise ValueError("Bands must be written in order.")
+
+        if self.file_format == "packed":
+            self.file.write(np.packbits(window != 0, axis=1).tobytes())
+        else:
+            runs = mask_runs(window)
+            runs[:, 0] += first_row
+            self.file.write(runs.astype("<i4").tobytes())
+        self.next_row = stop_row
+
+    def flush(self):
+        """
+        Close the file once every band was written.
+        """
+        self.file.close()
+
+
+def open_cached_encoded(key: str, file_format, mask_shape, offset, shape):
+    """
+    Open a packed or rle file to write a mask of the disk tier band by band.
+
+    Parameters
+    ----------
+    key : str
+        Cache key of the fill result.
+    file_format : str
+        packed or rle.
+    mask_shape : tuple
+        (rows, columns) shape of the mask.
+    offset : tuple
+        (row, column) position of the mask within the canvas.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    EncodedMaskFile
+        The file, its filename is committed with commit_cached_file once
+        flushed.
+    """
+    temp_path = Path(__file__).parents[1] / (
+        f"data/{key}-{uuid.uuid4().hex}{FILE_FORMATS[file_format]}"
+    )
+
+    return EncodedMaskFile(temp_path, file_format, mask_shape, offset, shape)
+
+
+def commit_cached_file(temp_path, key: str, file_format="npy"):
+    """
+    Move a fully written file to its place in the disk tier of the fill cache.
+
+    Parameters
+    ----------
+    temp_path : Path
+        Path the file was written to.
+    key : str
+        Cache key of the fill result.
+    file_format : str
+        Storage format of the mask file.
+
+    Returns
+    -------
+    Path
+        Path of the cached file.
+    """
+    loc_path = Path(temp_path).with_name(f"{key}{FILE_FORMATS[file_format]}")
+    os.replace(temp_path, loc_path)
+
+    return loc_path
+
+
+def checkout_cached_file(path, key: str, copy=True):
+    """
+    Take a file of the disk tier of the fill cache out to change it.
+
+    Cached files are shared by every poly item with the same fill, so a
+    shared file is copied and only a file nobody else uses is moved.
+
+    Parameters
+    ----------
+    path : Path
+        Path of the cached file.
+    key : str
+        Cache key of the changed fill result, the temporary file is named
+        after it.
+    copy : bool
+        Copy the file instead of moving it.
+
+    Returns
+    -------
+    Path
+        Temporary path of the file, committed with commit_cached_file once
+        changed.
+    """
+    path = Path(path)
+    temp_path = path.with_name(f"{key}-{uuid.uuid4().hex}{path.suffix}")
+
+    if copy:
+        shutil.copyfile(path, temp_path)
+    else:
+        os.replace(path, temp_path)
+
+    return temp_path
+
+
+def load_mask_file(path, offset=(0, 0), shape=None):
+    """
+    Load a cropped mask saved in any of the storage formats.
+
+    Parameters
+    ----------
+    path : str
+        Path of the mask file.
+    offset : tuple
+        (row, column) position of a raw npy mask within the canvas.
+    shape : tuple
+        Canvas shape of a raw npy mask, defaults to the mask shape.
+
+    Returns
+    -------
+    CroppedMask
+        The loaded cropped mask.
+    """
+    path = Path(path)
+
+    if path.suffix == FILE_FORMATS["npy"]:
+        mask = np.load(path)
+        return CroppedMask(mask, offset, shape or mask.shape)
+
+    data = path.read_bytes()
+    if path.suffix == FILE_FORMATS["packed"]:
+        return decode_packed(data)
+    if path.suffix == FILE_FORMATS["rle"]:
+        return decode_rle(data)
+
+    raise ValueError("Invalid file format.")
+
+
+def stored_mask_box(path, offset=(0, 0)):
+    """
+    Canvas window covered by a stored mask, read from its header.
+
+    Parameters
+    ----------
+    path : str
+        Path of the mask file.
+    offset : tuple
+        (row, column) position of a raw npy mask within the canvas.
+
+    Returns
+    -------
+    tuple
+        (min_row, min_column, max_row, max_column) with exclusive maximums.
+    """
+    path = Path(path)
+
+    if path.suffix == FILE_FORMATS["npy"]:
+        mask_shape = np.load(path, mmap_mode="r").shape
+    elif path.suffix in [FILE_FORMATS["packed"], FILE_FORMATS["rle"]]:
+        _, mask_shape, offset, _ = read_header(path)
+    else:
+        raise ValueError("Invalid file format.")
+
+    return (
+        offset[0],
+        offset[1],
+        offset[0] + mask_shape[0],
+        offset[1] + mask_shape[1],
+    )
+
+
+def count_mask_pixels(path):
+    """
+    Count the filled pixels of a stored mask.
+
+    Raw npy masks are counted memory-mapped and the runs of rle masks are
+    summed, packed masks are decoded.
+
+    Parameters
+    ----------
+    path : str
+        Path of the mask file.
+
+    Returns
+    -------
+    int
+        Number of non zero pixels.
+    """
+    path = Path(path)
+
+    if path.suffix == FILE_FORMATS["npy"]:
+        return int(np.count_nonzero(np.load(path, mmap_mode="r")))
+    if path.suffix == FILE_FORMATS["rle"]:
+        return decode_spans(path.read_bytes()).area()
+
+    return int(np.count_nonzero(load_mask_file(path).mask))
+
+
+def read_mask_window(path, row, column, height, width, offset=(0, 0)):
+    """
+    Read a window of the canvas from a stored mask.
+
+    Raw npy masks are memory-mapped and packed masks are read row by row,
+    so only the requested window is loaded in memory.
+
+    Parameters
+    ----------
+    path : str
+        Path of the mask file.
+    row : int
+        First canvas row of the window.
+    column : int
+        First canvas column of the window.
+    height : int
+        Number of rows of the window.
+    width : int
+        Number of columns of the window.
+    offset : tuple
+        (row, column) position of a raw npy mask within the canvas.
+
+    Returns
+    -------
+    numpy.ndarray
+        Window of the mask dtype, uint8 or the uint16 labels of a
+        composite, zero outside of the cropped mask.
+    """
+    path = Path(path)
+
+    if path.suffix == FILE_FORMATS["npy"]:
+        mask = np.load(path, mmap_mode="r")
+        mask_shape = mask.shape
+        dtype = mask.dtype
+    elif path.suffix in [FILE_FORMATS["packed"], FILE_FORMATS["rle"]]:
+        _, mask_shape, offset, _ = read_header(path)
+        dtype = np.uint8
+    else:
+        raise ValueError("Invalid file format.")
+
+    window = np.zeros((height, width), dtype=dtype)
+
+    # overlap of the window and the mask, in mask coordinates
+    first_row = max(row - offset[0], 0)
+    stop_row = min(row + height - offset[0], mask_shape[0])
+    first_column = max(column - offset[1], 0)
+    stop_column = min(column + width - offset[1], mask_shape[1])
+    if first_row >= stop_row or first_column >= stop_column:
+        return window
+
+    rows = (first_row, stop_row)
+    columns = (first_column, stop_column)
+    if path.suffix == FILE_FORMATS["npy"]:
+        overlap = mask[first_row:stop_row, first_column:stop_column]
+    elif path.suffix == FILE_FORMATS["packed"]:
+        overlap = read_packed_window(path, mask_shape, rows, columns)
+    else:
+        overlap = read_rle_window(path, rows, columns)
+
+    window_row = first_row + offset[0] - row
+    window_column = first_column + offset[1] - column
+    window[
+        window_row : window_row + overlap.shape[0],
+        window_column : window_column + overlap.shape[1],
+    ] = overlap
+
+    return window
+
+
+class MaskFileRows:
+    """
+    Stored mask whose rows are read from its file when sliced.
+
+    Slicing a band of rows reads it with read_mask_window, so the whole
+    mask is never loaded in memory.
+
+    Attributes
+    ----------
+    path : Path
+        Path of the mask file.
+    offset : tuple
+        (row, column) position of the mask within the canvas.
+    shape : tuple
+        (rows, columns) of the mask.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        box = stored_mask_box(self.path)
+        self.offset = box[0:2]
+        self.shape = (box[2] - box[0], box[3] - box[1])
+
+    def __getitem__(self, rows):
+        """
+        Read a slice of rows of the mask.
+        """
+        first_row, stop_row, _ = rows.indices(self.shape[0])
+
+        return read_mask_window(
+            self.path,
+            self.offset[0] + first_row,
+            self.offset[1],
+            max(stop_row - first_row, 0),
+            self.shape[1],
+            self.offset,
+        )
+
+
+def open_mask_rows(path, first_row, stop_row):
+    """
+    Memory map rows of a raw npy mask for writing.
+
+    Only the pages of the rows are mapped, so flushing them does not write
+    back the rest of the mask.
+
+    Parameters
+    ----------
+    path : str
+        Path of the npy mask file.
+    first_row : int
+        First row of the mask to map.
+    stop_row : int
+        Row after the last row to map.
+
+    Returns
+    -------
+    numpy.memmap
+        Writable (stop_row - first_row, columns) view of the rows.
+    """
+    with open(path, "rb") as file:
+        if np.lib.format.read_magic(file) == (1, 0):
+            header = np.lib.format.read_array_header_1_0(file)
+        else:
+            header = np.lib.format.read_array_header_2_0(file)
+        shape, fortran_order, dtype = header
+        header_size = file.tell()
+
+    if fortran_order:
+        raise ValueError("Rows of a Fortran ordered mask are not contiguous.")
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r+",
+        offset=header_size + first_row * shape[1] * dtype.itemsize,
+        shape=(stop_row - first_row, shape[1]),
+    )
+
+
+def encode_npy(nparray: "nparray"):
+    """
+    Serialize a numpy array to the bytes of a .npy file.
+
+    Parameters
+    ----------
+    nparray : nparray
+        Numpy array to serialize.
+    """
+    buffer = io.BytesIO()
+    save(buffer, nparray)
+
+    return buffer.getvalue()
+
+
+def parse_byte_range(range_header: str, size: int):
+    """
+    Parse a single HTTP byte range.
+
+    Parameters
+    ----------
+    range_header : str
+        Value of the Range header, e.g. bytes=0-1023.
+    size : int
+        Size of the file in bytes.
+
+    Returns
+    -------
+    tuple or None
+        First and last byte of the range, both included, None when the whole
+        file should be sent.
+    """
+    units, _, ranges = range_header.partition("=")
+    if units.strip() != "bytes" or "," in ranges:
+        return None
+
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first == "":
+            # suffix range, the last bytes of the file
+            first = max(size - int(last), 0)
+            last = size - 1
+        else:
+            first = int(first)
+            last = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+
+    if first > last or first >= size:
+        raise ValueError("Range not satisfiable.")
+
+    return first, last
+
+
+def iter_file_range(path, first: int, last: int):
+    """
+    Stream a byte range of a file in chunks.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file.
+    first : int
+        First byte to send.
+    last : int
+        Last byte to send, included.
+
+    Yield
+    -------
+    bytes
+        Chunks of the range.
+    """
+    with open(path, "rb") as stream:
+        stream.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
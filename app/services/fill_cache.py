@@ -0,0 +1,138 @@
+"""
+Fill result cache service.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# memory budget of the cached masks
+FILL_CACHE_BYTES = int(os.environ.get("FILL_CACHE_BYTES", 256 * 1024 * 1024))
+
+COUNTERS = ["hits", "misses", "evictions", "disk_hits", "disk_misses"]
+
+
+def cache_key(polygon_points, *params):
+    """
+    Canonical hash of a vertex list and the parameters of its fill.
+
+    Parameters
+    ----------
+    polygon_points : list
+        Array of points that define the polygon.
+    params : tuple
+        JSON serializable fill parameters, e.g. algorithm and canvas shape.
+
+    Returns
+    -------
+    str
+        Hex digest identifying the fill result.
+    """
+    points = np.ascontiguousarray(polygon_points, dtype="<f8")
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(points.shape), list(params)]).encode())
+    digest.update(points.tobytes())
+
+    return digest.hexdigest()
+
+
+class FillCache:
+    """
+    Size-bounded LRU cache of cropped fill results.
+    """
+
+    def __init__(self, max_bytes=FILL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached result of a key, None on a miss.
+        """
+        with self.lock:
+            cropped = self.entries.get(key)
+            if cropped is None:
+                self.counters["misses"] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return cropped
+
+    def put(self, key, cropped):
+        """
+        Cache a result, evicting the least recently used ones to fit it.
+
+        The cached mask is made read-only as it is shared between callers.
+        """
+        nbytes = cropped.mask.nbytes
+        if nbytes > self.max_bytes:
+            return
+
+        cropped.mask.flags.writeable = False
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+
+            while self.entries and self.nbytes + nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.mask.nbytes
+                self.counters["evictions"] += 1
+
+            self.entries[key] = cropped
+            self.nbytes += nbytes
+
+    def record(self, counter, count=1):
+        """
+        Increment one of the counters.
+        """
+        with self.lock:
+            self.counters[counter] += count
+
+    def snapshot(self):
+        """
+        Return a copy of the counters.
+        """
+        with self.lock:
+            return dict(self.counters)
+
+    def merge(self, counters):
+        """
+        Add counters reported by another process.
+        """
+        with self.lock:
+            for counter, count in counters.items():
+                self.counters[counter] += count
+
+    def stats(self):
+        """
+        Cache counters and memory usage.
+        """
+        with self.lock:
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        """
+        Drop every cached result and reset the counters.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+            self.counters = dict.fromkeys(COUNTERS, 0)
+
+
+fill_cache = FillCache()
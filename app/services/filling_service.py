@@ -2,13 +2,143 @@
 Polygon filling service.
 """
 import math
-from datetime import datetime
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from skimage.draw import polygon
 
+from app.services.cost_model import ENGINES, cost_model, shape_features
+from app.services.fill_cache import cache_key, fill_cache
+from app.services.flood_fill import fill_polyline_flood
+from app.services.metrics_service import stage_span
+from app.services.rourke_fill import fill_polyline_rourke
+from app.services.scanline_fill import (band_edges, edge_table,
+                                        fill_polyline_scanline)
+from app.utils.vertex_encoding import check_vertices
 
-def fill_polyline(polygon_points, algorithm, flood_x=None, flood_y=None):
+CANVAS_SHAPE = (19200, 10800)
+# auto fills with the engine the cost model predicts to be the fastest
+ALGORITHMS = ENGINES + ["auto"]
+
+# algorithms filling every row on its own, which can be filled in bands
+BAND_ALGORITHMS = ["rourke", "fast", "scanline"]
+
+# rows filled at a time by the chunked fill
+FILL_BAND_ROWS = int(os.environ.get("FILL_BAND_ROWS", 1024))
+
+# threads filling the bands of a large mask concurrently
+FILL_THREADS = int(os.environ.get("FILL_THREADS", os.cpu_count() or 1))
+
+# algorithms whose bands run in NumPy calls releasing the GIL, rourke runs
+# Python code and the scikit-image fill of fast holds the GIL
+THREAD_ALGORITHMS = ["scanline"]
+
+# masks with fewer pixels are filled by a single thread
+PARALLEL_FILL_PIXELS = int(os.environ.get("PARALLEL_FILL_PIXELS", 1024 * 1024))
+
+# largest number of rows or columns of a canvas
+MAX_CANVAS_SIZE = int(os.environ.get("MAX_CANVAS_SIZE", 131072))
+
+
+class CroppedMask:
+    """
+    Filled polygon mask cropped to the bounding box of the polygon.
+
+    Attributes
+    ----------
+    mask : numpy.ndarray
+        Filled pixels of the bounding box window.
+    offset : tuple
+        (row, column) position of the window within the canvas.
+    shape : tuple
+        Logical (rows, columns) shape of the full canvas.
+    """
+
+    def __init__(self, mask, offset, shape):
+        self.mask = mask
+        self.offset = (int(offset[0]), int(offset[1]))
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    def to_dense(self):
+        """
+        Expand the cropped mask onto a full canvas.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of the logical canvas shape holding the filled polygon.
+        """
+        nparr = np.zeros(self.shape, dtype=self.mask.dtype)
+        row, column = self.offset
+        nparr[
+            row : row + self.mask.shape[0], column : column + self.mask.shape[1]
+        ] = self.mask
+
+        return nparr
+
+
+def vertex_array(polygon_points):
+    """
+    View polygon vertices as an (N, 2) array of (row, column) points.
+
+    Float and int64 arrays are used as is, without a copy. int32 arrays,
+    e.g. decoded binary vertices, are widened to an int64 copy and lists of
+    points are converted.
+
+    Parameters
+    ----------
+    polygon_points : list or ndarray
+        Array of points that define the polygon.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, 2).
+    """
+    points = check_vertices(np.asarray(polygon_points))
+
+    # int32 vertices are widened so the engines' index arithmetic cannot overflow
+    if np.issubdtype(points.dtype, np.integer):
+        points = points.astype(np.int64, copy=False)
+
+    return points
+
+
+def bounding_box(rows, columns, shape=CANVAS_SHAPE):
+    """
+    Compute the pixel bounding box of a polygon, clipped to the canvas.
+
+    Parameters
+    ----------
+    rows : ndarray
+        Row coordinates of the polygon vertices.
+    columns : ndarray
+        Column coordinates of the polygon vertices.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    tuple
+        (min_row, min_column, max_row, max_column) with exclusive maximums.
+    """
+    min_row = min(max(0, int(math.floor(np.min(rows)))), shape[0])
+    min_column = min(max(0, int(math.floor(np.min(columns)))), shape[1])
+    max_row = max(min(shape[0], int(math.ceil(np.max(rows))) + 1), min_row)
+    max_column = max(min(shape[1], int(math.ceil(np.max(columns))) + 1), min_column)
+
+    return min_row, min_column, max_row, max_column
+
+
+def fill_polyline(
+    polygon_points,
+    algorithm,
+    flood_x=None,
+    flood_y=None,
+    connectivity=4,
+    shape=CANVAS_SHAPE,
+):
     """
     Method for handling algorithm selection.
 
@@ -18,6 +148,10 @@ def fill_polyline(polygon_points, algorithm, flood_x=None, flood_y=None):
         Array of points that define the polygon.
     algorithm : str
         Algorithm to use for filling the polygon.
+    connectivity : int
+        Pixel connectivity of the flood fill, 4 or 8.
+    shape : tuple
+        (rows, columns) shape of the canvas.
 
     Returns
     -------
@@ -26,308 +160,370 @@ def fill_polyline(polygon_points, algorithm, flood_x=None, flood_y=None):
     execution_time : float
         Time taken to fill and process the polygon.
     """
-    nparr = np.zeros((19200, 10800), dtype=np.uint8)
-
-    if algorithm in ["rourke", "fast"]:
-        start_time = datetime.now()
-        rows, columns = [], []
-
-        # prepare the x y points
-        for i in range(len(polygon_points)):
-            rows.append(polygon_points[i][0])
-            columns.append(polygon_points[i][1])
-
-        if algorithm == "rourke":
-            result = fill_polyline_rourke(rows, columns, nparr)
-        if algorithm == "fast":
-            result = fill_polygon_fast(nparr, rows, columns)
-
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
-
-        return (result, execution_time)
-    elif algorithm == "flood":
-        start_time = datetime.now()
-        fill_points = []
-        polygon_points.append(polygon_points[0])
-
-        # apply bresemham's line algorithm to each pair of points
-        for i in range(len(polygon_points) - 1):
-            fill_points.extend(
-                list(
-                    bresenham(
-                        polygon_points[i][0],
-                        polygon_points[i][1],
-                        polygon_points[i + 1][0],
-                        polygon_points[i + 1][1],
-                    )
-                )
-            )
+    cropped, execution_time = fill_polyline_cropped(
+        polygon_points, algorithm, flood_x, flood_y, shape, connectivity
+    )
+
+    return (cropped.to_dense(), execution_time)
+
+
+def fill_polyline_cropped(
+    polygon_points,
+    algorithm,
+    flood_x=None,
+    flood_y=None,
+    shape=CANVAS_SHAPE,
+    connectivity=4,
+    use_cache=True,
+    timer=None,
+    workers=None,
+):
+    """
+    Fill a polygon into a mask sized to its bounding box.
 
-        # Fill the points
-        xarr, yarr = [], []
-        for i in fill_points:
-            nparr[i[0]][i[1]] = 1
-            xarr.append(i[0])
-            yarr.append(i[1])
+    Results are kept in the in-memory fill cache, a cached result is
+    returned as is and its mask is read-only.
 
-        if flood_x and flood_y:
-            flood_fill_4(flood_x, flood_y, 0, 1, nparr)
-        else:
-            # find the latter points of the polygon
-            min_x = min(xarr)
-            max_x = max(xarr)
-            min_y = min(yarr)
-            max_y = max(yarr)
-
-            # compute the center of the polygon
-            x_start = max_x - (max_x - min_x)
-            y_start = max_y - (max_y - min_y)
-
-            # Fill the polygon recursively
-            flood_fill_4(x_start, y_start, 0, 1, nparr)
-
-        end_time = datetime.now()
-        execution_time = (end_time - start_time).total_seconds()
-        return (nparr, execution_time)
-    else:
+    Parameters
+    ----------
+    polygon_points : list or ndarray
+        Array of points that define the polygon.
+    algorithm : str
+        Algorithm to use for filling the polygon.
+    flood_x : int
+        Column of the flood fill start position on the canvas.
+    flood_y : int
+        Row of the flood fill start position on the canvas.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    connectivity : int
+        Pixel connectivity of the flood fill, 4 or 8.
+    use_cache : bool
+        Look the result up in the fill cache and store it there.
+    timer : StageTimer
+        Records the duration of the cache lookup, allocation, rasterization
+        and cache store stages when given.
+    workers : int
+        Threads filling bands of a large mask concurrently, FILL_THREADS
+        by default. The result does not depend on it.
+
+    Returns
+    -------
+    CroppedMask
+        Filled polygon cropped to its bounding box.
+    execution_time : float
+        Time taken to fill and process the polygon.
+    """
+    if algorithm not in ALGORITHMS:
         raise ValueError("Invalid algorithm.")
+    if algorithm == "auto":
+        algorithm, _ = select_engine(polygon_points, algorithm, shape)
 
+    start_time = time.perf_counter()
 
-def fill_polygon_fast(nparr, rows, columns):
+    key = None
+    if use_cache:
+        with stage_span(timer, "cache_lookup"):
+            key = fill_cache_key(
+                polygon_points, algorithm, flood_x, flood_y, shape, connectivity
+            )
+            cached = fill_cache.get(key)
+        if cached is not None:
+            execution_time = time.perf_counter() - start_time
+            return (cached, execution_time)
+
+    with stage_span(timer, "allocate"):
+        # prepare the x y points, views of the vertex array
+        points = vertex_array(polygon_points)
+        rows = points[:, 0]
+        columns = points[:, 1]
+
+        min_row, min_column, max_row, max_column = bounding_box(rows, columns, shape)
+        nparr = np.zeros((max_row - min_row, max_column - min_column), dtype=np.uint8)
+
+        # move the points into the bounding box window
+        rows = rows - min_row
+        columns = columns - min_column
+
+    with stage_span(timer, "rasterize"):
+        if algorithm in BAND_ALGORITHMS:
+            fill_rows(algorithm, rows, columns, nparr, workers)
+        else:
+            seed = None
+            if flood_x is not None and flood_y is not None:
+                seed = (flood_y - min_row, flood_x - min_column)
+            fill_polyline_flood(rows, columns, nparr, seed, connectivity)
+
+    cropped = CroppedMask(nparr, (min_row, min_column), shape)
+    if key is not None:
+        with stage_span(timer, "cache_store"):
+            fill_cache.put(key, cropped)
+
+    execution_time = time.perf_counter() - start_time
+
+    return (cropped, execution_time)
+
+
+def fill_polyline_chunked(
+    polygon_points,
+    algorithm,
+    open_mask,
+    shape=CANVAS_SHAPE,
+    band_rows=FILL_BAND_ROWS,
+    timer=None,
+    workers=None,
+):
     """
-    Fill a polygon defined by a list of points.
+    Fill a polygon band by band into a mask that does not fit in memory.
+
+    Only one band of rows is held in memory, every filled band is written
+    to the mask returned by open_mask, e.g. a disk-backed np.memmap. The
+    result is identical to fill_polyline_cropped.
 
     Parameters
     ----------
-    points : list of tuples
-        List of points that define the polygon.
+    polygon_points : list or ndarray
+        Array of points that define the polygon.
+    algorithm : str
+        Algorithm to use for filling the polygon, one of BAND_ALGORITHMS or
+        auto.
+    open_mask : callable
+        Called with the (rows, columns) shape of the cropped mask, returns
+        the zeroed uint8 array to write the bands to.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    band_rows : int
+        Number of rows filled at a time.
+    timer : StageTimer
+        Records the duration of the allocation and rasterization stages
+        when given.
+    workers : int
+        Threads filling parts of every band concurrently, FILL_THREADS by
+        default.
 
     Returns
     -------
-    numpy.ndarray
-        Array of points that define the filled polygon.
-
+    CroppedMask
+        Filled polygon cropped to its bounding box, its mask is the array
+        returned by open_mask.
+    execution_time : float
+        Time taken to fill the polygon.
     """
-    try:
-        row_values, column_values = polygon(rows, columns)
-        nparr[row_values, column_values] = 1
+    if algorithm == "auto":
+        algorithm, _ = select_engine(polygon_points, algorithm, shape, BAND_ALGORITHMS)
+    if algorithm not in BAND_ALGORITHMS:
+        raise ValueError(f"Only {', '.join(BAND_ALGORITHMS)} can be filled in bands.")
 
-        return nparr
-    except:
-        raise ValueError("Something went wrong filling the polygon. Please try again.")
+    start_time = time.perf_counter()
 
+    with stage_span(timer, "allocate"):
+        points = vertex_array(polygon_points)
+        rows = points[:, 0]
+        columns = points[:, 1]
 
-def flood_fill_4(x, y, old, new, arr):
-    """
-    Flood fill algorithm for 4-connected pixels.
+        min_row, min_column, max_row, max_column = bounding_box(rows, columns, shape)
+        mask = open_mask((max_row - min_row, max_column - min_column))
+        band = np.zeros((min(band_rows, mask.shape[0]), mask.shape[1]), np.uint8)
 
-    Parameters
-    ----------
-    x : int
-        X coordinate of the start position.
-    y : int
-        Y coordinate of the start position.
-    old : int
-        Old value.
-    new : int
-        New value.
-    arr : numpy.ndarray
-        Array of points that define the filled polygon.
-    """
-    # the flood fill has 4 parts
-    # firstly, make sure the x and y are inbounds
-    if x < 0 or x >= len(arr[0]) or y < 0 or y >= len(arr):
-        return
+        # move the points into the bounding box window
+        rows = rows - min_row
+        columns = columns - min_column
 
-    # secondly, check if the current position equals the old value
-    if arr[y][x] != old:
-        return
+    with stage_span(timer, "rasterize"):
+        for first_row in range(0, mask.shape[0], band_rows):
+            stop_row = min(first_row + band_rows, mask.shape[0])
+            window = band[: stop_row - first_row]
+            window.fill(0)
 
-    # thirdly, set the current position to the new value
-    arr[y][x] = new
+            # the band is filled like a mask starting at its first row
+            fill_rows(algorithm, rows - first_row, columns, window, workers)
+            mask[first_row:stop_row] = window
 
-    # fourthly, attempt to fill the neighboring positions
-    flood_fill_4(x + 1, y, old, new, arr)
-    flood_fill_4(x - 1, y, old, new, arr)
-    flood_fill_4(x, y + 1, old, new, arr)
-    flood_fill_4(x, y - 1, old, new, arr)
+    execution_time = time.perf_counter() - start_time
 
+    return (CroppedMask(mask, (min_row, min_column), shape), execution_time)
 
-def bresenham(x0, y0, x1, y1):
-    """
-    Bresenham's line algorithm.
 
-    Used to draw lines from one point to another.
-    Yield integer coordinates on the line from (x0, y0) to (x1, y1).
-    Input coordinates should be integers.
+def select_engine(polygon_points, algorithm, shape=CANVAS_SHAPE, engines=None):
+    """
+    Resolve an algorithm to the engine filling the polygon.
 
-    The result will contain both the start and the end point.
+    auto picks the engine the calibrated cost model predicts to be the
+    fastest among the engines filling the pixels of the even-odd rule, any
+    other algorithm is its own engine.
 
     Parameters
     ----------
-    x0 : int
-        X coordinate of the start position.
-    y0 : int
-        Y coordinate of the start position.
-    x1 : int
-        X coordinate of the end position.
-    y1 : int
-        Y coordinate of the end position.
-
-    Yield
+    polygon_points : list or ndarray
+        Array of points that define the polygon.
+    algorithm : str
+        One of ALGORITHMS.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    engines : list
+        Engines auto may pick, every engine by default.
+
+    Returns
     -------
-    list
-        List of points that define the line.
+    engine : str
+        The engine to fill the polygon with.
+    predicted : float
+        Predicted fill time of the engine in seconds, None when the engine
+        is not calibrated.
     """
+    points = vertex_array(polygon_points)
+    features = shape_features(points, bounding_box(points[:, 0], points[:, 1], shape))
 
-    # calculate delta x and delta y
-    dx = x1 - x0
-    dy = y1 - y0
-
-    xsign = 1 if dx > 0 else -1
-    ysign = 1 if dy > 0 else -1
+    if algorithm == "auto":
+        return cost_model.choose(features, engines)
 
-    # get abs value of delta x and delta y
-    dx = abs(dx)
-    dy = abs(dy)
+    return algorithm, cost_model.predict(algorithm, features)
 
-    # compare delta x and delta y
-    if dx > dy:
-        xx, xy, yx, yy = xsign, 0, 0, ysign
-    else:
-        dx, dy = dy, dx
-        xx, xy, yx, yy = 0, ysign, xsign, 0
 
-    D = 2 * dy - dx
-    y = 0
-
-    # calculate slope based on P value
-    for x in range(dx + 1):
-        yield x0 + x * xx + y * yx, y0 + x * xy + y * yy
-        if D >= 0:
-            y += 1
-            D -= 2 * dx
-        D += 2 * dy
-
-
-def point_in_polygons(column_points, row_points, column_i, row_i):
+def fill_rows(algorithm, rows, columns, nparr, workers=1):
     """
-    Test relative point position to a polygon.
+    Fill a polygon with one of the row by row algorithms.
+
+    Large arrays filled with one of THREAD_ALGORITHMS are split in bands of
+    rows filled concurrently by a thread pool. Every band is a disjoint view
+    of the array, so the result is the same as with a single thread.
 
     Parameters
     ----------
-    column_points : nparray
-        Array of x coordinates of the polygon.
-    row_points : nparray
-        Array of y coordinates of the polygon.
-    column_i : int
-        X coordinate of the point.
-    row_i : int
-        Y coordinate of the point.
+    algorithm : str
+        One of BAND_ALGORITHMS.
+    rows : ndarray
+        Row coordinates of vertices of polygon, in array coordinates.
+    columns : ndarray
+        Column coordinates of vertices of polygon, in array coordinates.
+    nparr : ndarray
+        Array to fill, rows outside of it are skipped.
+    workers : int
+        Number of threads, FILL_THREADS when None.
 
     Returns
     -------
-    c : Point relative position to the polygon
-        O: outside
-        1: inside
-        2: vertex
-        3: edge.
+    nparr : numpy.ndarray
+        The filled array.
     """
-    nr_vertices = column_points.shape[0]
+    workers = FILL_THREADS if workers is None else workers
+    workers = min(workers, nparr.shape[0])
+    if (
+        algorithm in THREAD_ALGORITHMS
+        and workers > 1
+        and nparr.size >= PARALLEL_FILL_PIXELS
+    ):
+        return fill_rows_parallel(rows, columns, nparr, workers)
+
+    if algorithm == "rourke":
+        return fill_polyline_rourke(rows, columns, nparr)
+    if algorithm == "fast":
+        return fill_polygon_fast(nparr, rows, columns)
 
-    x0 = np.float64(0.0)
-    x1 = np.float64(0.0)
-    y0 = np.float64(0.0)
-    y1 = np.float64(0.0)
+    return fill_polyline_scanline(rows, columns, nparr)
 
-    l_cross = 0
-    r_cross = 0
 
-    # Tolerance for vertices labelling
-    eps = 1e-12
+def fill_rows_parallel(rows, columns, nparr, workers):
+    """
+    Fill bands of rows of an array concurrently with the scanline engine.
+
+    Parameters
+    ----------
+    rows : ndarray
+        Row coordinates of vertices of polygon, in array coordinates.
+    columns : ndarray
+        Column coordinates of vertices of polygon, in array coordinates.
+    nparr : ndarray
+        Array to fill.
+    workers : int
+        Number of threads and bands.
 
-    # Initialization the loop
-    x1 = column_points[nr_vertices - 1] - column_i
-    y1 = row_points[nr_vertices - 1] - row_i
+    Returns
+    -------
+    nparr : numpy.ndarray
+        The filled array.
+    """
+    bounds = np.linspace(0, nparr.shape[0], workers + 1).astype(np.int64)
+    edges = edge_table(rows, columns)
+
+    def fill_band(first_row, stop_row):
+        # the band is filled like an array starting at its first row
+        fill_polyline_scanline(
+            rows - first_row,
+            columns,
+            nparr[first_row:stop_row],
+            band_edges(edges, first_row, stop_row),
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # list() re-raises the errors of the bands
+        list(pool.map(fill_band, bounds[:-1], bounds[1:]))
 
-    # For each edge e = (i-1, i), see if it crosses ray
-    for vertice in range(nr_vertices):
-        x0 = column_points[vertice] - column_i
-        y0 = row_points[vertice] - row_i
+    return nparr
 
-        if (-eps < x0 < eps) and (-eps < y0 < eps):
-            # it is a vertex with an eps tolerance
-            return 2
 
-        # if e straddles the x-axis
-        if (y0 > 0) != (y1 > 0):
-            # check if it crosses the ray
-            if ((x0 * y1 - x1 * y0) / (y1 - y0)) > 0:
-                r_cross += 1
-        # if reversed e straddles the x-axis
-        if (y0 < 0) != (y1 < 0):
-            # check if it crosses the ray
-            if ((x0 * y1 - x1 * y0) / (y1 - y0)) < 0:
-                l_cross += 1
+def fill_cache_key(
+    polygon_points,
+    algorithm,
+    flood_x=None,
+    flood_y=None,
+    shape=CANVAS_SHAPE,
+    connectivity=4,
+):
+    """
+    Cache key of a fill_polyline_cropped call.
 
-        x1 = x0
-        y1 = y0
+    Parameters
+    ----------
+    polygon_points : list
+        Array of points that define the polygon.
+    algorithm : str
+        Algorithm to use for filling the polygon.
+    flood_x : int
+        Column of the flood fill start position on the canvas.
+    flood_y : int
+        Row of the flood fill start position on the canvas.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    connectivity : int
+        Pixel connectivity of the flood fill, 4 or 8.
 
-    if (r_cross & 1) != (l_cross & 1):
-        # on edge if left and right crossings not of same parity
-        return 3
+    Returns
+    -------
+    str
+        Hex digest identifying the fill result.
+    """
+    params = [algorithm, list(shape)]
 
-    if r_cross & 1:
-        # inside if odd number of crossings
-        return 1
+    # the flood start and connectivity only change flood results
+    if algorithm == "flood":
+        params.extend([flood_x, flood_y, connectivity])
 
-    # outside if even number of crossings
-    return 0
+    return cache_key(polygon_points, *params)
 
 
-def fill_polyline_rourke(row, column, nparr):
+def fill_polygon_fast(nparr, rows, columns):
     """
-    Generate coordinates of pixels within polygon.
+    Fill a polygon defined by a list of points.
 
     Parameters
     ----------
-    row : ndarray
-        Row coordinates of vertices of polygon.
-    column : ndarray
-        Column coordinates of vertices of polygon.
-    nparr : ndarray
-        Array of points that define the filled polygon.
+    points : list of tuples
+        List of points that define the polygon.
+
     Returns
     -------
-    nparr : numpy.ndarray
+    numpy.ndarray
         Array of points that define the filled polygon.
+
     """
-    # check dimension of array
-    rows = np.atleast_1d(row)
-    columns = np.atleast_1d(column)
-
-    # check minimum and maximum row and column values
-    min_row = int(max(0, rows.min()))
-    max_row = int(math.ceil(rows.max()))
-    min_column = int(max(0, columns.min()))
-    max_column = int(math.ceil(columns.max()))
-
-    # make contiguous arrays of row and column coordinates
-    # faster access in memory if they are next to each other
-    row_points = np.ascontiguousarray(rows, "float64")
-    column_points = np.ascontiguousarray(columns, "float64")
-
-    # define output coordinate arrays
-    row_coord_output = []
-    column_coord_output = []
-
-    # verify points in polygon
-    for row_i in range(min_row, max_row + 1):
-        for column_i in range(min_column, max_column + 1):
-            if point_in_polygons(column_points, row_points, column_i, row_i):
-                row_coord_output.append(row_i)
-                column_coord_output.append(column_i)
-    nparr[row_coord_output, column_coord_output] = 1
+    # scikit-image is only loaded by the first fast fill
+    from skimage.draw import polygon
 
-    return nparr
+    try:
+        row_values, column_values = polygon(rows, columns, shape=nparr.shape)
+        nparr[row_values, column_values] = 1
+
+        return nparr
+    except:
+        raise ValueError("Something went wrong filling the polygon. Please try again.")
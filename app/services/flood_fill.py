@@ -0,0 +1,303 @@
+"""
+Outline and flood fill engine.
+"""
+import math
+
+import numpy as np
+
+from app.services.rourke_fill import point_in_polygons
+from app.services.scanline_fill import edge_table, scanline_crossings
+
+
+def fill_polyline_flood(row, column, nparr, seed=None, connectivity=4):
+    """
+    Fill a polygon by drawing its outline and flood filling the inside.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+    nparr : ndarray
+        Array of points that define the filled polygon.
+    seed : tuple
+        (row, column) start position of the flood fill, an interior
+        point is picked when omitted.
+    connectivity : int
+        Pixel connectivity of the flood fill, 4 or 8. The Bresenham outline
+        is 8-connected, so an 8-connected fill leaks through diagonal steps.
+
+    Returns
+    -------
+    nparr : numpy.ndarray
+        Array of points that define the filled polygon.
+    """
+    # apply bresemham's line algorithm to every edge at once
+    outline_rows, outline_columns = bresenham_outline(row, column)
+
+    # Fill the points
+    inside = (
+        (outline_rows >= 0)
+        & (outline_rows < nparr.shape[0])
+        & (outline_columns >= 0)
+        & (outline_columns < nparr.shape[1])
+    )
+    nparr[outline_rows[inside], outline_columns[inside]] = 1
+
+    if seed is None:
+        seed = interior_seed(row, column, nparr)
+
+    if seed is not None:
+        flood_fill_span(seed[0], seed[1], 0, 1, nparr, connectivity)
+
+    return nparr
+
+
+def interior_seed(row, column, nparr):
+    """
+    Find a flood fill start position strictly inside the polygon.
+
+    Scanlines are tried from the middle of the polygon outwards and the
+    first pixel that is not on the outline and that point_in_polygons
+    reports as inside is returned.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+    nparr : ndarray
+        Array holding the polygon outline.
+
+    Returns
+    -------
+    tuple or None
+        (row, column) of the seed, None when the polygon has no inside
+        pixel besides its outline.
+    """
+    row_points = np.ascontiguousarray(np.atleast_1d(row), "float64")
+    column_points = np.ascontiguousarray(np.atleast_1d(column), "float64")
+    rows, columns = scanline_crossings(
+        edge_table(row_points, column_points), 0, nparr.shape[0]
+    )
+    if rows.shape[0] == 0:
+        return None
+
+    # try the scanlines closest to the middle row first
+    middle = (rows[0] + rows[-1]) / 2
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    stops = np.r_[starts[1:], rows.shape[0]]
+    for index in np.argsort(np.abs(rows[starts] - middle), kind="stable"):
+        row_i = rows[starts[index]]
+        crossings = columns[starts[index] : stops[index]]
+
+        for first, last in zip(crossings[0::2], crossings[1::2]):
+            first = max(int(math.ceil(first)), 0)
+            last = min(int(math.ceil(last)) - 1, nparr.shape[1] - 1)
+            if first > last:
+                continue
+
+            # pixels of the span that are not on the outline
+            for column_i in first + np.flatnonzero(nparr[row_i, first : last + 1] == 0):
+                if point_in_polygons(column_points, row_points, column_i, row_i) == 1:
+                    return (int(row_i), int(column_i))
+
+    return None
+
+
+def flood_fill_span(row, column, old, new, arr, connectivity=4):
+    """
+    Iterative scanline flood fill.
+
+    Whole horizontal runs of old values are filled at once and only one
+    seed per run of the neighbouring rows is pushed on an explicit stack,
+    so memory is bounded by the number of spans rather than pixels.
+
+    Parameters
+    ----------
+    row : int
+        Row of the start position.
+    column : int
+        Column of the start position.
+    old : int
+        Old value.
+    new : int
+        New value.
+    arr : numpy.ndarray
+        Array of points that define the filled polygon.
+    connectivity : int
+        Pixel connectivity, 4 or 8.
+
+    Returns
+    -------
+    arr : numpy.ndarray
+        Array of points that define the filled polygon.
+    """
+    if connectivity not in (4, 8):
+        raise ValueError("Connectivity must be 4 or 8.")
+
+    height, width = arr.shape
+    if old == new or not (0 <= row < height and 0 <= column < width):
+        return arr
+
+    reach = 1 if connectivity == 8 else 0
+    stack = [(row, column)]
+
+    while stack:
+        row_i, column_i = stack.pop()
+        line = arr[row_i]
+        if line[column_i] != old:
+            continue
+
+        # extend the run to the left and to the right
+        left = np.flatnonzero(line[:column_i] != old)
+        first = left[-1] + 1 if left.shape[0] else 0
+        right = np.flatnonzero(line[column_i:] != old)
+        last = column_i + right[0] - 1 if right.shape[0] else width - 1
+        line[first : last + 1] = new
+
+        # push one seed for every run of old values above and below
+        low = max(first - reach, 0)
+        high = min(last + reach, width - 1)
+        for next_row in (row_i - 1, row_i + 1):
+            if 0 <= next_row < height:
+                candidates = arr[next_row, low : high + 1] == old
+                run_starts = np.flatnonzero(candidates & ~np.r_[False, candidates[:-1]])
+                stack.extend((next_row, low + start) for start in run_starts)
+
+    return arr
+
+
+def flood_fill_4(x, y, old, new, arr):
+    """
+    Flood fill algorithm for 4-connected pixels.
+
+    Parameters
+    ----------
+    x : int
+        X coordinate of the start position.
+    y : int
+        Y coordinate of the start position.
+    old : int
+        Old value.
+    new : int
+        New value.
+    arr : numpy.ndarray
+        Array of points that define the filled polygon.
+    """
+    flood_fill_span(y, x, old, new, arr, connectivity=4)
+
+
+def bresenham(x0, y0, x1, y1):
+    """
+    Bresenham's line algorithm.
+
+    Used to draw lines from one point to another.
+    Yield integer coordinates on the line from (x0, y0) to (x1, y1).
+    Input coordinates should be integers.
+
+    The result will contain both the start and the end point.
+
+    Parameters
+    ----------
+    x0 : int
+        X coordinate of the start position.
+    y0 : int
+        Y coordinate of the start position.
+    x1 : int
+        X coordinate of the end position.
+    y1 : int
+        Y coordinate of the end position.
+
+    Yield
+    -------
+    list
+        List of points that define the line.
+    """
+
+    # calculate delta x and delta y
+    dx = x1 - x0
+    dy = y1 - y0
+
+    xsign = 1 if dx > 0 else -1
+    ysign = 1 if dy > 0 else -1
+
+    # get abs value of delta x and delta y
+    dx = abs(dx)
+    dy = abs(dy)
+
+    # compare delta x and delta y
+    if dx > dy:
+        xx, xy, yx, yy = xsign, 0, 0, ysign
+    else:
+        dx, dy = dy, dx
+        xx, xy, yx, yy = 0, ysign, xsign, 0
+
+    D = 2 * dy - dx
+    y = 0
+
+    # calculate slope based on P value
+    for x in range(dx + 1):
+        yield x0 + x * xx + y * yx, y0 + x * xy + y * yy
+        if D >= 0:
+            y += 1
+            D -= 2 * dx
+        D += 2 * dy
+
+
+def bresenham_outline(row, column):
+    """
+    Vectorized Bresenham's line algorithm over all edges of a polygon.
+
+    Produces the same pixels as running bresenham on every pair of
+    consecutive vertices, closing the polygon, using the closed form
+    minor = (2 * dminor * step + dmajor) // (2 * dmajor) of its decision
+    variable.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+
+    Returns
+    -------
+    rows : numpy.ndarray
+        Row coordinates of the outline pixels.
+    columns : numpy.ndarray
+        Column coordinates of the outline pixels.
+    """
+    x0 = np.atleast_1d(np.asarray(row)).astype(np.int64)
+    y0 = np.atleast_1d(np.asarray(column)).astype(np.int64)
+    x1 = np.roll(x0, -1)
+    y1 = np.roll(y0, -1)
+
+    # calculate delta x and delta y
+    dx = x1 - x0
+    dy = y1 - y0
+    xsign = np.where(dx > 0, 1, -1)
+    ysign = np.where(dy > 0, 1, -1)
+    dx = np.abs(dx)
+    dy = np.abs(dy)
+
+    # step along the major axis of every edge
+    steep = dx <= dy
+    major = np.where(steep, dy, dx)
+    minor = np.where(steep, dx, dy)
+    counts = major + 1
+
+    edge_index = np.repeat(np.arange(counts.shape[0]), counts)
+    steps = np.arange(edge_index.shape[0]) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    major = major[edge_index]
+    offsets = (2 * minor[edge_index] * steps + major) // np.maximum(2 * major, 1)
+
+    steep = steep[edge_index]
+    rows = x0[edge_index] + np.where(steep, offsets, steps) * xsign[edge_index]
+    columns = y0[edge_index] + np.where(steep, steps, offsets) * ysign[edge_index]
+
+    return rows, columns
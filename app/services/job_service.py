@@ -0,0 +1,491 @@
+"""
+Asynchronous fill job service.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import numpy as np
+
+from app.services import filling_service
+from app.services.composite_fill import composite_cache_key, fill_composite
+from app.services.file_management import (MaskFileRows, cached_mask_file,
+                                          commit_cached_file,
+                                          open_cached_encoded,
+                                          open_cached_memmap, save_cached_mask,
+                                          save_cached_spans, stored_mask_box)
+from app.services.fill_cache import fill_cache
+from app.services.filling_service import (BAND_ALGORITHMS, CANVAS_SHAPE,
+                                          bounding_box, fill_cache_key,
+                                          fill_polyline_chunked,
+                                          fill_polyline_cropped, select_engine,
+                                          vertex_array)
+from app.services.mask_operations import (combine_masks, set_operation_box,
+                                          set_operation_cache_key)
+from app.services.metrics_service import StageTimer
+from app.services.preview_service import (PREVIEW_ON_CREATE, preview_path,
+                                          save_preview_image)
+from app.services.span_list import fill_polyline_spans
+from app.services.warmup_service import WARM_UP_ON_STARTUP, warm_up
+
+# worker pool configuration
+FILL_WORKERS = int(os.environ.get("FILL_WORKERS", os.cpu_count() or 1))
+FILL_START_METHOD = os.environ.get("FILL_START_METHOD", "spawn")
+JOB_HISTORY = int(os.environ.get("JOB_HISTORY", 1000))
+
+# masks larger than this are filled band by band into a disk-backed array
+CHUNKED_FILL_BYTES = int(os.environ.get("CHUNKED_FILL_BYTES", 256 * 1024 * 1024))
+
+executor = None
+executor_lock = threading.Lock()
+
+jobs = {}
+jobs_lock = threading.Lock()
+
+
+class FillJob:
+    """
+    State of a fill job running in the worker pool.
+    """
+
+    def __init__(self, name, algorithm):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.algorithm = algorithm
+        self.status = "queued"
+        self.future = None
+        self.result = None
+        self.error = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        """
+        Job representation returned by the API.
+        """
+        status = self.status
+        if status == "queued" and self.future is not None and self.future.running():
+            status = "running"
+
+        timings = {}
+        if self.started_at is not None:
+            timings["queue_time"] = self.started_at - self.queued_at
+        if self.finished_at is not None and self.started_at is not None:
+            timings["run_time"] = self.finished_at - self.started_at
+
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "algorithm": self.algorithm,
+            "status": status,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            **timings,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+def start_worker():
+    """
+    Set up a fill worker process when it starts.
+
+    FILL_WORKERS processes already fill polygons in parallel, so every
+    worker fills with a single thread unless FILL_THREADS is set.
+    """
+    if "FILL_THREADS" not in os.environ:
+        filling_service.FILL_THREADS = 1
+    if WARM_UP_ON_STARTUP:
+        warm_up()
+
+
+def get_executor():
+    """
+    Return the process pool running the fills, creating it on first use.
+    """
+    global executor
+
+    with executor_lock:
+        # a pool whose worker died can not run anything anymore
+        if executor is None or getattr(executor, "_broken", False):
+            executor = ProcessPoolExecutor(
+                max_workers=FILL_WORKERS,
+                mp_context=multiprocessing.get_context(FILL_START_METHOD),
+                initializer=start_worker,
+            )
+
+    return executor
+
+
+def shutdown_executor():
+    """
+    Stop the process pool, waiting for the running fills.
+    """
+    global executor
+
+    with executor_lock:
+        if executor is not None:
+            executor.shutdown(wait=True)
+            executor = None
+
+
+def process_poly(poly_arr, algorithm, file_format="npy", shape=CANVAS_SHAPE):
+    """
+    Fill a polygon and save its mask and, when configured, its preview.
+
+    Runs inside the worker processes, so only picklable values go in and out.
+    Mask and preview files are named after the fill cache key, an identical
+    fill reuses the files already written instead of filling again. auto is
+    resolved to an engine first, so it shares the files of that engine.
+    Masks filled with scanline and stored as rle are never expanded, their
+    runs are written as they are computed. Masks larger than
+    CHUNKED_FILL_BYTES are filled band by band into their file, whatever
+    its format, so they cannot be filled with flood, which needs the whole
+    mask in memory.
+
+    Parameters
+    ----------
+    poly_arr : list
+        Array of points that define the polygon.
+    algorithm : str
+        Algorithm to use for filling the polygon.
+    file_format : str
+        Storage format of the mask file.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    dict
+        Saved file paths, cropped mask placement, fill time, fill cache
+        counter increments, stage durations, the engine with its predicted
+        fill time and the start and end time of the processing.
+    """
+    started_at = time.time()
+    counters = fill_cache.snapshot()
+    timer = StageTimer()
+
+    points = vertex_array(poly_arr)
+    min_row, min_column, max_row, max_column = bounding_box(
+        points[:, 0], points[:, 1], shape
+    )
+    mask_bytes = (max_row - min_row) * (max_column - min_column)
+    chunked = mask_bytes > CHUNKED_FILL_BYTES
+
+    with timer.span("select"):
+        engine, predicted = select_engine(
+            points, algorithm, shape, BAND_ALGORITHMS if chunked else None
+        )
+    if chunked and engine not in BAND_ALGORITHMS:
+        raise ValueError(
+            f"Masks larger than {CHUNKED_FILL_BYTES} bytes can only be filled "
+            f"with {', '.join(BAND_ALGORITHMS)} or auto."
+        )
+
+    # reuse the mask file of an identical fill
+    with timer.span("file_lookup"):
+        key = fill_cache_key(poly_arr, engine, shape=shape)
+        save_file = cached_mask_file(key, file_format)
+    cropped = None
+
+    if save_file is not None:
+        offset = (min_row, min_column)
+        execution_time = 0.0
+    elif file_format == "rle" and engine == "scanline":
+        # the runs are computed and written without a mask
+        spans, execution_time = fill_polyline_spans(points, engine, shape, timer)
+        with timer.span("save"):
+            save_file = save_cached_spans(spans, key)
+        offset = spans.offset
+    elif chunked:
+        # fill band by band straight into the cached file, encoding every
+        # band of a packed or rle file as it is filled
+        with ExitStack() as stack:
+
+            def open_mask(mask_shape):
+                if file_format == "npy":
+                    return open_cached_memmap(key, mask_shape)
+                return stack.enter_context(
+                    open_cached_encoded(
+                        key, file_format, mask_shape, (min_row, min_column), shape
+                    )
+                )
+
+            mask_cropped, execution_time = fill_polyline_chunked(
+                points, engine, open_mask, shape, timer=timer
+            )
+            with timer.span("save"):
+                mask_cropped.mask.flush()
+                save_file = commit_cached_file(
+                    mask_cropped.mask.filename, key, file_format
+                )
+        offset = mask_cropped.offset
+    else:
+        cropped, execution_time = fill_polyline_cropped(
+            points, engine, shape=shape, timer=timer
+        )
+        with timer.span("save"):
+            save_file = save_cached_mask(cropped, key, file_format)
+        offset = cropped.offset
+
+    result = processing_result(
+        save_file,
+        cropped,
+        offset,
+        shape,
+        execution_time,
+        counters,
+        timer,
+        started_at,
+    )
+
+    return {**result, "engine": engine, "predicted": predicted}
+
+
+def process_composite(regions, overlap="last", shape=CANVAS_SHAPE):
+    """
+    Fill labelled regions into one label raster and save it.
+
+    The raster is saved as a single npy file named after the fill cache key,
+    like the masks of process_poly.
+
+    Parameters
+    ----------
+    regions : list of tuple
+        (label, rings) of every region, see fill_composite.
+    overlap : str
+        Overlap policy of the regions, last or first.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    dict
+        The same description as process_poly.
+    """
+    started_at = time.time()
+    counters = fill_cache.snapshot()
+    timer = StageTimer()
+
+    with timer.span("file_lookup"):
+        key = composite_cache_key(regions, overlap, shape)
+        save_file = cached_mask_file(key, "npy")
+    cropped = None
+
+    if save_file is not None:
+        points = np.concatenate(
+            [vertex_array(ring) for _, rings in regions for ring in rings]
+        )
+        offset = bounding_box(points[:, 0], points[:, 1], shape)[0:2]
+        execution_time = 0.0
+    else:
+        cropped, execution_time = fill_composite(regions, shape, overlap, timer)
+        with timer.span("save"):
+            save_file = save_cached_mask(cropped, key, "npy")
+        offset = cropped.offset
+
+    return processing_result(
+        save_file, cropped, offset, shape, execution_time, counters, timer, started_at
+    )
+
+
+def process_set_operation(
+    operation, first, second, file_format="npy", shape=CANVAS_SHAPE
+):
+    """
+    Combine two stored masks with a set operation and save the result.
+
+    The result is saved under a cache key of the operation and the mask
+    files, like the masks of process_poly.
+
+    Parameters
+    ----------
+    operation : str
+        One of SET_OPERATIONS.
+    first : tuple
+        (path, offset) of the first stored mask.
+    second : tuple
+        (path, offset) of the second stored mask.
+    file_format : str
+        Storage format of the mask file.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    dict
+        The same description as process_poly.
+    """
+    started_at = time.time()
+    counters = fill_cache.snapshot()
+    timer = StageTimer()
+
+    with timer.span("file_lookup"):
+        key = set_operation_cache_key(operation, first, second, shape)
+        save_file = cached_mask_file(key, file_format)
+    cropped = None
+
+    if save_file is not None:
+        offset = set_operation_box(
+            operation, stored_mask_box(*first), stored_mask_box(*second)
+        )[0:2]
+        execution_time = 0.0
+    else:
+        start_time = time.perf_counter()
+        with timer.span("combine"):
+            cropped = combine_masks(operation, first, second, shape)
+        execution_time = time.perf_counter() - start_time
+        with timer.span("save"):
+            save_file = save_cached_mask(cropped, key, file_format)
+        offset = cropped.offset
+
+    return processing_result(
+        save_file, cropped, offset, shape, execution_time, counters, timer, started_at
+    )
+
+
+def processing_result(
+    save_file,
+    cropped,
+    offset,
+    shape,
+    execution_time,
+    counters,
+    timer,
+    started_at,
+    preview=True,
+):
+    """
+    Describe a saved mask, rendering its preview when configured.
+    """
+    # previews are rendered on first request unless asked for on create
+    save_plot = preview_path(save_file)
+    if not save_plot.is_file():
+        save_plot = None
+        if PREVIEW_ON_CREATE and preview:
+            with timer.span("preview"):
+                mask = cropped.mask if cropped else MaskFileRows(save_file)
+                save_plot = save_preview_image(mask, save_file)
+
+    cache = {
+        counter: count - counters[counter]
+        for counter, count in fill_cache.snapshot().items()
+    }
+
+    return {
+        "file": str(save_file),
+        "plot": str(save_plot) if save_plot else None,
+        "offset": offset,
+        "shape": shape,
+        "exectime": execution_time,
+        "cache": cache,
+        "stages": timer.stages,
+        "started_at": started_at,
+        "finished_at": time.time(),
+    }
+
+
+def run_fill_batch(fills):
+    """
+    Fill and save many polygons concurrently in the worker pool.
+
+    Parameters
+    ----------
+    fills : list of tuple
+        process_poly arguments of every polygon.
+
+    Returns
+    -------
+    list of dict
+        For every polygon, in order, either {"result": process_poly result}
+        or {"error": message} when its fill failed.
+    """
+    pool = get_executor()
+    futures = [pool.submit(process_poly, *arguments) for arguments in fills]
+
+    outcomes = []
+    for future in futures:
+        try:
+            result = future.result()
+            fill_cache.merge(result["cache"])
+            outcomes.append({"result": result})
+        except Exception as error:  # pylint: disable=broad-except
+            outcomes.append({"error": str(error) or error.__class__.__name__})
+
+    return outcomes
+
+
+def submit_fill_job(
+    poly_arr, algorithm, name, file_format="npy", on_done=None, shape=CANVAS_SHAPE
+):
+    """
+    Queue a fill in the worker pool.
+
+    Parameters
+    ----------
+    poly_arr : list
+        Array of points that define the polygon.
+    algorithm : str
+        Algorithm to use for filling the polygon.
+    name : str
+        Name of the poly item, reported with the job status.
+    file_format : str
+        Storage format of the mask file.
+    on_done : callable
+        Called in this process with the process_poly result once the fill
+        is done, its return value is stored as the job result.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    FillJob
+        The queued job.
+    """
+    job = FillJob(name, algorithm)
+
+    with jobs_lock:
+        jobs[job.id] = job
+
+        # forget the oldest finished jobs
+        finished = [item for item in jobs.values() if item.finished_at is not None]
+        for item in finished[: max(len(jobs) - JOB_HISTORY, 0)]:
+            del jobs[item.id]
+
+    job.future = get_executor().submit(
+        process_poly, poly_arr, algorithm, file_format, shape
+    )
+    job.future.add_done_callback(lambda future: complete_job(job, future, on_done))
+
+    return job
+
+
+def complete_job(job, future, on_done):
+    """
+    Record the outcome of a finished fill job.
+    """
+    try:
+        result = future.result()
+        fill_cache.merge(result["cache"])
+        job.started_at = result["started_at"]
+        job.result = on_done(result) if on_done is not None else result
+        job.status = "done"
+    except Exception as error:  # pylint: disable=broad-except
+        job.error = str(error) or error.__class__.__name__
+        job.status = "failed"
+    finally:
+        job.finished_at = time.time()
+
+
+def get_job(job_id):
+    """
+    Return the job with the given id, None when unknown.
+    """
+    with jobs_lock:
+        return jobs.get(job_id)
@@ -0,0 +1,321 @@
+"""
+Compact mask encoding service.
+"""
+import struct
+
+import numpy as np
+
+from app.services.filling_service import CroppedMask
+
+# magic, format code, mask shape, offset and canvas shape
+HEADER = struct.Struct("<4sB3x6q")
+MAGIC = b"POLY"
+PACKED = 1
+RLE = 2
+
+
+def encode_header(code, cropped):
+    """
+    Encode the header describing a cropped mask.
+
+    Parameters
+    ----------
+    code : int
+        Format code of the payload following the header.
+    cropped : CroppedMask
+        Cropped mask to describe.
+
+    Returns
+    -------
+    bytes
+        Encoded header.
+    """
+    return pack_header(code, cropped.mask.shape, cropped.offset, cropped.shape)
+
+
+def pack_header(code, mask_shape, offset, shape):
+    """
+    Encode the header of a mask known by its placement only.
+
+    Parameters
+    ----------
+    code : int
+        Format code of the payload following the header.
+    mask_shape : tuple
+        (rows, columns) of the cropped mask.
+    offset : tuple
+        (row, column) position of the mask within the canvas.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    bytes
+        Encoded header.
+    """
+    return HEADER.pack(MAGIC, code, *mask_shape, *offset, *shape)
+
+
+def decode_header(data):
+    """
+    Decode the header of an encoded mask.
+
+    Parameters
+    ----------
+    data : bytes
+        Encoded mask.
+
+    Returns
+    -------
+    code : int
+        Format code of the payload.
+    mask_shape : tuple
+        (rows, columns) of the cropped mask.
+    offset : tuple
+        (row, column) position of the mask within the canvas.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Invalid mask data.")
+
+    magic, code, *values = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Invalid mask data.")
+
+    return code, tuple(values[0:2]), tuple(values[2:4]), tuple(values[4:6])
+
+
+def encode_packed(cropped):
+    """
+    Encode a cropped mask with every row bit-packed, 8 pixels per byte.
+
+    Parameters
+    ----------
+    cropped : CroppedMask
+        Cropped mask to encode.
+
+    Returns
+    -------
+    bytes
+        Header followed by the packed rows.
+    """
+    packed = np.packbits(cropped.mask != 0, axis=1)
+
+    return encode_header(PACKED, cropped) + packed.tobytes()
+
+
+def decode_packed(data):
+    """
+    Decode a bit-packed mask.
+
+    Parameters
+    ----------
+    data : bytes
+        Header followed by the packed rows.
+
+    Returns
+    -------
+    CroppedMask
+        Decoded cropped mask.
+    """
+    code, mask_shape, offset, shape = decode_header(data)
+    if code != PACKED:
+        raise ValueError("Invalid mask data.")
+
+    row_bytes = (mask_shape[1] + 7) // 8
+    packed = np.frombuffer(data, dtype=np.uint8, offset=HEADER.size)
+    packed = packed.reshape(mask_shape[0], row_bytes)
+    mask = np.unpackbits(packed, axis=1, count=mask_shape[1])
+
+    return CroppedMask(mask, offset, shape)
+
+
+def mask_runs(mask):
+    """
+    Compute the runs of filled pixels of every row of a mask.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        Mask to encode.
+
+    Returns
+    -------
+    numpy.ndarray
+        int32 array of (row, start column, stop column) triples,
+        stop column excluded.
+    """
+    filled = mask != 0
+    edges = np.zeros((filled.shape[0], filled.shape[1] + 1), dtype=np.int8)
+    edges[:, :-1] = filled
+    edges[:, 1:] -= filled
+
+    # nonzero walks the rows in order, so starts and stops line up
+    start_rows, start_columns = np.nonzero(edges == 1)
+    _, stop_columns = np.nonzero(edges == -1)
+
+    return np.stack([start_rows, start_columns, stop_columns], axis=1).astype(np.int32)
+
+
+def runs_to_mask(runs, mask_shape):
+    """
+    Expand runs of filled pixels into a mask.
+
+    Parameters
+    ----------
+    runs : numpy.ndarray
+        Array of (row, start column, stop column) triples.
+    mask_shape : tuple
+        (rows, columns) of the mask.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 mask with the runs set to 1.
+    """
+    width = mask_shape[1] + 1
+    runs = np.asarray(runs, dtype=np.int64).reshape(-1, 3)
+    edges = np.zeros(mask_shape[0] * width, dtype=np.int8)
+    edges[runs[:, 0] * width + runs[:, 1]] += 1
+    edges[runs[:, 0] * width + runs[:, 2]] -= 1
+    edges = edges.reshape(mask_shape[0], width)
+
+    return np.cumsum(edges, axis=1, dtype=np.int8)[:, :-1].view(np.uint8)
+
+
+def encode_rle(cropped):
+    """
+    Encode a cropped mask as row-wise runs of filled pixels.
+
+    Parameters
+    ----------
+    cropped : CroppedMask
+        Cropped mask to encode.
+
+    Returns
+    -------
+    bytes
+        Header followed by the int32 (row, start, stop) runs.
+    """
+    runs = mask_runs(cropped.mask)
+
+    return encode_header(RLE, cropped) + runs.astype("<i4").tobytes()
+
+
+def decode_rle(data):
+    """
+    Decode a run-length encoded mask.
+
+    Parameters
+    ----------
+    data : bytes
+        Header followed by the int32 (row, start, stop) runs.
+
+    Returns
+    -------
+    CroppedMask
+        Decoded cropped mask.
+    """
+    code, mask_shape, offset, shape = decode_header(data)
+    if code != RLE:
+        raise ValueError("Invalid mask data.")
+
+    runs = np.frombuffer(data, dtype="<i4", offset=HEADER.size).reshape(-1, 3)
+
+    return CroppedMask(runs_to_mask(runs, mask_shape), offset, shape)
+
+
+def read_header(path):
+    """
+    Read the header of an encoded mask file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed or run-length encoded mask file.
+
+    Returns
+    -------
+    tuple
+        Format code, mask shape, offset and canvas shape as decode_header.
+    """
+    with open(path, "rb") as mask_file:
+        return decode_header(mask_file.read(HEADER.size))
+
+
+def read_packed_window(path, mask_shape, rows, columns):
+    """
+    Read a window of a bit-packed mask file without loading the whole file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed mask file.
+    mask_shape : tuple
+        (rows, columns) of the cropped mask.
+    rows : tuple
+        First and stop row of the window within the mask.
+    columns : tuple
+        First and stop column of the window within the mask.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 window of the mask.
+    """
+    row_bytes = (mask_shape[1] + 7) // 8
+    packed = np.memmap(
+        path,
+        dtype=np.uint8,
+        mode="r",
+        offset=HEADER.size,
+        shape=(mask_shape[0], row_bytes),
+    )
+
+    # unpack only the bytes covering the window columns
+    first_byte = columns[0] // 8
+    stop_byte = (columns[1] + 7) // 8
+    window = np.unpackbits(packed[rows[0] : rows[1], first_byte:stop_byte], axis=1)
+    first = columns[0] - first_byte * 8
+
+    return window[:, first : first + columns[1] - columns[0]]
+
+
+def read_rle_window(path, rows, columns):
+    """
+    Read a window of a run-length encoded mask file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the run-length encoded mask file.
+    rows : tuple
+        First and stop row of the window within the mask.
+    columns : tuple
+        First and stop column of the window within the mask.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 window of the mask.
+    """
+    runs = np.fromfile(path, dtype="<i4", offset=HEADER.size).reshape(-1, 3)
+
+    # keep the runs crossing the window, moved into window coordinates
+    runs = runs[
+        (runs[:, 0] >= rows[0])
+        & (runs[:, 0] < rows[1])
+        & (runs[:, 2] > columns[0])
+        & (runs[:, 1] < columns[1])
+    ]
+    runs = np.stack(
+        [
+            runs[:, 0] - rows[0],
+            np.maximum(runs[:, 1], columns[0]) - columns[0],
+            np.minimum(runs[:, 2], columns[1]) - columns[0],
+        ],
+        axis=1,
+    )
+
+    return runs_to_mask(runs, (rows[1] - rows[0], columns[1] - columns[0]))
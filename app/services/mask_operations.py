@@ -0,0 +1,224 @@
+"""
+Mask set operations service.
+
+Stored masks are cropped to the bounding box of their polygon. Two masks
+only interact over the overlap of their boxes, so set operations read the
+overlap and build their result over the smallest window that holds it,
+never over the whole canvas.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from app.services.file_management import (count_mask_pixels, read_mask_window,
+                                          stored_mask_box)
+from app.services.fill_cache import cache_key
+from app.services.filling_service import CANVAS_SHAPE, CroppedMask
+
+# operations combining two stored masks into a new one
+SET_OPERATIONS = ["union", "intersection", "difference"]
+
+
+def overlap_box(first_box, second_box):
+    """
+    Overlap of two canvas windows.
+
+    Parameters
+    ----------
+    first_box : tuple
+        (min_row, min_column, max_row, max_column) of the first window.
+    second_box : tuple
+        (min_row, min_column, max_row, max_column) of the second window.
+
+    Returns
+    -------
+    tuple or None
+        The overlapping window, None when the windows do not overlap.
+    """
+    box = (
+        max(first_box[0], second_box[0]),
+        max(first_box[1], second_box[1]),
+        min(first_box[2], second_box[2]),
+        min(first_box[3], second_box[3]),
+    )
+    if box[0] >= box[2] or box[1] >= box[3]:
+        return None
+
+    return box
+
+
+def set_operation_box(operation, first_box, second_box):
+    """
+    Canvas window holding the result of a set operation.
+
+    Parameters
+    ----------
+    operation : str
+        One of SET_OPERATIONS.
+    first_box : tuple
+        Window of the first mask.
+    second_box : tuple
+        Window of the second mask.
+
+    Returns
+    -------
+    tuple
+        (min_row, min_column, max_row, max_column) of the result.
+    """
+    if operation == "union":
+        return (
+            min(first_box[0], second_box[0]),
+            min(first_box[1], second_box[1]),
+            max(first_box[2], second_box[2]),
+            max(first_box[3], second_box[3]),
+        )
+    if operation == "intersection":
+        box = overlap_box(first_box, second_box)
+        if box is None:
+            raise ValueError("The masks do not overlap.")
+        return box
+    if operation == "difference":
+        return first_box
+
+    raise ValueError(f"Invalid set operation. Pick one of: {', '.join(SET_OPERATIONS)}")
+
+
+def read_box(mask, box):
+    """
+    Read a canvas window of a stored mask as booleans.
+
+    Parameters
+    ----------
+    mask : tuple
+        (path, offset) of the stored mask, the offset of raw npy masks.
+    box : tuple
+        (min_row, min_column, max_row, max_column) canvas window to read.
+
+    Returns
+    -------
+    numpy.ndarray
+        Boolean window, False outside of the mask.
+    """
+    path, offset = mask
+    window = read_mask_window(
+        path, box[0], box[1], box[2] - box[0], box[3] - box[1], offset
+    )
+
+    return window != 0
+
+
+def combine_masks(operation, first, second, shape=CANVAS_SHAPE):
+    """
+    Combine two stored masks with a set operation.
+
+    Only the overlap of the second mask with the result window is read.
+    Composites count as filled wherever they have a label.
+
+    Parameters
+    ----------
+    operation : str
+        One of SET_OPERATIONS, difference removes the second mask from the
+        first.
+    first : tuple
+        (path, offset) of the first stored mask.
+    second : tuple
+        (path, offset) of the second stored mask.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    CroppedMask
+        uint8 mask of the result, cropped to the result window.
+    """
+    first_box = stored_mask_box(*first)
+    second_box = stored_mask_box(*second)
+    box = set_operation_box(operation, first_box, second_box)
+
+    mask = read_box(first, box)
+    overlap = overlap_box(box, second_box)
+    if overlap is not None:
+        window = (
+            slice(overlap[0] - box[0], overlap[2] - box[0]),
+            slice(overlap[1] - box[1], overlap[3] - box[1]),
+        )
+        if operation == "union":
+            mask[window] |= read_box(second, overlap)
+        elif operation == "intersection":
+            mask[window] &= read_box(second, overlap)
+        else:
+            mask[window] &= ~read_box(second, overlap)
+
+    return CroppedMask(mask.view(np.uint8), box[:2], shape)
+
+
+def mask_statistics(first, second):
+    """
+    Pixel counts of the set operations of two stored masks and their IoU.
+
+    Every mask is counted once and only the overlap of the two is read
+    together, the union and difference counts follow from these.
+
+    Parameters
+    ----------
+    first : tuple
+        (path, offset) of the first stored mask.
+    second : tuple
+        (path, offset) of the second stored mask.
+
+    Returns
+    -------
+    dict
+        Filled pixels of both masks, of their intersection, union and
+        difference, and the intersection over union, 0 when both are empty.
+    """
+    first_pixels = count_mask_pixels(first[0])
+    second_pixels = count_mask_pixels(second[0])
+
+    intersection = 0
+    box = overlap_box(stored_mask_box(*first), stored_mask_box(*second))
+    if box is not None:
+        intersection = int(
+            np.count_nonzero(read_box(first, box) & read_box(second, box))
+        )
+
+    union = first_pixels + second_pixels - intersection
+
+    return {
+        "pixels": {
+            "first": first_pixels,
+            "second": second_pixels,
+            "intersection": intersection,
+            "union": union,
+            "difference": first_pixels - intersection,
+        },
+        "iou": intersection / union if union else 0.0,
+    }
+
+
+def set_operation_cache_key(operation, first, second, shape=CANVAS_SHAPE):
+    """
+    Cache key of a combine_masks call.
+
+    Mask files are named after the fill they hold, so the names identify
+    the operands.
+
+    Parameters
+    ----------
+    operation : str
+        One of SET_OPERATIONS.
+    first : tuple
+        (path, offset) of the first stored mask.
+    second : tuple
+        (path, offset) of the second stored mask.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+
+    Returns
+    -------
+    str
+        Hex digest identifying the result.
+    """
+    operands = [[Path(path).name, list(offset)] for path, offset in [first, second]]
+
+    return cache_key(np.empty((0, 2)), operation, operands, list(shape))
@@ -0,0 +1,152 @@
+"""
+Stage timing and metrics service.
+
+Stages are timed with time.perf_counter spans and aggregated into per
+algorithm and stage histograms, exposed in the Prometheus text format.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# histogram bucket upper bounds in seconds
+STAGE_BUCKETS = [
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+]
+
+
+class StageTimer:
+    """
+    Durations of the named stages of one request.
+
+    Attributes
+    ----------
+    stages : dict
+        Seconds spent in every stage, in the order the stages first ran.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Time the enclosed block as a stage, repeated spans add up.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        """
+        Add seconds to a stage.
+        """
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def merge(self, stages):
+        """
+        Add the stages timed elsewhere, e.g. in a worker process.
+        """
+        for stage, seconds in stages.items():
+            self.record(stage, seconds)
+
+    def to_dict(self):
+        """
+        Stage durations with their total.
+        """
+        return {**self.stages, "total": sum(self.stages.values())}
+
+
+@contextmanager
+def stage_span(timer, stage):
+    """
+    Time a stage when a timer is given, do nothing otherwise.
+    """
+    if timer is None:
+        yield
+        return
+
+    with timer.span(stage):
+        yield
+
+
+class StageMetrics:
+    """
+    Histograms of the stage durations by algorithm and stage.
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = list(buckets or STAGE_BUCKETS)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, algorithm, stage, seconds):
+        """
+        Count one stage duration.
+        """
+        with self.lock:
+            series = self.series.setdefault(
+                (algorithm, stage),
+                {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0},
+            )
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def observe_stages(self, algorithm, stages):
+        """
+        Count every stage duration of a request.
+        """
+        for stage, seconds in stages.items():
+            self.observe(algorithm, stage, seconds)
+
+    def render(self):
+        """
+        Histograms in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP poly_stage_seconds Duration of the poly processing stages.",
+            "# TYPE poly_stage_seconds histogram",
+        ]
+
+        with self.lock:
+            for (algorithm, stage), series in sorted(self.series.items()):
+                labels = f'algorithm="{algorithm}",stage="{stage}"'
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(
+                        f'poly_stage_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+                lines.append(
+                    f'poly_stage_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}'
+                )
+                lines.append(f"poly_stage_seconds_sum{{{labels}}} {series['sum']}")
+                lines.append(f"poly_stage_seconds_count{{{labels}}} {series['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """
+        Forget every observation.
+        """
+        with self.lock:
+            self.series.clear()
+
+
+# process wide stage histograms
+stage_metrics = StageMetrics()
@@ -0,0 +1,164 @@
+"""
+Mask preview rendering service.
+"""
+import io
+import math
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+# preview configuration
+PREVIEW_MAX_SIZE = int(os.environ.get("PREVIEW_MAX_SIZE", 1024))
+PREVIEW_MODE = os.environ.get("PREVIEW_MODE", "max")
+PREVIEW_ON_CREATE = os.environ.get("PREVIEW_ON_CREATE", "false").lower() in [
+    "1",
+    "true",
+    "yes",
+]
+PREVIEW_MODES = ["max", "mean"]
+
+# pixels of a mask read and downsampled at a time
+PREVIEW_BAND_PIXELS = int(os.environ.get("PREVIEW_BAND_PIXELS", 16 * 1024 * 1024))
+
+
+def downsample_blocks(band, factor, mode):
+    """
+    Reduce a band of rows by square blocks.
+
+    Parameters
+    ----------
+    band : numpy.ndarray
+        Rows to reduce, a whole number of blocks high unless they are the
+        last rows of the mask.
+    factor : int
+        Side of the blocks.
+    mode : str
+        Downsampling mode, max or mean.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 grey levels of the blocks, 255 for filled blocks.
+    """
+    filled = np.asarray(band) != 0
+    if factor == 1:
+        return filled.astype(np.uint8) * 255
+
+    # pad to whole blocks and reduce every block
+    rows = math.ceil(filled.shape[0] / factor)
+    columns = math.ceil(filled.shape[1] / factor)
+    padded = np.zeros((rows * factor, columns * factor), dtype=np.uint8)
+    padded[: filled.shape[0], : filled.shape[1]] = filled
+    blocks = padded.reshape(rows, factor, columns, factor)
+
+    if mode == "max":
+        return blocks.max(axis=(1, 3)) * np.uint8(255)
+
+    counts = blocks.sum(axis=(1, 3), dtype=np.uint32)
+    return (counts * 255 // (factor * factor)).astype(np.uint8)
+
+
+def downsample_mask(mask, max_size=PREVIEW_MAX_SIZE, mode=PREVIEW_MODE):
+    """
+    Downsample a mask by square blocks to fit a maximum size.
+
+    The mask is read and reduced a band of rows at a time, so a memory
+    mapped or stored mask is never loaded whole.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray or MaskFileRows
+        Mask to downsample, any array whose rows can be sliced.
+    max_size : int
+        Largest number of rows or columns of the result.
+    mode : str
+        max to keep a block lit when any of its pixels is filled, mean to
+        shade it by the share of filled pixels.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 grey levels, 255 for filled blocks.
+    """
+    if mode not in PREVIEW_MODES:
+        raise ValueError("Invalid preview mode.")
+
+    if mask.shape[0] == 0 or mask.shape[1] == 0:
+        return np.zeros((1, 1), dtype=np.uint8)
+
+    factor = max(1, math.ceil(max(mask.shape) / max_size))
+    band_rows = factor * max(1, PREVIEW_BAND_PIXELS // (factor * mask.shape[1]))
+
+    return np.concatenate(
+        [
+            downsample_blocks(mask[first_row : first_row + band_rows], factor, mode)
+            for first_row in range(0, mask.shape[0], band_rows)
+        ]
+    )
+
+
+def render_preview(mask, max_size=PREVIEW_MAX_SIZE, mode=PREVIEW_MODE):
+    """
+    Render a mask preview as a PNG image.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray or MaskFileRows
+        Mask to render.
+    max_size : int
+        Largest width or height of the image.
+    mode : str
+        Downsampling mode, max or mean.
+
+    Returns
+    -------
+    bytes
+        The PNG image.
+    """
+    # Pillow is only loaded by the first preview
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(downsample_mask(mask, max_size, mode), mode="L").save(
+        buffer, format="PNG"
+    )
+
+    return buffer.getvalue()
+
+
+def preview_path(mask_path):
+    """
+    Path of the preview image of a mask file.
+    """
+    mask_path = Path(mask_path)
+
+    return mask_path.with_name(f"{mask_path.stem}-preview.png")
+
+
+def save_preview_image(mask, mask_path):
+    """
+    Save the preview image of a mask file next to it.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray or MaskFileRows
+        Mask to render.
+    mask_path : str
+        Path of the mask file the preview belongs to.
+
+    Returns
+    -------
+    Path
+        Path of the preview image.
+    """
+    try:
+        loc_path = preview_path(mask_path)
+        temp_path = loc_path.with_name(f"{uuid.uuid4().hex}-{loc_path.name}")
+        temp_path.write_bytes(render_preview(mask))
+        os.replace(temp_path, loc_path)
+
+        return loc_path
+    except:
+        raise ValueError("Something went wrong saving the file. Please try again.")
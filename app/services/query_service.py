@@ -0,0 +1,167 @@
+"""
+Poly query service.
+"""
+from sqlalchemy import func, select
+
+from app.models import Poly
+
+# listing page sizes
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# columns that can be selected when listing, id and name are always selected
+LIST_FIELDS = [
+    "id",
+    "name",
+    "npinput",
+    "xsize",
+    "ysize",
+    "xoffset",
+    "yoffset",
+    "imagefile",
+    "arrayfile",
+    "fileformat",
+    "exectime",
+    "algorithm",
+    "engine",
+    "predictedtime",
+    "area",
+    "perimeter",
+    "xcentroid",
+    "ycentroid",
+]
+
+# npinput can be megabytes per row, it is only listed when asked for
+DEFAULT_LIST_FIELDS = [field for field in LIST_FIELDS if field != "npinput"]
+
+
+def parse_list_fields(fields=None):
+    """
+    Parse the comma separated field selection of a listing.
+
+    Parameters
+    ----------
+    fields : str
+        Comma separated column names, None for the default columns.
+
+    Returns
+    -------
+    list
+        Selected column names, id and name first.
+    """
+    if not fields:
+        return list(DEFAULT_LIST_FIELDS)
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in LIST_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Invalid fields: {', '.join(unknown)}. Pick from: {', '.join(LIST_FIELDS)}"
+        )
+
+    return ["id", "name"] + [field for field in LIST_FIELDS[2:] if field in selected]
+
+
+def poly_list_statement(
+    after_id=None,
+    limit=DEFAULT_PAGE_SIZE,
+    algorithm=None,
+    name_prefix=None,
+    fields=None,
+    min_area=None,
+    max_area=None,
+    min_perimeter=None,
+    max_perimeter=None,
+):
+    """
+    Build the keyset paginated listing query of poly items.
+
+    Parameters
+    ----------
+    after_id : int
+        Only list the items with a greater id.
+    limit : int
+        Largest number of items to list.
+    algorithm : str
+        Only list the items filled with this algorithm.
+    name_prefix : str
+        Only list the items whose name starts with this prefix.
+    fields : str
+        Comma separated column names to select.
+    min_area : float
+        Only list the items with at least this area.
+    max_area : float
+        Only list the items with at most this area.
+    min_perimeter : float
+        Only list the items with at least this perimeter.
+    max_perimeter : float
+        Only list the items with at most this perimeter.
+
+    Returns
+    -------
+    Select
+        Statement selecting only the requested columns, ordered by id.
+    """
+    columns = [getattr(Poly, field) for field in parse_list_fields(fields)]
+    statement = select(*columns)
+
+    if after_id is not None:
+        statement = statement.where(Poly.id > after_id)
+    if algorithm is not None:
+        statement = statement.where(Poly.algorithm == algorithm)
+    if name_prefix:
+        escaped = (
+            name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        statement = statement.where(Poly.name.like(f"{escaped}%", escape="\\"))
+
+    # items without statistics, e.g. composites, never match a range
+    if min_area is not None:
+        statement = statement.where(Poly.area >= min_area)
+    if max_area is not None:
+        statement = statement.where(Poly.area <= max_area)
+    if min_perimeter is not None:
+        statement = statement.where(Poly.perimeter >= min_perimeter)
+    if max_perimeter is not None:
+        statement = statement.where(Poly.perimeter <= max_perimeter)
+
+    return statement.order_by(Poly.id).limit(limit)
+
+
+def poly_vertices_statement(updated_since=None):
+    """
+    Build the query of the stored vertices of poly items.
+
+    Parameters
+    ----------
+    updated_since : float
+        Only select the items written at or after this time, every item
+        when None.
+
+    Returns
+    -------
+    Select
+        Statement selecting the columns needed to decode the vertices and
+        the time they were written, ordered by id.
+    """
+    statement = select(
+        Poly.id, Poly.algorithm, Poly.npinput, Poly.npvertices, Poly.updated_at
+    )
+    if updated_since is not None:
+        statement = statement.where(Poly.updated_at >= updated_since)
+
+    return statement.order_by(Poly.id)
+
+
+def poly_count_statement():
+    """
+    Build the query counting the stored poly items.
+    """
+    return select(func.count(Poly.id))
+
+
+def poly_ids_statement():
+    """
+    Build the query of the ids of the stored poly items.
+    """
+    return select(Poly.id)
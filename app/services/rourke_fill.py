@@ -0,0 +1,190 @@
+"""
+Point in polygon fill engine.
+"""
+import math
+
+import numpy as np
+
+
+def point_in_polygons(column_points, row_points, column_i, row_i):
+    """
+    Test relative point position to a polygon.
+
+    Parameters
+    ----------
+    column_points : nparray
+        Array of x coordinates of the polygon.
+    row_points : nparray
+        Array of y coordinates of the polygon.
+    column_i : int
+        X coordinate of the point.
+    row_i : int
+        Y coordinate of the point.
+
+    Returns
+    -------
+    c : Point relative position to the polygon
+        O: outside
+        1: inside
+        2: vertex
+        3: edge.
+    """
+    nr_vertices = column_points.shape[0]
+
+    x0 = np.float64(0.0)
+    x1 = np.float64(0.0)
+    y0 = np.float64(0.0)
+    y1 = np.float64(0.0)
+
+    l_cross = 0
+    r_cross = 0
+
+    # Tolerance for vertices labelling
+    eps = 1e-12
+
+    # Initialization the loop
+    x1 = column_points[nr_vertices - 1] - column_i
+    y1 = row_points[nr_vertices - 1] - row_i
+
+    # For each edge e = (i-1, i), see if it crosses ray
+    for vertice in range(nr_vertices):
+        x0 = column_points[vertice] - column_i
+        y0 = row_points[vertice] - row_i
+
+        if (-eps < x0 < eps) and (-eps < y0 < eps):
+            # it is a vertex with an eps tolerance
+            return 2
+
+        # if e straddles the x-axis
+        if (y0 > 0) != (y1 > 0):
+            # check if it crosses the ray
+            if ((x0 * y1 - x1 * y0) / (y1 - y0)) > 0:
+                r_cross += 1
+        # if reversed e straddles the x-axis
+        if (y0 < 0) != (y1 < 0):
+            # check if it crosses the ray
+            if ((x0 * y1 - x1 * y0) / (y1 - y0)) < 0:
+                l_cross += 1
+
+        x1 = x0
+        y1 = y0
+
+    if (r_cross & 1) != (l_cross & 1):
+        # on edge if left and right crossings not of same parity
+        return 3
+
+    if r_cross & 1:
+        # inside if odd number of crossings
+        return 1
+
+    # outside if even number of crossings
+    return 0
+
+
+def points_in_polygon(column_points, row_points, columns, rows):
+    """
+    Test the position of many points relative to a polygon at once.
+
+    Vectorized over the points with the same crossing rules and results
+    as point_in_polygons, the loop only runs over the polygon edges.
+
+    Parameters
+    ----------
+    column_points : nparray
+        Array of x coordinates of the polygon.
+    row_points : nparray
+        Array of y coordinates of the polygon.
+    columns : nparray
+        X coordinates of the points.
+    rows : nparray
+        Y coordinates of the points.
+
+    Returns
+    -------
+    numpy.ndarray
+        uint8 position of every point, 0 outside, 1 inside, 2 vertex,
+        3 edge.
+    """
+    column_points = np.asarray(column_points, dtype=np.float64)
+    row_points = np.asarray(row_points, dtype=np.float64)
+    columns = np.asarray(columns, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.float64)
+
+    vertex = np.zeros(columns.shape, dtype=bool)
+    r_cross = np.zeros(columns.shape, dtype=bool)
+    l_cross = np.zeros(columns.shape, dtype=bool)
+
+    # Tolerance for vertices labelling
+    eps = 1e-12
+
+    x1 = column_points[-1] - columns
+    y1 = row_points[-1] - rows
+
+    # For each edge e = (i-1, i), count the crossings of every point ray
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for column_i, row_i in zip(column_points, row_points):
+            x0 = column_i - columns
+            y0 = row_i - rows
+
+            vertex |= (np.abs(x0) < eps) & (np.abs(y0) < eps)
+            crossing = (x0 * y1 - x1 * y0) / (y1 - y0)
+
+            # the parity of the crossings is all that is needed
+            r_cross ^= ((y0 > 0) != (y1 > 0)) & (crossing > 0)
+            l_cross ^= ((y0 < 0) != (y1 < 0)) & (crossing < 0)
+
+            x1 = x0
+            y1 = y0
+
+    position = np.where(r_cross, 1, 0).astype(np.uint8)
+    position[r_cross != l_cross] = 3
+    position[vertex] = 2
+
+    return position
+
+
+def fill_polyline_rourke(row, column, nparr):
+    """
+    Generate coordinates of pixels within polygon.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+    nparr : ndarray
+        Array of points that define the filled polygon.
+    Returns
+    -------
+    nparr : numpy.ndarray
+        Array of points that define the filled polygon.
+    """
+    # check dimension of array
+    rows = np.atleast_1d(row)
+    columns = np.atleast_1d(column)
+
+    # check minimum and maximum row and column values
+    min_row = int(max(0, rows.min()))
+    max_row = min(int(math.ceil(rows.max())), nparr.shape[0] - 1)
+    min_column = int(max(0, columns.min()))
+    max_column = min(int(math.ceil(columns.max())), nparr.shape[1] - 1)
+
+    # make contiguous arrays of row and column coordinates
+    # faster access in memory if they are next to each other
+    row_points = np.ascontiguousarray(rows, "float64")
+    column_points = np.ascontiguousarray(columns, "float64")
+
+    # define output coordinate arrays
+    row_coord_output = []
+    column_coord_output = []
+
+    # verify points in polygon
+    for row_i in range(min_row, max_row + 1):
+        for column_i in range(min_column, max_column + 1):
+            if point_in_polygons(column_points, row_points, column_i, row_i):
+                row_coord_output.append(row_i)
+                column_coord_output.append(column_i)
+    nparr[row_coord_output, column_coord_output] = 1
+
+    return nparr
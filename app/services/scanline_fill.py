@@ -0,0 +1,285 @@
+"""
+Scanline polygon fill engine.
+"""
+import numpy as np
+
+
+def edge_table(row, column):
+    """
+    Build the table of non-horizontal polygon edges.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Start row, start column, end row and end column of every edge
+        (i - 1, i) whose end points lie on different rows.
+    """
+    row_points = np.ascontiguousarray(np.atleast_1d(row), "float64")
+    column_points = np.ascontiguousarray(np.atleast_1d(column), "float64")
+
+    # edge i goes from vertex i - 1 to vertex i, like point_in_polygons
+    y0 = np.roll(row_points, 1)
+    x0 = np.roll(column_points, 1)
+    y1 = row_points
+    x1 = column_points
+
+    # horizontal edges never straddle a scanline
+    keep = y0 != y1
+
+    return y0[keep], x0[keep], y1[keep], x1[keep]
+
+
+def scanline_crossings(edges, first_row, last_row, closed_below=True):
+    """
+    Compute the crossings of every scanline with the polygon edges in batch.
+
+    Parameters
+    ----------
+    edges : tuple of numpy.ndarray
+        Edge table as returned by edge_table.
+    first_row : int
+        First scanline to intersect.
+    last_row : int
+        Scanline after the last one to intersect.
+    closed_below : bool
+        True to count edges with (y0 > row) != (y1 > row), False to count
+        edges with (y0 < row) != (y1 < row).
+
+    Returns
+    -------
+    rows : numpy.ndarray
+        Scanline of each crossing.
+    columns : numpy.ndarray
+        Column of each crossing, sorted within each scanline. It lies half
+        a pixel before the first pixel point_in_polygons puts on the far
+        side of the crossing.
+    """
+    y0, x0, y1, x1 = edges
+    y_min = np.minimum(y0, y1)
+    y_max = np.maximum(y0, y1)
+
+    # integer scanlines each edge straddles
+    if closed_below:
+        start = np.ceil(y_min)
+        stop = np.ceil(y_max)
+    else:
+        start = np.floor(y_min) + 1
+        stop = np.floor(y_max) + 1
+    start = np.maximum(start, first_row).astype(np.int64)
+    stop = np.minimum(stop, last_row).astype(np.int64)
+    counts = np.maximum(stop - start, 0)
+
+    # expand every edge into one entry per straddled scanline
+    edge_index = np.repeat(np.arange(counts.shape[0]), counts)
+    steps = np.arange(edge_index.shape[0]) - np.repeat(
+        np.cumsum(counts) - counts, counts
+    )
+    rows = start[edge_index] + steps
+
+    y0, x0, y1, x1 = y0[edge_index], x0[edge_index], y1[edge_index], x1[edge_index]
+    columns = (x0 * (y1 - rows) - x1 * (y0 - rows)) / (y1 - y0)
+
+    # move each crossing half a pixel before the first pixel point_in_polygons
+    # puts on its far side, so fractional crossings round the way rourke does
+    low = np.floor(columns)
+    far_low = crossing_test((y0, x0, y1, x1), rows, low, closed_below)
+    far_high = crossing_test((y0, x0, y1, x1), rows, low + 1, closed_below)
+    columns = np.where(far_low, low, np.where(far_high, low + 1, low + 2)) - 0.5
+
+    order = np.lexsort((columns, rows))
+
+    return rows[order], columns[order]
+
+
+def crossing_test(edges, rows, columns, closed_below=True):
+    """
+    Test pixels against their scanline crossing like point_in_polygons.
+
+    Parameters
+    ----------
+    edges : tuple of numpy.ndarray
+        Start row, start column, end row and end column of the edge of
+        every crossing.
+    rows : ndarray
+        Scanline of each crossing.
+    columns : ndarray
+        Pixel column to test against each crossing.
+    closed_below : bool
+        The crossing rule the crossings were computed with.
+
+    Returns
+    -------
+    numpy.ndarray
+        True where point_in_polygons does not count the crossing on the
+        right of the pixel when closed_below, or counts it on the left of
+        the pixel otherwise.
+    """
+    y0, x0, y1, x1 = edges
+
+    # same operations as point_in_polygons, which walks edge i from vertex
+    # i to vertex i - 1 with coordinates relative to the pixel
+    column_0 = x1 - columns
+    row_0 = y1 - rows
+    column_1 = x0 - columns
+    row_1 = y0 - rows
+    side = (column_0 * row_1 - column_1 * row_0) / (row_1 - row_0)
+
+    if closed_below:
+        return side <= 0
+    return side < 0
+
+
+def fill_polyline_scanline(row, column, nparr, edges=None):
+    """
+    Fill a polygon with a vectorized even-odd scanline rasterizer.
+
+    Pixels are filled with the same semantics as point_in_polygons:
+    inside pixels, edge pixels and vertex pixels are all set.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+    nparr : ndarray
+        Array of points that define the filled polygon.
+    edges : tuple of numpy.ndarray
+        Edge table of the polygon in array rows, built from the vertices
+        when None.
+
+    Returns
+    -------
+    nparr : numpy.ndarray
+        Array of points that define the filled polygon.
+    """
+    if edges is None:
+        edges = edge_table(row, column)
+    width = nparr.shape[1] + 1
+
+    # +1 where a span starts and -1 after it ends, summed along the rows
+    counts = np.zeros(nparr.shape[0] * width, dtype=np.int8)
+    for closed_below in (True, False):
+        rows, columns = scanline_crossings(edges, 0, nparr.shape[0], closed_below)
+        span_rows, first, last = crossing_spans(rows, columns, width - 1, closed_below)
+
+        # the spans of one rule never overlap, so every index is set once
+        keep = first <= last
+        counts[span_rows[keep] * width + first[keep]] += 1
+        counts[span_rows[keep] * width + last[keep] + 1] -= 1
+
+    counts = counts.reshape(nparr.shape[0], width)
+    np.cumsum(counts, axis=1, dtype=np.int8, out=counts)
+    np.copyto(nparr, 1, where=counts[:, :-1] > 0)
+
+    # vertices lying on a pixel are always part of the polygon
+    nparr[vertex_pixels(row, column, nparr.shape)] = 1
+
+    return nparr
+
+
+def crossing_spans(rows, columns, width, closed_below=True):
+    """
+    Pair up the sorted crossings of every scanline into pixel spans.
+
+    Parameters
+    ----------
+    rows : ndarray
+        Scanline of each crossing, as returned by scanline_crossings.
+    columns : ndarray
+        Column of each crossing, sorted within each scanline.
+    width : int
+        Number of columns of the array, spans are clipped to it.
+    closed_below : bool
+        The crossing rule the crossings were computed with.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Row, first column and last column of every span, empty spans have
+        their first column after their last.
+    """
+    # every scanline has an even number of crossings, pair them up
+    span_rows = rows[0::2]
+    if closed_below:
+        # odd number of crossings right of the pixel
+        first = np.ceil(columns[0::2])
+        last = np.ceil(columns[1::2]) - 1
+    else:
+        # odd number of crossings left of the pixel
+        first = np.floor(columns[0::2]) + 1
+        last = np.floor(columns[1::2])
+    first = np.maximum(first, 0).astype(np.int64)
+    last = np.minimum(last, width - 1).astype(np.int64)
+
+    return span_rows, first, last
+
+
+def vertex_pixels(row, column, shape):
+    """
+    Find the vertices lying exactly on a pixel of the array.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon.
+    column : ndarray
+        Column coordinates of vertices of polygon.
+    shape : tuple
+        Shape of the array.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Row and column indices of the vertex pixels.
+    """
+    row_points = np.atleast_1d(np.asarray(row, dtype=np.float64))
+    column_points = np.atleast_1d(np.asarray(column, dtype=np.float64))
+    row_pixels = np.round(row_points)
+    column_pixels = np.round(column_points)
+    on_pixel = (
+        (np.abs(row_points - row_pixels) < 1e-12)
+        & (np.abs(column_points - column_pixels) < 1e-12)
+        & (row_pixels >= 0)
+        & (row_pixels < shape[0])
+        & (column_pixels >= 0)
+        & (column_pixels < shape[1])
+    )
+
+    return (
+        row_pixels[on_pixel].astype(np.int64),
+        column_pixels[on_pixel].astype(np.int64),
+    )
+
+
+def band_edges(edges, first_row, stop_row):
+    """
+    Select the edges reaching a band of rows, moved to the band rows.
+
+    Parameters
+    ----------
+    edges : tuple of numpy.ndarray
+        Edge table as returned by edge_table.
+    first_row : int
+        First row of the band.
+    stop_row : int
+        Row after the last row of the band.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        Edge table of the band, with rows starting at the band's first row.
+    """
+    y0, x0, y1, x1 = edges
+
+    # a row past either end keeps the edges ending between two rows
+    keep = (np.maximum(y0, y1) >= first_row - 1) & (np.minimum(y0, y1) <= stop_row)
+
+    return y0[keep] - first_row, x0[keep], y1[keep] - first_row, x1[keep]
@@ -0,0 +1,373 @@
+"""
+Span list service.
+
+A filled polygon is fully described by the runs of filled pixels of its
+rows, which take memory proportional to the height of the polygon instead of
+its area. The scanline engine emits the runs directly, without a mask.
+"""
+import time
+
+import numpy as np
+
+from app.services.filling_service import (ALGORITHMS, CANVAS_SHAPE,
+                                          CroppedMask, bounding_box,
+                                          fill_polyline_cropped, select_engine,
+                                          vertex_array)
+from app.services.mask_encoding import (HEADER, RLE, decode_header, mask_runs,
+                                        pack_header, runs_to_mask)
+from app.services.metrics_service import stage_span
+from app.services.scanline_fill import (crossing_spans, edge_table,
+                                        scanline_crossings, vertex_pixels)
+
+
+class SpanList:
+    """
+    Filled polygon as the runs of filled pixels of every row.
+
+    The runs use the layout of the rle storage format, so they are exported
+    and loaded without expanding them.
+
+    Attributes
+    ----------
+    runs : numpy.ndarray
+        int32 array of (row, start column, stop column) triples in mask
+        coordinates, stop column excluded. Sorted by row and start column,
+        runs of a row neither overlap nor touch.
+    offset : tuple
+        (row, column) position of the mask window within the canvas.
+    mask_shape : tuple
+        (rows, columns) of the mask window.
+    shape : tuple
+        Logical (rows, columns) shape of the full canvas.
+    """
+
+    def __init__(self, runs, offset, mask_shape, shape):
+        self.runs = np.asarray(runs, dtype=np.int32).reshape(-1, 3)
+        self.offset = (int(offset[0]), int(offset[1]))
+        self.mask_shape = (int(mask_shape[0]), int(mask_shape[1]))
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    @classmethod
+    def from_cropped(cls, cropped):
+        """
+        Compute the runs of a cropped mask.
+
+        Parameters
+        ----------
+        cropped : CroppedMask
+            Cropped mask, every non zero pixel is filled.
+
+        Returns
+        -------
+        SpanList
+            The runs of the mask.
+        """
+        return cls(
+            mask_runs(cropped.mask), cropped.offset, cropped.mask.shape, cropped.shape
+        )
+
+    @classmethod
+    def from_dense(cls, nparr):
+        """
+        Compute the runs of a full canvas, cropped to its filled pixels.
+
+        Parameters
+        ----------
+        nparr : numpy.ndarray
+            Full canvas, every non zero pixel is filled.
+
+        Returns
+        -------
+        SpanList
+            The runs of the canvas.
+        """
+        filled_rows = np.flatnonzero(nparr.any(axis=1))
+        filled_columns = np.flatnonzero(nparr.any(axis=0))
+        if filled_rows.size == 0:
+            return cls(np.empty((0, 3)), (0, 0), (0, 0), nparr.shape)
+
+        window = nparr[
+            filled_rows[0] : filled_rows[-1] + 1,
+            filled_columns[0] : filled_columns[-1] + 1,
+        ]
+
+        return cls.from_cropped(
+            CroppedMask(window, (filled_rows[0], filled_columns[0]), nparr.shape)
+        )
+
+    @property
+    def nbytes(self):
+        """
+        Bytes held by the runs.
+        """
+        return self.runs.nbytes
+
+    def area(self):
+        """
+        Count the filled pixels.
+
+        Returns
+        -------
+        int
+            Total length of the runs.
+        """
+        return int((self.runs[:, 2].astype(np.int64) - self.runs[:, 1]).sum())
+
+    def contains(self, rows, columns):
+        """
+        Test whether canvas pixels are filled.
+
+        Every pixel is looked up with a binary search over the runs.
+
+        Parameters
+        ----------
+        rows : ndarray
+            Canvas rows of the pixels.
+        columns : ndarray
+            Canvas columns of the pixels.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array, True for the filled pixels.
+        """
+        rows = np.asarray(rows, dtype=np.int64) - self.offset[0]
+        columns = np.asarray(columns, dtype=np.int64) - self.offset[1]
+
+        # runs sorted by row and start column are sorted by this key
+        width = self.mask_shape[1] + 1
+        starts = self.runs[:, 0].astype(np.int64) * width + self.runs[:, 1]
+        index = np.searchsorted(starts, rows * width + columns, side="right") - 1
+
+        run = self.runs[np.maximum(index, 0)]
+        return (
+            (index >= 0)
+            & (rows >= 0)
+            & (rows < self.mask_shape[0])
+            & (columns >= 0)
+            & (run[:, 0] == rows)
+            & (columns < run[:, 2])
+        )
+
+    def to_cropped(self):
+        """
+        Expand the runs into a mask sized to the mask window.
+
+        Returns
+        -------
+        CroppedMask
+            uint8 mask with the runs set to 1.
+        """
+        return CroppedMask(
+            runs_to_mask(self.runs, self.mask_shape), self.offset, self.shape
+        )
+
+    def to_dense(self):
+        """
+        Expand the runs onto a full canvas.
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of the logical canvas shape.
+        """
+        return self.to_cropped().to_dense()
+
+
+def merge_spans(rows, starts, stops, width):
+    """
+    Merge overlapping and touching spans of the same rows into runs.
+
+    Parameters
+    ----------
+    rows : ndarray
+        Row of every span.
+    starts : ndarray
+        First column of every span.
+    stops : ndarray
+        Column after the last one of every span, after its start.
+    width : int
+        Number of columns of the mask, no span reaches past it.
+
+    Returns
+    -------
+    numpy.ndarray
+        int32 array of (row, start column, stop column) runs, sorted.
+    """
+    if rows.shape[0] == 0:
+        return np.empty((0, 3), dtype=np.int32)
+
+    order = np.lexsort((starts, rows))
+    rows, starts, stops = rows[order], starts[order], stops[order]
+
+    # spans of a row sort before the next row, whatever their columns
+    row_keys = rows * (width + 2)
+    reach = np.maximum.accumulate(row_keys + stops)
+
+    # a run starts past the furthest stop of the spans before it
+    first = np.ones(rows.shape[0], dtype=bool)
+    first[1:] = row_keys[1:] + starts[1:] > reach[:-1]
+    first = np.flatnonzero(first)
+    last = np.append(first[1:], rows.shape[0]) - 1
+
+    return np.stack(
+        [rows[first], starts[first], reach[last] - row_keys[first]], axis=1
+    ).astype(np.int32)
+
+
+def scanline_spans(row, column, mask_shape, first_row=0, stop_row=None, edges=None):
+    """
+    Compute the runs of the scanline fill of a polygon without a mask.
+
+    The spans are those fill_polyline_scanline assigns, so the runs are the
+    ones of its mask.
+
+    Parameters
+    ----------
+    row : ndarray
+        Row coordinates of vertices of polygon, in mask coordinates.
+    column : ndarray
+        Column coordinates of vertices of polygon, in mask coordinates.
+    mask_shape : tuple
+        (rows, columns) of the mask window.
+    first_row : int
+        First mask row to compute the runs of.
+    stop_row : int
+        Mask row after the last one to compute the runs of, the last row of
+        the mask when None.
+    edges : tuple of numpy.ndarray
+        Edge table of the polygon, built from the vertices when None.
+
+    Returns
+    -------
+    numpy.ndarray
+        int32 array of (row, start column, stop column) runs in mask rows,
+        sorted.
+    """
+    if edges is None:
+        edges = edge_table(row, column)
+    if stop_row is None:
+        stop_row = mask_shape[0]
+    width = mask_shape[1]
+
+    span_rows, starts, stops = [], [], []
+    for closed_below in (True, False):
+        rows, columns = scanline_crossings(edges, first_row, stop_row, closed_below)
+        rows, first, last = crossing_spans(rows, columns, width, closed_below)
+        keep = first <= last
+        span_rows.append(rows[keep])
+        starts.append(first[keep])
+        stops.append(last[keep] + 1)
+
+    # vertices lying on a pixel are always part of the polygon
+    vertex_rows, vertex_columns = vertex_pixels(row, column, mask_shape)
+    in_rows = (vertex_rows >= first_row) & (vertex_rows < stop_row)
+    span_rows.append(vertex_rows[in_rows])
+    starts.append(vertex_columns[in_rows])
+    stops.append(vertex_columns[in_rows] + 1)
+
+    return merge_spans(
+        np.concatenate(span_rows),
+        np.concatenate(starts),
+        np.concatenate(stops),
+        width,
+    )
+
+
+def fill_polyline_spans(
+    polygon_points, algorithm="scanline", shape=CANVAS_SHAPE, timer=None
+):
+    """
+    Fill a polygon into a span list.
+
+    scanline computes the runs directly, no pixel is allocated. The other
+    engines fill a cropped mask, converted to runs.
+
+    Parameters
+    ----------
+    polygon_points : list or ndarray
+        Array of points that define the polygon.
+    algorithm : str
+        Algorithm to use for filling the polygon.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    timer : StageTimer
+        Records the duration of the rasterization when given.
+
+    Returns
+    -------
+    SpanList
+        Runs of the filled polygon.
+    execution_time : float
+        Time taken to fill the polygon.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError("Invalid algorithm.")
+    if algorithm == "auto":
+        algorithm, _ = select_engine(polygon_points, algorithm, shape)
+
+    if algorithm != "scanline":
+        cropped, execution_time = fill_polyline_cropped(
+            polygon_points, algorithm, shape=shape, timer=timer
+        )
+        start_time = time.perf_counter()
+        spans = SpanList.from_cropped(cropped)
+
+        return (spans, execution_time + time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    with stage_span(timer, "rasterize"):
+        points = vertex_array(polygon_points)
+        min_row, min_column, max_row, max_column = bounding_box(
+            points[:, 0], points[:, 1], shape
+        )
+        mask_shape = (max_row - min_row, max_column - min_column)
+        runs = scanline_spans(
+            points[:, 0] - min_row, points[:, 1] - min_column, mask_shape
+        )
+
+    spans = SpanList(runs, (min_row, min_column), mask_shape, shape)
+
+    return (spans, time.perf_counter() - start_time)
+
+
+def encode_spans(spans):
+    """
+    Encode a span list in the rle storage format, like encode_rle.
+
+    Parameters
+    ----------
+    spans : SpanList
+        Runs to encode.
+
+    Returns
+    -------
+    bytes
+        Header followed by the int32 (row, start, stop) runs.
+    """
+    header = pack_header(RLE, spans.mask_shape, spans.offset, spans.shape)
+
+    return header + spans.runs.astype("<i4").tobytes()
+
+
+def decode_spans(data):
+    """
+    Decode a run-length encoded mask into a span list, without expanding it.
+
+    Parameters
+    ----------
+    data : bytes
+        Header followed by the int32 (row, start, stop) runs.
+
+    Returns
+    -------
+    SpanList
+        The decoded runs.
+    """
+    code, mask_shape, offset, shape = decode_header(data)
+    if code != RLE:
+        raise ValueError("Invalid mask data.")
+
+    runs = np.frombuffer(data, dtype="<i4", offset=HEADER.size).reshape(-1, 3)
+
+    return SpanList(runs, offset, mask_shape, shape)
@@ -0,0 +1,293 @@
+"""
+Spatial index service.
+
+Grid of square cells over the canvas, every cell lists the poly items whose
+bounding box touches it. Containment queries take the candidates of the
+cells of the points and test them exactly against the stored vertices.
+"""
+import math
+import os
+import threading
+
+import numpy as np
+
+from app.services.filling_service import vertex_array
+from app.services.query_service import (poly_count_statement,
+                                        poly_ids_statement,
+                                        poly_vertices_statement)
+from app.services.rourke_fill import points_in_polygon
+from app.utils.vertex_encoding import (decode_vertices_binary,
+                                       decode_vertices_json)
+
+# side of the grid cells in pixels
+SPATIAL_INDEX_CELL_SIZE = int(os.environ.get("SPATIAL_INDEX_CELL_SIZE", 256))
+
+# seconds of writes read again by every sync, a row written before the
+# latest one read can be committed after it
+SPATIAL_INDEX_SYNC_WINDOW = float(os.environ.get("SPATIAL_INDEX_SYNC_WINDOW", 5))
+
+
+def stored_vertices(poly):
+    """
+    Decode the stored vertices of a poly item.
+
+    Parameters
+    ----------
+    poly : Poly
+        Poly row, or a row with its id, npvertices, npinput and algorithm.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (N, 2) vertex array, None for composites and rows without
+        vertices.
+    """
+    if poly.algorithm == "composite":
+        return None
+    if poly.npvertices is not None:
+        return decode_vertices_binary(poly.npvertices)
+    if poly.npinput is not None:
+        return decode_vertices_json(poly.npinput)
+
+    return None
+
+
+class GridIndex:
+    """
+    Uniform grid index over the bounding boxes of polygons.
+
+    Attributes
+    ----------
+    cell_size : int
+        Side of the grid cells.
+    cells : dict
+        Ids of the polygons touching every (row, column) cell.
+    polygons : dict
+        Vertices and (min_row, min_column, max_row, max_column) bounding
+        box of every polygon by id.
+    ready : bool
+        Whether the index was built from the database.
+    ids : set
+        Ids of every row read from the database, composites included.
+    updated_at : float
+        Latest write time read from the database, rows written since are
+        picked up by sync_spatial_index.
+    """
+
+    def __init__(self, cell_size=SPATIAL_INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.polygons = {}
+        self.ready = False
+        self.ids = set()
+        self.updated_at = 0.0
+        self.lock = threading.Lock()
+
+    def insert(self, poly_id, points):
+        """
+        Index a polygon by its vertices.
+        """
+        points = vertex_array(points)
+        bbox = (
+            float(points[:, 0].min()),
+            float(points[:, 1].min()),
+            float(points[:, 0].max()),
+            float(points[:, 1].max()),
+        )
+
+        with self.lock:
+            if poly_id in self.polygons:
+                self.discard(poly_id)
+
+            self.polygons[poly_id] = (points, bbox)
+            self.ids.add(poly_id)
+            for cell in self.bbox_cells(bbox):
+                self.cells.setdefault(cell, set()).add(poly_id)
+
+    def remove(self, poly_id):
+        """
+        Forget a polygon.
+        """
+        with self.lock:
+            self.discard(poly_id)
+            self.ids.discard(poly_id)
+
+    def retain(self, poly_ids):
+        """
+        Forget the polygons whose id is not in the set poly_ids.
+        """
+        with self.lock:
+            for poly_id in self.ids - poly_ids:
+                self.discard(poly_id)
+                self.ids.discard(poly_id)
+
+    def discard(self, poly_id):
+        """
+        Forget a polygon, the lock must be held.
+        """
+        entry = self.polygons.pop(poly_id, None)
+        if entry is None:
+            return
+
+        for cell in self.bbox_cells(entry[1]):
+            ids = self.cells.get(cell)
+            if ids is not None:
+                ids.discard(poly_id)
+                if not ids:
+                    del self.cells[cell]
+
+    def bbox_cells(self, bbox):
+        """
+        Cells touched by a bounding box.
+        """
+        min_row, min_column, max_row, max_column = [
+            math.floor(value / self.cell_size) for value in bbox
+        ]
+
+        return [
+            (row, column)
+            for row in range(min_row, max_row + 1)
+            for column in range(min_column, max_column + 1)
+        ]
+
+    def query(self, rows, columns):
+        """
+        Find the polygons containing every point.
+
+        Points on an edge or a vertex are contained, like the filled pixels.
+
+        Parameters
+        ----------
+        rows : ndarray
+            Row coordinates of the points.
+        columns : ndarray
+            Column coordinates of the points.
+
+        Returns
+        -------
+        list of list
+            Sorted ids of the polygons containing every point.
+        """
+        rows = np.asarray(rows, dtype=np.float64)
+        columns = np.asarray(columns, dtype=np.float64)
+        matches = [[] for _ in range(rows.shape[0])]
+        if rows.shape[0] == 0:
+            return matches
+
+        # group the points by cell
+        cells = np.stack(
+            [
+                np.floor(rows / self.cell_size).astype(np.int64),
+                np.floor(columns / self.cell_size).astype(np.int64),
+            ],
+            axis=1,
+        )
+        unique_cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(unique_cells.shape[0] + 1))
+
+        # points of the candidate cells of every polygon
+        candidates = {}
+        with self.lock:
+            for cell_index, cell in enumerate(map(tuple, unique_cells.tolist())):
+                for poly_id in self.cells.get(cell, ()):
+                    candidates.setdefault(poly_id, []).append(
+                        order[bounds[cell_index] : bounds[cell_index + 1]]
+                    )
+            polygons = {poly_id: self.polygons[poly_id] for poly_id in candidates}
+
+        for poly_id in sorted(candidates):
+            points, (min_row, min_column, max_row, max_column) = polygons[poly_id]
+            indices = np.concatenate(candidates[poly_id])
+
+            # bounding box filter, then the exact test
+            inside = (
+                (rows[indices] >= min_row)
+                & (rows[indices] <= max_row)
+                & (columns[indices] >= min_column)
+                & (columns[indices] <= max_column)
+            )
+            indices = indices[inside]
+            if indices.shape[0] == 0:
+                continue
+
+            position = points_in_polygon(
+                points[:, 1], points[:, 0], columns[indices], rows[indices]
+            )
+            for index in indices[position != 0].tolist():
+                matches[index].append(poly_id)
+
+        return matches
+
+    def build(self, polys):
+        """
+        Index every poly row, replacing the indexed polygons.
+        """
+        with self.lock:
+            self.cells.clear()
+            self.polygons.clear()
+            self.ids.clear()
+            self.updated_at = 0.0
+
+        self.update(polys)
+        self.ready = True
+
+    def update(self, polys):
+        """
+        Index poly rows with stored vertices, replacing their old vertices.
+        """
+        for poly in polys:
+            points = stored_vertices(poly)
+            if points is not None:
+                self.insert(poly.id, points)
+            else:
+                self.remove(poly.id)
+            with self.lock:
+                self.ids.add(poly.id)
+                self.updated_at = max(self.updated_at, poly.updated_at or 0.0)
+
+    def clear(self):
+        """
+        Forget every polygon, the index is built again on next use.
+        """
+        with self.lock:
+            self.cells.clear()
+            self.polygons.clear()
+            self.ids.clear()
+            self.updated_at = 0.0
+            self.ready = False
+
+
+# process wide index of the stored poly items
+spatial_index = GridIndex()
+
+
+def sync_spatial_index(session, index=spatial_index):
+    """
+    Build the index from the database, or catch up with the writes since.
+
+    Rows created or edited by other processes are picked up by the time
+    they were written. Every row in the database was read, so fewer rows
+    than read ids means other processes deleted some, whose ids are then
+    looked up and dropped. The index of every process catches up before it
+    is queried.
+
+    Parameters
+    ----------
+    session : Session
+        Database session to read the poly items with.
+    index : GridIndex
+        Index to update.
+    """
+    if not index.ready:
+        index.build(session.execute(poly_vertices_statement()))
+        return
+
+    index.update(
+        session.execute(
+            poly_vertices_statement(index.updated_at - SPATIAL_INDEX_SYNC_WINDOW)
+        )
+    )
+    if session.scalar(poly_count_statement()) < len(index.ids):
+        index.retain({poly_id for (poly_id,) in session.execute(poly_ids_statement())})
@@ -0,0 +1,229 @@
+"""
+Mask streaming service.
+
+The bounding box of a polygon gives the header of its packed or rle mask
+file before a pixel is filled. The header is sent first, then every band of
+rows is encoded and sent as soon as it is filled, so the first bytes do not
+wait for the whole fill. The same bytes are written to the mask file.
+"""
+import os
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from app.services.file_management import (FILE_FORMATS, cached_mask_file,
+                                          commit_cached_file, iter_file_range)
+from app.services.fill_cache import fill_cache
+from app.services.filling_service import (BAND_ALGORITHMS, CANVAS_SHAPE,
+                                          bounding_box, fill_cache_key,
+                                          fill_rows, select_engine,
+                                          vertex_array)
+from app.services.job_service import processing_result
+from app.services.mask_encoding import PACKED, RLE, mask_runs, pack_header
+from app.services.metrics_service import StageTimer
+from app.services.scanline_fill import (band_edges, edge_table,
+                                        fill_polyline_scanline)
+from app.services.span_list import scanline_spans
+
+# rows filled, encoded and sent at a time
+STREAM_BAND_ROWS = int(os.environ.get("STREAM_BAND_ROWS", 256))
+
+# storage formats whose rows can be sent band by band, and their code
+STREAM_FORMATS = {"packed": PACKED, "rle": RLE}
+
+
+class MaskStream:
+    """
+    Mask file of a polygon, encoded band by band while it is filled.
+
+    Iterating the stream yields the bytes of the mask file, written to the
+    disk tier of the fill cache at the same time. A mask already on disk is
+    sent from its file. Only one band of rows is held in memory.
+
+    Attributes
+    ----------
+    engine : str
+        Engine filling the polygon, one of BAND_ALGORITHMS.
+    predicted : float
+        Predicted fill time of the engine in seconds.
+    file_format : str
+        One of STREAM_FORMATS.
+    offset : tuple
+        (row, column) position of the mask within the canvas.
+    mask_shape : tuple
+        (rows, columns) of the mask.
+    shape : tuple
+        Logical (rows, columns) shape of the canvas.
+    result : dict
+        The description of process_poly, set once the whole file was sent.
+    """
+
+    def __init__(
+        self,
+        polygon_points,
+        algorithm,
+        file_format="packed",
+        shape=CANVAS_SHAPE,
+        band_rows=STREAM_BAND_ROWS,
+    ):
+        if file_format not in STREAM_FORMATS:
+            raise ValueError(f"Only {', '.join(STREAM_FORMATS)} masks can be streamed.")
+
+        self.started_at = time.time()
+        self.counters = fill_cache.snapshot()
+        self.timer = StageTimer()
+
+        self.points = vertex_array(polygon_points)
+        with self.timer.span("select"):
+            self.engine, self.predicted = select_engine(
+                self.points, algorithm, shape, BAND_ALGORITHMS
+            )
+        if self.engine not in BAND_ALGORITHMS:
+            raise ValueError(f"Only {', '.join(BAND_ALGORITHMS)} can be streamed.")
+
+        min_row, min_column, max_row, max_column = bounding_box(
+            self.points[:, 0], self.points[:, 1], shape
+        )
+        self.file_format = file_format
+        self.offset = (min_row, min_column)
+        self.mask_shape = (max_row - min_row, max_column - min_column)
+        self.shape = tuple(shape)
+        self.band_rows = band_rows
+        self.result = None
+
+        with self.timer.span("file_lookup"):
+            self.key = fill_cache_key(self.points, self.engine, shape=shape)
+            self.cached_file = cached_mask_file(self.key, file_format)
+
+    def header(self):
+        """
+        Header of the mask file, known from the bounding box alone.
+        """
+        return pack_header(
+            STREAM_FORMATS[self.file_format], self.mask_shape, self.offset, self.shape
+        )
+
+    def content_length(self):
+        """
+        Size of the mask file in bytes, None when it depends on the runs.
+        """
+        if self.cached_file is not None:
+            return self.cached_file.stat().st_size
+        if self.file_format == "rle":
+            return None
+
+        row_bytes = (self.mask_shape[1] + 7) // 8
+        return len(self.header()) + self.mask_shape[0] * row_bytes
+
+    def bands(self):
+        """
+        Fill and encode the mask band by band.
+
+        Yield
+        -------
+        bytes
+            Packed rows or int32 (row, start, stop) runs of the next band.
+        """
+        rows = self.points[:, 0] - self.offset[0]
+        columns = self.points[:, 1] - self.offset[1]
+        edges = edge_table(rows, columns) if self.engine == "scanline" else None
+        band = np.zeros(
+            (min(self.band_rows, self.mask_shape[0]), self.mask_shape[1]), np.uint8
+        )
+
+        for first_row in range(0, self.mask_shape[0], self.band_rows):
+            stop_row = min(first_row + self.band_rows, self.mask_shape[0])
+
+            with self.timer.span("rasterize"):
+                if self.file_format == "rle" and edges is not None:
+                    # the runs of a scanline band are computed without pixels
+                    runs = scanline_spans(
+                        rows, columns, self.mask_shape, first_row, stop_row, edges
+                    )
+                    payload = runs.astype("<i4").tobytes()
+                else:
+                    # the band is filled like a mask starting at its first row
+                    window = band[: stop_row - first_row]
+                    window.fill(0)
+                    if edges is None:
+                        fill_rows(self.engine, rows - first_row, columns, window)
+                    else:
+                        fill_polyline_scanline(
+                            rows - first_row,
+                            columns,
+                            window,
+                            band_edges(edges, first_row, stop_row),
+                        )
+                    payload = self.encode_band(window, first_row)
+
+            yield payload
+
+    def encode_band(self, window, first_row):
+        """
+        Encode a filled band in the storage format.
+        """
+        if self.file_format == "packed":
+            return np.packbits(window != 0, axis=1).tobytes()
+
+        runs = mask_runs(window)
+        runs[:, 0] += first_row
+        return runs.astype("<i4").tobytes()
+
+    def __iter__(self):
+        """
+        Send the mask file, filling and saving it unless it is on disk.
+
+        Yield
+        -------
+        bytes
+            Chunks of the mask file.
+        """
+        if self.cached_file is not None:
+            yield from iter_file_range(
+                self.cached_file, 0, self.cached_file.stat().st_size - 1
+            )
+            self.finish(self.cached_file, 0.0)
+            return
+
+        temp_path = Path(__file__).parents[1] / (
+            f"data/{self.key}-{uuid.uuid4().hex}{FILE_FORMATS[self.file_format]}"
+        )
+        try:
+            with open(temp_path, "wb") as mask_file:
+                header = self.header()
+                with self.timer.span("save"):
+                    mask_file.write(header)
+                yield header
+
+                for payload in self.bands():
+                    with self.timer.span("save"):
+                        mask_file.write(payload)
+                    yield payload
+
+            with self.timer.span("save"):
+                save_file = commit_cached_file(temp_path, self.key, self.file_format)
+        except BaseException:
+            # e.g. the client went away, the partial file is dropped
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        self.finish(save_file, self.timer.stages.get("rasterize", 0.0))
+
+    def finish(self, save_file, execution_time):
+        """
+        Describe the saved mask file once it was sent.
+        """
+        result = processing_result(
+            save_file,
+            None,
+            self.offset,
+            self.shape,
+            execution_time,
+            self.counters,
+            self.timer,
+            self.started_at,
+            preview=False,
+        )
+        self.result = {**result, "engine": self.engine, "predicted": self.predicted}
@@ -0,0 +1,49 @@
+"""
+Warm-up service.
+
+The fill engines and the preview renderer load their libraries on first use.
+Warming up loads them ahead of the first request, at the cost of a slower
+start of the API and of every fill worker.
+"""
+import os
+import time
+
+import numpy as np
+
+from app.services.cost_model import ENGINES
+from app.services.filling_service import fill_polyline_cropped
+from app.services.preview_service import render_preview
+
+# warm the API process and the fill workers up when they start
+WARM_UP_ON_STARTUP = os.environ.get("WARM_UP_ON_STARTUP", "false").lower() in [
+    "1",
+    "true",
+    "yes",
+]
+
+# polygon filled with every engine by the warm-up
+WARM_UP_POLYGON = np.array([[1, 1], [1, 6], [6, 6], [6, 1]])
+
+
+def warm_up():
+    """
+    Run every fill engine and the preview renderer once on a tiny polygon.
+
+    Returns
+    -------
+    dict
+        Seconds spent warming up every engine and the renderer.
+    """
+    timings = {}
+    for engine in ENGINES:
+        start = time.perf_counter()
+        cropped, _ = fill_polyline_cropped(
+            WARM_UP_POLYGON, engine, shape=(8, 8), use_cache=False
+        )
+        timings[engine] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    render_preview(cropped.mask)
+    timings["preview"] = time.perf_counter() - start
+
+    return timings
@@ -0,0 +1,3 @@
+"""
+Utilities module.
+"""
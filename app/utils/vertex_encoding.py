@@ -0,0 +1,194 @@
+"""
+Polygon vertex encoding.
+
+Vertices are stored as little endian int32 (row, column) pairs, 8 bytes per
+point, and decoded with np.frombuffer without copying. The fill widens them
+to int64, see app.services.filling_service.vertex_array.
+"""
+import base64
+import binascii
+import json
+
+import numpy as np
+
+VERTEX_DTYPE = np.dtype("<i4")
+
+# media type of a raw vertex array request body
+VERTEX_MEDIA_TYPE = "application/octet-stream"
+
+
+def check_vertices(points):
+    """
+    Check that an array holds a polygon of finite (row, column) points.
+
+    Parameters
+    ----------
+    points : ndarray
+        Decoded vertices.
+
+    Returns
+    -------
+    numpy.ndarray
+        The same array.
+    """
+    if points.ndim != 2 or points.shape[0] == 0 or points.shape[1] != 2:
+        raise ValueError("Vertices must be a non empty list of [row, column].")
+    if not np.issubdtype(points.dtype, np.number):
+        raise ValueError("Vertices must be numbers.")
+    if not np.isfinite(points).all():
+        raise ValueError("Vertices must be finite.")
+
+    return points
+
+
+def integral_vertices(points):
+    """
+    Narrow vertices to int32 when every coordinate is a whole number.
+
+    Parameters
+    ----------
+    points : ndarray
+        Decoded vertices.
+
+    Returns
+    -------
+    numpy.ndarray
+        An int32 array, or the input when it has fractional coordinates or
+        does not fit in int32.
+    """
+    if points.dtype == VERTEX_DTYPE:
+        return points
+
+    info = np.iinfo(VERTEX_DTYPE)
+    if (
+        np.array_equal(points, np.round(points))
+        and points.min() >= info.min
+        and points.max() <= info.max
+    ):
+        return points.astype(VERTEX_DTYPE)
+
+    return points
+
+
+def decode_vertices_json(text):
+    """
+    Decode vertices from the JSON text of a nested list.
+
+    Parameters
+    ----------
+    text : str
+        JSON list of [row, column] points.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, 2).
+    """
+    points = np.asarray(json.loads(text))
+
+    return integral_vertices(check_vertices(points))
+
+
+def decode_vertices_list(vertices):
+    """
+    Decode vertices from a list of (row, column) points.
+
+    Parameters
+    ----------
+    vertices : list
+        List of [row, column] points.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, 2).
+    """
+    points = np.asarray(vertices, dtype=np.float64)
+
+    return integral_vertices(check_vertices(points))
+
+
+def decode_vertices_binary(data):
+    """
+    Decode vertices from raw int32 bytes without copying them.
+
+    Parameters
+    ----------
+    data : bytes
+        Little endian int32 row, column pairs.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only int32 view of shape (N, 2) over the bytes.
+    """
+    if len(data) % (2 * VERTEX_DTYPE.itemsize):
+        raise ValueError("Vertex data must hold whole int32 [row, column] pairs.")
+
+    points = np.frombuffer(data, dtype=VERTEX_DTYPE).reshape(-1, 2)
+
+    return check_vertices(points)
+
+
+def decode_vertices_base64(text):
+    """
+    Decode vertices from base64 encoded int32 bytes.
+
+    Parameters
+    ----------
+    text : str
+        Base64 encoded little endian int32 row, column pairs.
+
+    Returns
+    -------
+    numpy.ndarray
+        Read-only int32 array of shape (N, 2).
+    """
+    try:
+        data = base64.b64decode(text, validate=True)
+    except binascii.Error as error:
+        raise ValueError("Vertex data must be valid base64.") from error
+
+    return decode_vertices_binary(data)
+
+
+def encode_vertices(points):
+    """
+    Encode vertices as int32 bytes for storage.
+
+    Parameters
+    ----------
+    points : ndarray
+        Vertices of shape (N, 2).
+
+    Returns
+    -------
+    bytes
+        Little endian int32 row, column pairs, None when the vertices have
+        fractional coordinates.
+    """
+    points = integral_vertices(np.asarray(points))
+    if points.dtype != VERTEX_DTYPE:
+        return None
+
+    return np.ascontiguousarray(points).tobytes()
+
+
+def encode_vertices_base64(data):
+    """
+    Encode stored vertex bytes as base64 text.
+
+    Parameters
+    ----------
+    data : bytes
+        Little endian int32 row, column pairs.
+
+    Returns
+    -------
+    str
+        Base64 text, None when there is no data.
+    """
+    if data is None:
+        return None
+
+    return base64.b64encode(data).decode("ascii")
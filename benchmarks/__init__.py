@@ -0,0 +1,3 @@
+"""
+Fill algorithm benchmarks.
+"""
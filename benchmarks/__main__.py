@@ -0,0 +1,6 @@
+"""
+Run the fill benchmark, see benchmarks.fill_benchmark.
+"""
+from benchmarks.fill_benchmark import main
+
+raise SystemExit(main())
@@ -0,0 +1,138 @@
+"""
+Cost model calibration.
+
+Runs the fill benchmark over every engine, shape and a range of sizes and
+fits the coefficients of the cost model the auto algorithm picks engines
+with. The bundled coefficients are written with:
+
+    python -m benchmarks.calibrate --output app/services/cost_model.json
+"""
+import argparse
+import json
+import platform
+from datetime import datetime, timezone
+
+from app.services.cost_model import (COST_MODEL_FILE, ENGINES, fit_cost_model,
+                                     shape_features)
+from app.services.filling_service import bounding_box
+from benchmarks.fill_benchmark import MAX_WORK, format_result, run_benchmarks
+from benchmarks.shapes import MARGIN, SHAPES
+
+CALIBRATION_SIZES = [16, 32, 64, 128, 256, 512, 1024, 2048]
+CALIBRATION_REPEAT = 3
+
+# larger fast cases than the benchmark runs, to fit its pixels_vertices term
+CALIBRATION_MAX_WORK = {**MAX_WORK, "fast": 1_000_000_000}
+
+
+def case_features(shape, size):
+    """
+    Cost model features of a benchmark case.
+    """
+    points = SHAPES[shape](size)
+    canvas = (size + 2 * MARGIN, size + 2 * MARGIN)
+
+    return shape_features(points, bounding_box(points[:, 0], points[:, 1], canvas))
+
+
+def calibrate(sizes=None, repeat=CALIBRATION_REPEAT, report=None):
+    """
+    Measure every engine and fit the cost model.
+
+    Parameters
+    ----------
+    sizes : list
+        Box sizes to run, CALIBRATION_SIZES by default.
+    repeat : int
+        Number of timed fills per case.
+    report : callable
+        Called with every finished case.
+
+    Returns
+    -------
+    model : CostModel
+        The fitted model.
+    errors : dict
+        Median relative prediction error of every engine on the cases.
+    """
+    results = run_benchmarks(
+        ENGINES,
+        None,
+        sizes or CALIBRATION_SIZES,
+        repeat,
+        CALIBRATION_MAX_WORK,
+        report,
+    )
+    samples = [
+        (
+            result["algorithm"],
+            case_features(result["shape"], result["size"]),
+            result["seconds"],
+        )
+        for result in results.values()
+    ]
+    model = fit_cost_model(samples)
+
+    errors = {}
+    for engine in model.coefficients:
+        relative = sorted(
+            abs(model.predict(engine, features) - seconds) / seconds
+            for sample_engine, features, seconds in samples
+            if sample_engine == engine
+        )
+        errors[engine] = relative[len(relative) // 2]
+
+    return model, errors
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line arguments of the calibration.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.calibrate",
+        description="Calibrate the cost model of the auto algorithm.",
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=CALIBRATION_SIZES)
+    parser.add_argument("--repeat", type=int, default=CALIBRATION_REPEAT)
+    parser.add_argument(
+        "--output", default=COST_MODEL_FILE, help="write the coefficients here"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the calibration from the command line.
+
+    Returns
+    -------
+    int
+        Exit status.
+    """
+    args = parse_args(argv)
+
+    model, errors = calibrate(
+        args.sizes, args.repeat, report=lambda result: print(format_result(result))
+    )
+    for engine, error in errors.items():
+        print(f"{engine:<12}median error {error * 100:.1f}%")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(
+            {
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "errors": errors,
+                **model.to_dict(),
+            },
+            file,
+            indent=2,
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
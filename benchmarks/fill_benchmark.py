@@ -0,0 +1,286 @@
+"""
+Fill algorithm benchmark.
+
+Fills generated polygons with every algorithm at scaled sizes and reports
+wall time, throughput and peak memory. Results are written as a JSON baseline
+and compared against a previous baseline to catch regressions.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from app.services.cost_model import ENGINES
+from app.services.filling_service import ALGORITHMS, fill_polyline_cropped
+from benchmarks.shapes import MARGIN, SHAPES
+
+DEFAULT_SIZES = [64, 256, 1024]
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+
+# slowdowns smaller than this many seconds are timer noise, not regressions
+MIN_REGRESSION_SECONDS = 0.001
+
+# largest pixels times vertices run per algorithm, rourke tests every pixel
+# against every edge in Python and fast in scikit-image, at about 4 ns each
+MAX_WORK = {"rourke": 1_000_000, "fast": 500_000_000}
+
+
+def case_key(algorithm, shape, size, workers=1):
+    """
+    Identifier of a benchmark case in the baseline.
+    """
+    key = f"{algorithm}/{shape}/{size}"
+    if workers != 1:
+        key += f"/{workers}w"
+
+    return key
+
+
+def run_case(algorithm, shape, size, repeat=DEFAULT_REPEAT, workers=1):
+    """
+    Time the fill of one generated polygon.
+
+    Parameters
+    ----------
+    algorithm : str
+        Algorithm to fill the polygon with.
+    shape : str
+        Name of the polygon generator in SHAPES.
+    size : int
+        Side of the box the polygon fits in.
+    repeat : int
+        Number of timed fills, the fastest one is reported.
+    workers : int
+        Threads filling the bands of rows in parallel.
+
+    Returns
+    -------
+    dict
+        Timings, throughput and peak memory of the case.
+    """
+    points = SHAPES[shape](size)
+    canvas = (size + 2 * MARGIN, size + 2 * MARGIN)
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cropped, _ = fill_polyline_cropped(
+            points, algorithm, shape=canvas, use_cache=False, workers=workers
+        )
+        timings.append(time.perf_counter() - start)
+
+    # measured apart from the timings, tracing slows the allocations down
+    tracemalloc.start()
+    fill_polyline_cropped(
+        points, algorithm, shape=canvas, use_cache=False, workers=workers
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seconds = min(timings)
+    pixels = int(cropped.mask.size)
+
+    return {
+        "algorithm": algorithm,
+        "shape": shape,
+        "size": size,
+        "workers": workers,
+        "vertices": int(points.shape[0]),
+        "pixels": pixels,
+        "filled": int(cropped.mask.sum()),
+        "seconds": seconds,
+        "median_seconds": sorted(timings)[len(timings) // 2],
+        "pixels_per_second": pixels / seconds if seconds else None,
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmarks(
+    algorithms=None,
+    shapes=None,
+    sizes=None,
+    repeat=DEFAULT_REPEAT,
+    max_work=None,
+    report=None,
+    workers=None,
+):
+    """
+    Run every combination of algorithm, shape and size.
+
+    Parameters
+    ----------
+    algorithms : list
+        Algorithms to run, every engine by default.
+    shapes : list
+        Polygon generators to run, all of SHAPES by default.
+    sizes : list
+        Box sizes to run.
+    repeat : int
+        Number of timed fills per case.
+    max_work : dict
+        Largest pixels times vertices run per algorithm, MAX_WORK by default.
+    report : callable
+        Called with every finished case.
+    workers : list
+        Thread counts to run every case with, 1 by default.
+
+    Returns
+    -------
+    dict
+        Results by case key.
+    """
+    max_work = MAX_WORK if max_work is None else max_work
+    results = {}
+
+    for algorithm in algorithms or ENGINES:
+        for shape in shapes or list(SHAPES):
+            for size in sizes or DEFAULT_SIZES:
+                work = size * size * len(SHAPES[shape](size))
+                if work > max_work.get(algorithm, work):
+                    continue
+
+                serial = None
+                for count in workers or [1]:
+                    result = run_case(algorithm, shape, size, repeat, count)
+                    if serial is None:
+                        serial = result["seconds"]
+                    result["speedup"] = serial / result["seconds"]
+                    results[case_key(algorithm, shape, size, count)] = result
+                    if report is not None:
+                        report(result)
+
+    return results
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results against a baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Results by case key.
+    baseline : dict
+        Baseline results by case key.
+    threshold : float
+        Allowed relative slowdown, 0.25 allows runs 25% slower.
+
+    Returns
+    -------
+    list
+        (key, baseline seconds, seconds) of every regressed case.
+    """
+    regressions = []
+
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+
+        before, after = baseline[key]["seconds"], result["seconds"]
+        if after > before * (1 + threshold) and after - before > MIN_REGRESSION_SECONDS:
+            regressions.append((key, before, after))
+
+    return regressions
+
+
+def format_result(result):
+    """
+    One line summary of a benchmark case.
+    """
+    key = case_key(
+        result["algorithm"], result["shape"], result["size"], result["workers"]
+    )
+
+    return (
+        f"{key:<32}"
+        f"{result['seconds'] * 1000:>10.3f} ms"
+        f"{(result['pixels_per_second'] or 0) / 1e6:>10.1f} Mpx/s"
+        f"{result['peak_bytes'] / 2**20:>10.2f} MiB"
+        f"{result['speedup']:>8.2f}x"
+    )
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line arguments of the benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Benchmark the fill algorithms."
+    )
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS)
+    parser.add_argument("--shapes", nargs="+", choices=list(SHAPES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--workers",
+        nargs="+",
+        type=int,
+        default=[1],
+        help="thread counts to fill every case with, speedups are against the first",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="run the slow algorithms on every case"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed relative slowdown against the baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the benchmark from the command line.
+
+    Returns
+    -------
+    int
+        Exit status, 1 when a case regressed past the threshold.
+    """
+    args = parse_args(argv)
+
+    results = run_benchmarks(
+        args.algorithms,
+        args.shapes,
+        args.sizes,
+        args.repeat,
+        max_work={} if args.full else None,
+        report=lambda result: print(format_result(result)),
+        workers=args.workers,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for key, before, after in regressions:
+        print(
+            f"REGRESSION {key}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms",
+            file=sys.stderr,
+        )
+
+    return 1 if regressions else 0
@@ -0,0 +1,221 @@
+"""
+Cold start benchmark.
+
+Times the import of the API in a fresh interpreter and the start of a fill
+worker process, from spawning it to the result of its first fill, and
+compares them against a previous baseline like the fill benchmark.
+
+Only the standard library is imported at module level, the worker probe runs
+this module in the spawned process.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+
+# repository root, the fresh interpreters import the app from there
+ROOT = Path(__file__).resolve().parent.parent
+
+# prints the seconds spent importing the API
+APP_PROBE = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "import main\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def time_app_import():
+    """
+    Time the import of the API in a fresh interpreter.
+
+    Returns
+    -------
+    dict
+        Seconds spent importing main and wall time of the interpreter.
+    """
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", APP_PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+    return {
+        "seconds": float(output.strip().splitlines()[-1]),
+        "wall_seconds": time.perf_counter() - start,
+    }
+
+
+def worker_probe():
+    """
+    First job of a fill worker, import the fill job service and fill once.
+
+    Returns
+    -------
+    dict
+        Seconds spent importing and filling in the worker.
+    """
+    start = time.perf_counter()
+    from app.services.job_service import fill_polyline_cropped
+
+    imported = time.perf_counter()
+    fill_polyline_cropped(
+        [[1, 1], [1, 6], [6, 6], [6, 1]], "scanline", shape=(8, 8), use_cache=False
+    )
+
+    return {
+        "import_seconds": imported - start,
+        "fill_seconds": time.perf_counter() - imported,
+    }
+
+
+def time_worker_start(start_method="spawn"):
+    """
+    Time a fill worker from spawning it to the result of its first fill.
+
+    Parameters
+    ----------
+    start_method : str
+        Start method of the worker process, like FILL_START_METHOD.
+
+    Returns
+    -------
+    dict
+        Wall time of the first job with the import and fill times reported
+        by the worker.
+    """
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context(start_method)
+    ) as pool:
+        probe = pool.submit(worker_probe).result()
+        seconds = time.perf_counter() - start
+
+    return {"seconds": seconds, **probe}
+
+
+def run_case(case, repeat=DEFAULT_REPEAT):
+    """
+    Time one cold start case in fresh processes.
+
+    Parameters
+    ----------
+    case : str
+        app or worker.
+    repeat : int
+        Number of fresh processes, the fastest one is reported.
+
+    Returns
+    -------
+    dict
+        Timings of the fastest start with the median time of all starts.
+    """
+    measure = time_app_import if case == "app" else time_worker_start
+    runs = sorted((measure() for _ in range(repeat)), key=lambda run: run["seconds"])
+
+    return {
+        "case": case,
+        **runs[0],
+        "median_seconds": runs[len(runs) // 2]["seconds"],
+    }
+
+
+def format_result(result):
+    """
+    One line summary of a cold start case.
+    """
+    details = "".join(
+        f"{name.replace('_seconds', '')} {seconds * 1000:.1f} ms  "
+        for name, seconds in result.items()
+        if name.endswith("_seconds") and name != "median_seconds"
+    )
+
+    return f"import/{result['case']:<12}{result['seconds'] * 1000:>10.1f} ms  {details}"
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line arguments of the benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_benchmark",
+        description="Benchmark the cold start of the API and of a fill worker.",
+    )
+    parser.add_argument(
+        "--cases", nargs="+", choices=["app", "worker"], default=["app", "worker"]
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="allowed relative slowdown against the baseline",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """
+    Run the benchmark from the command line.
+
+    Returns
+    -------
+    int
+        Exit status, 1 when a case regressed past the threshold.
+    """
+    # imported here so that the worker probe does not load the fill benchmark
+    from benchmarks.fill_benchmark import find_regressions
+
+    args = parse_args(argv)
+
+    results = {}
+    for case in args.cases:
+        result = run_case(case, args.repeat)
+        results[f"import/{case}"] = result
+        print(format_result(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for key, before, after in regressions:
+        print(
+            f"REGRESSION {key}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms",
+            file=sys.stderr,
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
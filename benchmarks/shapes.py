@@ -0,0 +1,86 @@
+"""
+Polygon generators for the fill benchmarks.
+
+Every generator returns an (N, 2) int64 array of (row, column) vertices of a
+polygon that fits a size x size box starting at MARGIN.
+"""
+import numpy as np
+
+MARGIN = 2
+
+# vertex count of the many-vertex circle
+CIRCLE_VERTICES = 4096
+
+
+def rectangle(size):
+    """
+    Axis aligned rectangle, half as wide as it is tall.
+    """
+    top, left = MARGIN, MARGIN
+    bottom, right = MARGIN + size - 1, MARGIN + size // 2
+
+    return np.array([[top, left], [top, right], [bottom, right], [bottom, left]])
+
+
+def convex(size, vertices=12):
+    """
+    Convex polygon with its vertices on an ellipse.
+    """
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+
+    return ellipse_points(size, angles, np.ones(vertices))
+
+
+def star(size, spikes=8):
+    """
+    Concave star alternating between an outer and an inner radius.
+    """
+    angles = np.linspace(0, 2 * np.pi, 2 * spikes, endpoint=False)
+    radii = np.tile([1.0, 0.4], spikes)
+
+    return ellipse_points(size, angles, radii)
+
+
+def spiral(size, turns=3, steps=64):
+    """
+    Spiral strip, a concave polygon with long nested edges.
+    """
+    angles = np.linspace(0, 2 * np.pi * turns, turns * steps)
+    outer = np.linspace(0.3, 1.0, angles.size)
+    inner = outer - 0.25 / turns
+
+    points = np.concatenate(
+        [ellipse_points(size, angles, outer), ellipse_points(size, angles, inner)[::-1]]
+    )
+    return points
+
+
+def circle(size, vertices=CIRCLE_VERTICES):
+    """
+    Circle with many short edges.
+    """
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+
+    return ellipse_points(size, angles, np.ones(vertices))
+
+
+def ellipse_points(size, angles, radii):
+    """
+    Integer vertices at the given angles and relative radii of the box circle.
+    """
+    center = MARGIN + (size - 1) / 2
+    radius = (size - 1) / 2
+
+    rows = center + radius * radii * np.sin(angles)
+    columns = center + radius * radii * np.cos(angles)
+
+    return np.rint(np.stack([rows, columns], axis=1)).astype(np.int64)
+
+
+SHAPES = {
+    "rectangle": rectangle,
+    "convex": convex,
+    "star": star,
+    "spiral": spiral,
+    "circle": circle,
+}
@@ -2,14 +2,88 @@
 Main application module.
 """
 from fastapi import FastAPI
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.config.database import DATABASE_ASYNC, SessionLocal
+from app.routers.composite_router import router as composite_router
+from app.routers.metrics_router import router as metrics_router
+from app.routers.poly_async_router import router as async_router
 from app.routers.poly_router import router
+from app.routers.set_operation_router import router as set_operation_router
+from app.services.job_service import shutdown_executor
+from app.services.spatial_index import sync_spatial_index
+from app.services.warmup_service import WARM_UP_ON_STARTUP, warm_up
+
+
+def include_routers(application, use_async=DATABASE_ASYNC):
+    """
+    Include the API routers, serving the reads from the async router when
+    use_async is set.
+    """
+    # async reads take precedence over the sync routes of the same paths
+    if use_async:
+        application.include_router(
+            router=async_router,
+            prefix="/api/v1",
+            tags=["polys"],
+            responses={404: {"description": "Not found"}},
+        )
+
+    application.include_router(
+        router=router,
+        prefix="/api/v1",
+        tags=["polys"],
+        responses={404: {"description": "Not found"}},
+    )
+
+    application.include_router(
+        router=composite_router,
+        prefix="/api/v1",
+        tags=["polys"],
+        responses={404: {"description": "Not found"}},
+    )
+
+    application.include_router(
+        router=set_operation_router,
+        prefix="/api/v1",
+        tags=["polys"],
+        responses={404: {"description": "Not found"}},
+    )
+
+    application.include_router(router=metrics_router, tags=["metrics"])
+
 
 app = FastAPI()
+include_routers(app)
+
+
+@app.on_event("startup")
+def build_spatial_index():
+    """
+    Index the stored poly items.
+    """
+    session = SessionLocal()
+    try:
+        sync_spatial_index(session)
+    except SQLAlchemyError:
+        # the index is built on the first containment query instead
+        pass
+    finally:
+        session.close()
+
+
+@app.on_event("startup")
+def warm_up_engines():
+    """
+    Load the fill engines and the preview renderer ahead of the first request.
+    """
+    if WARM_UP_ON_STARTUP:
+        warm_up()
+
 
-app.include_router(
-    router=router,
-    prefix="/api/v1",
-    tags=["polys"],
-    responses={404: {"description": "Not found"}},
-)
+@app.on_event("shutdown")
+def stop_workers():
+    """
+    Stop the fill worker pool.
+    """
+    shutdown_executor()
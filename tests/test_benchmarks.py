@@ -0,0 +1,114 @@
+"""
+Benchmark suite tests.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.services import fill_polyline_cropped
+from benchmarks import import_benchmark
+from benchmarks.fill_benchmark import find_regressions, main, run_benchmarks
+from benchmarks.shapes import MARGIN, SHAPES
+
+
+@pytest.mark.parametrize("shape", list(SHAPES))
+def test_shapes_fill_their_box(shape):
+    """
+    Test every generated polygon fits its box and fills part of it.
+    """
+    points = SHAPES[shape](64)
+
+    assert points.min() >= MARGIN
+    assert points.max() < MARGIN + 64
+
+    fast, _ = fill_polyline_cropped(points, "fast", None, None, use_cache=False)
+    scanline, _ = fill_polyline_cropped(points, "scanline", None, None, use_cache=False)
+    assert 0 < fast.mask.sum() <= scanline.mask.sum()
+    assert np.count_nonzero(fast.mask & ~scanline.mask) == 0
+
+
+def test_find_regressions():
+    """
+    Test only slowdowns past the threshold and the noise floor are reported.
+    """
+    baseline = {"a": {"seconds": 0.1}, "b": {"seconds": 0.1}, "c": {"seconds": 1e-5}}
+    results = {
+        "a": {"seconds": 0.12},
+        "b": {"seconds": 0.2},
+        "c": {"seconds": 1e-4},
+        "d": {"seconds": 1.0},
+    }
+
+    assert find_regressions(results, baseline, 0.25) == [("b", 0.1, 0.2)]
+
+
+def test_slow_cases_are_skipped():
+    """
+    Test the cases past the work limit of rourke and fast are not run by
+    default.
+    """
+    results = run_benchmarks(["rourke", "fast"], ["circle"], [16, 1024], repeat=1)
+
+    # 4096 vertices make even the smallest circle too slow for rourke
+    assert set(results) == {"fast/circle/16"}
+
+
+def test_benchmark_baseline(tmp_path):
+    """
+    Test the command line writes a baseline and compares against it.
+    """
+    baseline = tmp_path / "baseline.json"
+    argv = ["--algorithms", "scanline", "--sizes", "16", "--repeat", "1"]
+
+    assert main(argv + ["--output", str(baseline)]) == 0
+
+    results = json.loads(baseline.read_text())["results"]
+    assert set(results) == {f"scanline/{shape}/16" for shape in SHAPES}
+    assert results["scanline/rectangle/16"]["pixels_per_second"] > 0
+
+    # a baseline that ran in no time at all makes every case a regression
+    for result in results.values():
+        result["seconds"] = -1.0
+    baseline.write_text(json.dumps({"results": results}))
+    assert main(argv + ["--baseline", str(baseline)]) == 1
+
+
+def test_benchmark_workers(tmp_path):
+    """
+    Test every worker count is run as its own case with its speedup.
+    """
+    output = tmp_path / "workers.json"
+    argv = ["--algorithms", "scanline", "--shapes", "circle", "--sizes", "16"]
+
+    assert (
+        main(
+            argv + ["--repeat", "1", "--workers", "1", "2"] + ["--output", str(output)]
+        )
+        == 0
+    )
+
+    results = json.loads(output.read_text())["results"]
+    assert set(results) == {"scanline/circle/16", "scanline/circle/16/2w"}
+    assert results["scanline/circle/16"]["speedup"] == 1.0
+    assert (
+        results["scanline/circle/16/2w"]["filled"]
+        == results["scanline/circle/16"]["filled"]
+    )
+
+
+def test_import_benchmark(tmp_path):
+    """
+    Test the cold start benchmark times the API import and a fill worker.
+    """
+    output = tmp_path / "imports.json"
+
+    assert import_benchmark.main(["--repeat", "1", "--output", str(output)]) == 0
+
+    results = json.loads(output.read_text())["results"]
+    assert set(results) == {"import/app", "import/worker"}
+    assert results["import/app"]["seconds"] > 0
+    assert (
+        results["import/worker"]["seconds"]
+        >= results["import/worker"]["import_seconds"]
+    )
@@ -0,0 +1,131 @@
+"""
+Cost model and auto algorithm tests.
+"""
+import numpy as np
+import pytest
+
+from app.services import fill_polyline_cropped
+from app.services.cost_model import (
+    COST_TERMS,
+    CostModel,
+    eligible_engines,
+    fit_cost_model,
+    shape_features,
+)
+from app.services.filling_service import bounding_box, select_engine
+
+
+def features_of(points):
+    """
+    Cost model features of a polygon on a large canvas.
+    """
+    points = np.asarray(points)
+
+    return shape_features(
+        points, bounding_box(points[:, 0], points[:, 1], (10000, 10000))
+    )
+
+
+def test_flood_never_eligible():
+    """
+    Test auto never picks the flood fill, its outline sets other pixels.
+    """
+    assert eligible_engines() == ["rourke", "fast", "scanline"]
+    assert eligible_engines(["flood", "scanline"]) == ["scanline"]
+
+
+def test_auto_mask_does_not_depend_on_the_engine():
+    """
+    Test every engine auto may pick fills a polygon with the same pixels,
+    so the mask of auto does not depend on the calibration.
+    """
+    rng = np.random.default_rng(4)
+
+    for index in range(20):
+        points = rng.integers(0, 40, (int(rng.integers(3, 9)), 2))
+        if index % 2:
+            # fractional vertices round their edge pixels the same way
+            points = np.round(points + rng.random(points.shape), 1)
+        engines = eligible_engines()
+
+        masks = [
+            fill_polyline_cropped(points, engine, shape=(50, 50), use_cache=False)[0]
+            for engine in engines
+        ]
+        for mask in masks[1:]:
+            assert mask.offset == masks[0].offset
+            assert np.array_equal(mask.mask, masks[0].mask)
+
+    # convex whole number polygons included
+    square = [[2, 2], [2, 30], [30, 30], [30, 2]]
+    auto, _ = fill_polyline_cropped(square, "auto", shape=(50, 50), use_cache=False)
+    scanline, _ = fill_polyline_cropped(
+        square, "scanline", shape=(50, 50), use_cache=False
+    )
+    assert np.array_equal(auto.mask, scanline.mask)
+
+
+def test_fit_recovers_coefficients():
+    """
+    Test the fit recovers the coefficients the samples were made with.
+    """
+    rng = np.random.default_rng(3)
+    expected = {
+        engine: {term: float(rng.uniform(1e-7, 1e-5)) for term in terms}
+        for engine, terms in COST_TERMS.items()
+    }
+    truth = CostModel(expected)
+
+    samples = []
+    for _ in range(40):
+        points = rng.integers(0, 500, (int(rng.integers(3, 50)), 2))
+        features = features_of(points)
+        for engine in COST_TERMS:
+            samples.append((engine, features, truth.predict(engine, features)))
+
+    model = fit_cost_model(samples)
+    for engine, terms in expected.items():
+        for term, coefficient in terms.items():
+            assert model.coefficients[engine][term] == pytest.approx(
+                coefficient, rel=1e-3
+            )
+
+
+def test_choose_cheapest_eligible_engine():
+    """
+    Test the cheapest engine is picked among the eligible ones.
+    """
+    model = CostModel(
+        {
+            "flood": {"constant": 1.0},
+            "fast": {"constant": 2.0},
+            "scanline": {"constant": 3.0},
+        }
+    )
+
+    assert model.choose(features_of([[1, 1], [30, 5], [5, 30]])) == ("fast", 2.0)
+    assert model.choose(
+        features_of([[0, 0], [2, 4], [0, 8], [6, 4]]), ["flood", "scanline"]
+    ) == ("scanline", 3.0)
+    assert model.predict("rourke", features_of([[1, 1], [30, 5], [5, 30]])) is None
+
+    with pytest.raises(ValueError):
+        model.choose(features_of([[1, 1], [30, 5], [5, 30]]), ["rourke"])
+
+
+def test_auto_fills_like_its_engine():
+    """
+    Test auto fills with the engine it selects.
+    """
+    points = np.array([[3, 3], [90, 12], [40, 70], [20, 40]])
+
+    engine, predicted = select_engine(points, "auto", (100, 100))
+    assert engine in COST_TERMS
+    assert predicted > 0
+    assert select_engine(points, "scanline", (100, 100))[0] == "scanline"
+
+    auto, _ = fill_polyline_cropped(points, "auto", shape=(100, 100), use_cache=False)
+    expected, _ = fill_polyline_cropped(
+        points, engine, shape=(100, 100), use_cache=False
+    )
+    assert np.array_equal(auto.mask, expected.mask)
@@ -3,10 +3,18 @@ Poly service tests.
 """
 import os
 
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 from numpy import load
 
-from app.services import fill_polyline, save_nparray_to_file
+from app.services import (FILE_FORMATS, CroppedMask, fill_polyline,
+                          fill_polyline_cropped, load_mask_file,
+                          save_mask_to_file, save_nparray_to_file)
+from app.services.file_management import (EncodedMaskFile, parse_byte_range,
+                                          read_mask_window)
+from app.services.mask_encoding import (decode_packed, decode_rle,
+                                        encode_packed, encode_rle)
 from main import app
 
 client = TestClient(app)
@@ -44,3 +52,104 @@ def tests_create_poly():
     # remove the file
     if os.path.isfile(save_file):
         os.remove(save_file)
+
+
+def tests_save_compact_formats():
+    """
+    Test saving a cropped poly in the bit-packed and run-length formats.
+    """
+    points = [[1, 1], [5, 5], [5, 1]]
+    result = fill_polyline_cropped(points, "scanline")
+
+    for file_format in ["packed", "rle"]:
+        save_file = save_mask_to_file(result[0], "test_poly", file_format)
+        loaded = load_mask_file(save_file)
+
+        assert save_file.suffix == FILE_FORMATS[file_format]
+        assert loaded.offset == (1, 1)
+        assert loaded.shape == (19200, 10800)
+        assert np.array_equal(loaded.mask, result[0].mask)
+
+        # remove the file
+        if os.path.isfile(save_file):
+            os.remove(save_file)
+
+
+def tests_mask_encoding_round_trip():
+    """
+    Test encoding and decoding random masks whose width is not
+    a multiple of 8.
+    """
+    rng = np.random.default_rng(0)
+
+    for mask_shape in [(0, 0), (1, 1), (7, 13), (40, 65)]:
+        mask = (rng.random(mask_shape) > 0.5).astype(np.uint8)
+        cropped = CroppedMask(mask, (3, 4), (100, 200))
+
+        packed = decode_packed(encode_packed(cropped))
+        rle = decode_rle(encode_rle(cropped))
+
+        for decoded in [packed, rle]:
+            assert decoded.offset == (3, 4)
+            assert decoded.shape == (100, 200)
+            assert np.array_equal(decoded.mask, mask)
+
+    assert len(encode_rle(CroppedMask(np.ones((100, 100)), (0, 0), (100, 100)))) < 2000
+
+
+def tests_read_mask_window():
+    """
+    Test reading canvas windows from every storage format.
+    """
+    points = [[10, 12], [40, 70], [55, 20]]
+    result = fill_polyline_cropped(points, "scanline", shape=(100, 100))
+    dense = result[0].to_dense()
+
+    for file_format in FILE_FORMATS:
+        save_file = save_mask_to_file(result[0], "test_window", file_format)
+
+        for row, column, size in [(0, 0, 100), (30, 5, 17), (50, 60, 64), (90, 90, 8)]:
+            window = read_mask_window(
+                save_file, row, column, size, size, result[0].offset
+            )
+            expected = np.zeros((size, size), dtype=np.uint8)
+            overlap = dense[row : row + size, column : column + size]
+            expected[: overlap.shape[0], : overlap.shape[1]] = overlap
+
+            assert np.array_equal(window, expected)
+
+        # remove the file
+        if os.path.isfile(save_file):
+            os.remove(save_file)
+
+
+def tests_parse_byte_range():
+    """
+    Test parsing HTTP byte ranges.
+    """
+    assert parse_byte_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_byte_range("bytes=900-", 1000) == (900, 999)
+    assert parse_byte_range("bytes=-100", 1000) == (900, 999)
+    assert parse_byte_range("bytes=990-2000", 1000) == (990, 999)
+    assert parse_byte_range("bytes=0-1,5-9", 1000) is None
+    assert parse_byte_range("items=0-1", 1000) is None
+
+    with pytest.raises(ValueError):
+        parse_byte_range("bytes=1000-", 1000)
+
+
+def tests_encoded_mask_file_cleanup(tmp_path):
+    """
+    Test an encoded mask file is closed, and removed when writing it failed.
+    """
+    path = tmp_path / "mask.npb"
+    with EncodedMaskFile(path, "packed", (2, 9), (0, 0), (10, 10)) as mask_file:
+        mask_file[0:2] = np.ones((2, 9), dtype=np.uint8)
+    assert mask_file.file.closed
+    assert np.array_equal(load_mask_file(path).mask, np.ones((2, 9)))
+
+    with pytest.raises(ValueError):
+        with EncodedMaskFile(path, "rle", (2, 9), (0, 0), (10, 10)) as mask_file:
+            mask_file[1:2] = np.ones((1, 9), dtype=np.uint8)
+    assert mask_file.file.closed
+    assert not path.exists()
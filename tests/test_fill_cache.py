@@ -0,0 +1,75 @@
+"""
+Fill cache tests.
+"""
+import os
+
+import numpy as np
+
+from app.services.fill_cache import FillCache, cache_key, fill_cache
+from app.services.filling_service import CroppedMask, fill_polyline_cropped
+from app.services.job_service import process_poly
+
+
+def test_cache_key_canonical():
+    """
+    Test that the key only depends on the vertex values and parameters.
+    """
+    points = [[1, 1], [5, 5], [5, 1]]
+
+    assert cache_key(points, "fast") == cache_key(np.array(points), "fast")
+    assert cache_key(points, "fast") == cache_key([[1.0, 1.0], [5, 5], [5, 1]], "fast")
+    assert cache_key(points, "fast") != cache_key(points, "rourke")
+    assert cache_key(points, "fast") != cache_key([[1, 1], [5, 5], [5, 2]], "fast")
+
+
+def test_lru_eviction():
+    """
+    Test that the least recently used masks are evicted first.
+    """
+    cache = FillCache(max_bytes=250)
+
+    for key in ["a", "b"]:
+        cache.put(key, CroppedMask(np.zeros((10, 10), np.uint8), (0, 0), (10, 10)))
+    assert cache.get("a") is not None
+
+    cache.put("c", CroppedMask(np.zeros((10, 10), np.uint8), (0, 0), (10, 10)))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 200
+
+
+def test_fill_memory_hit():
+    """
+    Test that an identical fill is served from memory.
+    """
+    points = [[2, 2], [2, 9], [9, 9], [9, 2]]
+    first = fill_polyline_cropped(points, "scanline")
+    hits = fill_cache.stats()["hits"]
+    second = fill_polyline_cropped(points, "scanline")
+
+    assert second[0] is first[0]
+    assert fill_cache.stats()["hits"] == hits + 1
+    assert not second[0].mask.flags.writeable
+
+
+def test_fill_disk_hit():
+    """
+    Test that a re-submission under a new name reuses the mask file.
+    """
+    points = [[3, 3], [3, 17], [11, 17]]
+    first = process_poly(points, "scanline", "packed")
+    second = process_poly(points, "scanline", "packed")
+
+    assert second["file"] == first["file"]
+    assert second["offset"] == first["offset"]
+    assert second["cache"]["disk_hits"] == 1
+
+    # remove the file
+    if os.path.isfile(first["file"]):
+        os.remove(first["file"])
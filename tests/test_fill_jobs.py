@@ -0,0 +1,165 @@
+"""
+Fill job tests.
+"""
+import os
+import time
+
+import numpy as np
+import pytest
+
+from app.services import filling_service, job_service
+from app.services.file_management import load_mask_file
+from app.services.filling_service import fill_polyline_cropped
+from app.services.job_service import (
+    get_job,
+    process_poly,
+    run_fill_batch,
+    start_worker,
+    submit_fill_job,
+)
+
+
+def wait_for_job(job_id, timeout=60):
+    """
+    Poll a job until it is finished.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = get_job(job_id).to_dict()
+        if job["status"] in ["done", "failed"]:
+            return job
+        time.sleep(0.05)
+
+    raise TimeoutError(job_id)
+
+
+def test_fill_job_done():
+    """
+    Test a fill running in the worker pool and its completion callback.
+    """
+    points = [[1, 1], [5, 5], [5, 1]]
+    job = submit_fill_job(
+        points, "scanline", "test_job", "rle", on_done=lambda result: result
+    )
+
+    assert get_job(job.id) is job
+
+    result = wait_for_job(job.id)
+    assert result["status"] == "done"
+    assert result["run_time"] >= 0
+    assert result["queue_time"] >= 0
+    assert result["result"]["offset"] == (1, 1)
+
+    loaded = load_mask_file(result["result"]["file"])
+    assert loaded.mask.sum() == 15
+
+    # remove the file
+    if os.path.isfile(result["result"]["file"]):
+        os.remove(result["result"]["file"])
+
+
+def test_fill_job_failed():
+    """
+    Test a fill job failing in the worker pool.
+    """
+    job = submit_fill_job([[1, 1], [5, 5]], "unknown", "test_job_failed")
+
+    result = wait_for_job(job.id)
+    assert result["status"] == "failed"
+    assert result["error"] == "Invalid algorithm."
+
+
+def test_fill_batch():
+    """
+    Test filling a batch where one polygon fails.
+    """
+    fills = [
+        ([[1, 1], [5, 5], [5, 1]], "scanline", "packed"),
+        ([[1, 1], [5, 5]], "unknown", "packed"),
+        ([[1, 1], [1, 5], [5, 5], [5, 1]], "fast", "rle"),
+    ]
+    outcomes = run_fill_batch(fills)
+
+    assert outcomes[1] == {"error": "Invalid algorithm."}
+    assert load_mask_file(outcomes[0]["result"]["file"]).mask.sum() == 15
+    assert load_mask_file(outcomes[2]["result"]["file"]).mask.sum() == 25
+
+    # remove the file
+    for outcome in [outcomes[0], outcomes[2]]:
+        if os.path.isfile(outcome["result"]["file"]):
+            os.remove(outcome["result"]["file"])
+
+
+def test_chunked_fill_on_large_canvas(monkeypatch):
+    """
+    Test a fill larger than the in-memory limit written band by band.
+    """
+    monkeypatch.setattr(job_service, "CHUNKED_FILL_BYTES", 0)
+    points = [[99000, 99000], [99000, 99999], [99999, 99999], [99999, 99000]]
+
+    result = process_poly(points, "scanline", shape=(100000, 100000))
+    assert result["offset"] == (99000, 99000)
+    assert result["shape"] == (100000, 100000)
+    assert "rasterize" in result["stages"]
+
+    mask = np.load(result["file"], mmap_mode="r")
+    assert mask.shape == (1000, 1000)
+    assert mask.all()
+
+    # remove the file
+    del mask
+    os.remove(result["file"])
+
+
+def test_chunked_fill_rejects_flood(monkeypatch):
+    """
+    Test a flood fill larger than the in-memory limit is rejected.
+    """
+    monkeypatch.setattr(job_service, "CHUNKED_FILL_BYTES", 0)
+    points = [[10, 10], [10, 300], [2500, 150], [1200, 20]]
+
+    with pytest.raises(ValueError, match="can only be filled with"):
+        process_poly(points, "flood")
+
+    # auto picks one of the band engines
+    result = process_poly(points, "auto")
+    assert result["engine"] != "flood"
+    os.remove(result["file"])
+
+
+def test_chunked_fill_of_encoded_formats(monkeypatch):
+    """
+    Test large packed and rle masks are encoded band by band into the same
+    files as an in-memory fill.
+    """
+    points = [[10, 10], [10, 300], [2500, 150], [1200, 20]]
+    expected, _ = fill_polyline_cropped(points, "fast", use_cache=False)
+
+    for file_format in ["packed", "rle"]:
+        monkeypatch.setattr(job_service, "CHUNKED_FILL_BYTES", 0)
+        result = process_poly(points, "fast", file_format)
+        with open(result["file"], "rb") as mask_file:
+            chunked = mask_file.read()
+        os.remove(result["file"])
+
+        monkeypatch.undo()
+        result = process_poly(points, "fast", file_format)
+        with open(result["file"], "rb") as mask_file:
+            assert mask_file.read() == chunked
+        assert np.array_equal(load_mask_file(result["file"]).mask, expected.mask)
+        os.remove(result["file"])
+
+
+def test_workers_fill_with_one_thread(monkeypatch):
+    """
+    Test fill workers default to a single thread, unless FILL_THREADS is
+    set.
+    """
+    monkeypatch.setattr(filling_service, "FILL_THREADS", 8)
+    monkeypatch.setenv("FILL_THREADS", "8")
+    start_worker()
+    assert filling_service.FILL_THREADS == 8
+
+    monkeypatch.delenv("FILL_THREADS")
+    start_worker()
+    assert filling_service.FILL_THREADS == 1
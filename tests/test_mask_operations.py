@@ -0,0 +1,96 @@
+"""
+Polygon statistics and mask set operation tests.
+"""
+import numpy as np
+import pytest
+
+from app.services import fill_polyline_cropped
+from app.services.mask_encoding import encode_packed
+from app.services.mask_operations import (
+    SET_OPERATIONS,
+    combine_masks,
+    mask_statistics,
+)
+from app.services.polygon_stats import polygon_statistics
+
+
+def test_polygon_statistics():
+    """
+    Test the analytic area, perimeter and centroid of known polygons.
+    """
+    rectangle = polygon_statistics([[2, 4], [2, 10], [6, 10], [6, 4]])
+    assert rectangle == {
+        "area": 24.0,
+        "perimeter": 20.0,
+        "centroid_row": 4.0,
+        "centroid_column": 7.0,
+    }
+
+    # the winding direction does not change the statistics
+    triangle = polygon_statistics([[0, 0], [0, 3], [6, 0]])
+    assert triangle == polygon_statistics([[6, 0], [0, 3], [0, 0]])
+    assert triangle["area"] == 9.0
+    assert triangle["perimeter"] == pytest.approx(9 + np.hypot(6, 3))
+    assert (triangle["centroid_row"], triangle["centroid_column"]) == (2.0, 1.0)
+
+    # a polygon without area is centred on its vertices
+    line = polygon_statistics([[0, 0], [4, 4], [2, 2]])
+    assert line["area"] == 0.0
+    assert (line["centroid_row"], line["centroid_column"]) == (2.0, 2.0)
+
+
+def test_set_operations_match_full_canvas(tmp_path):
+    """
+    Test the cropped set operations give the masks and counts of the same
+    operations over the full canvas, for any storage format.
+    """
+    shape = (80, 90)
+    first, _ = fill_polyline_cropped(
+        [[5, 5], [5, 50], [40, 60], [45, 10]], "scanline", shape=shape, use_cache=False
+    )
+    second, _ = fill_polyline_cropped(
+        [[30, 30], [25, 85], [70, 80], [75, 40]],
+        "scanline",
+        shape=shape,
+        use_cache=False,
+    )
+    far, _ = fill_polyline_cropped(
+        [[60, 2], [60, 10], [70, 6]], "scanline", shape=shape, use_cache=False
+    )
+
+    np.save(tmp_path / "first.npy", first.mask)
+    (tmp_path / "second.npb").write_bytes(encode_packed(second))
+    np.save(tmp_path / "far.npy", far.mask)
+    stored = {
+        "first": (tmp_path / "first.npy", first.offset),
+        "second": (tmp_path / "second.npb", (0, 0)),
+        "far": (tmp_path / "far.npy", far.offset),
+    }
+
+    dense_first = first.to_dense().astype(bool)
+    dense_second = second.to_dense().astype(bool)
+    expected = {
+        "union": dense_first | dense_second,
+        "intersection": dense_first & dense_second,
+        "difference": dense_first & ~dense_second,
+    }
+    for operation in SET_OPERATIONS:
+        result = combine_masks(operation, stored["first"], stored["second"], shape)
+        assert np.array_equal(result.to_dense(), expected[operation])
+
+    statistics = mask_statistics(stored["first"], stored["second"])
+    assert statistics["pixels"] == {
+        "first": int(dense_first.sum()),
+        "second": int(dense_second.sum()),
+        "intersection": int(expected["intersection"].sum()),
+        "union": int(expected["union"].sum()),
+        "difference": int(expected["difference"].sum()),
+    }
+    assert statistics["iou"] == pytest.approx(
+        expected["intersection"].sum() / expected["union"].sum()
+    )
+
+    # masks without overlapping boxes have no intersection
+    assert mask_statistics(stored["first"], stored["far"])["iou"] == 0.0
+    with pytest.raises(ValueError):
+        combine_masks("intersection", stored["first"], stored["far"], shape)
@@ -0,0 +1,51 @@
+"""
+Mask streaming tests.
+"""
+import os
+
+import numpy as np
+import pytest
+
+from app.services.filling_service import fill_polyline_cropped
+from app.services.mask_encoding import encode_packed, encode_rle
+from app.services.stream_service import MaskStream
+
+
+def test_streamed_bands_match_mask_file():
+    """
+    Test the bands sent one at a time add up to the file of the whole mask,
+    and the same bytes are saved.
+    """
+    points = np.array([[3.5, 2], [40, 9], [61, 48], [22, 57.25], [30, 30]])
+    shape = (80, 80)
+    encoders = {"packed": encode_packed, "rle": encode_rle}
+
+    for engine in ["rourke", "fast", "scanline"]:
+        cropped, _ = fill_polyline_cropped(points, engine, shape=shape, use_cache=False)
+
+        for file_format, encode in encoders.items():
+            mask_stream = MaskStream(points, engine, file_format, shape, band_rows=7)
+            chunks = list(mask_stream)
+
+            # the header, then one chunk per band
+            assert len(chunks) == 1 + -(-cropped.mask.shape[0] // 7)
+            assert b"".join(chunks) == encode(cropped)
+            assert mask_stream.content_length() in [None, len(encode(cropped))]
+
+            with open(mask_stream.result["file"], "rb") as mask_file:
+                assert mask_file.read() == encode(cropped)
+            assert mask_stream.result["offset"] == cropped.offset
+            os.remove(mask_stream.result["file"])
+
+
+def test_stream_only_band_formats_and_engines():
+    """
+    Test streams refuse the formats and engines that need the whole mask.
+    """
+    points = [[1, 1], [1, 6], [6, 6], [6, 1]]
+
+    with pytest.raises(ValueError):
+        MaskStream(points, "scanline", "npy", (8, 8))
+    with pytest.raises(ValueError):
+        MaskStream(points, "flood", "rle", (8, 8))
+    assert MaskStream(points, "auto", "rle", (8, 8)).engine != "flood"
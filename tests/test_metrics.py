@@ -0,0 +1,45 @@
+"""
+Stage timing and metrics tests.
+"""
+from app.services.metrics_service import StageMetrics, StageTimer
+
+
+def test_stage_timer():
+    """
+    Test repeated spans add up and merged stages are kept.
+    """
+    timer = StageTimer()
+    with timer.span("fill"):
+        pass
+    with timer.span("fill"):
+        pass
+    timer.merge({"save": 0.5})
+
+    stages = timer.to_dict()
+    assert list(stages) == ["fill", "save", "total"]
+    assert stages["total"] == stages["fill"] + 0.5
+
+
+def test_stage_histograms():
+    """
+    Test the histograms are cumulative in the Prometheus text format.
+    """
+    metrics = StageMetrics(buckets=[0.1, 1.0])
+    metrics.observe_stages("fast", {"fill": 0.05, "save": 2.0})
+    metrics.observe("fast", "fill", 0.5)
+
+    lines = metrics.render().splitlines()
+    assert lines[1] == "# TYPE poly_stage_seconds histogram"
+    assert (
+        'poly_stage_seconds_bucket{algorithm="fast",stage="fill",le="0.1"} 1' in lines
+    )
+    assert (
+        'poly_stage_seconds_bucket{algorithm="fast",stage="fill",le="1.0"} 2' in lines
+    )
+    assert (
+        'poly_stage_seconds_bucket{algorithm="fast",stage="save",le="1.0"} 0' in lines
+    )
+    assert (
+        'poly_stage_seconds_bucket{algorithm="fast",stage="save",le="+Inf"} 1' in lines
+    )
+    assert 'poly_stage_seconds_count{algorithm="fast",stage="fill"} 2' in lines
@@ -0,0 +1,732 @@
+"""
+Poly API tests, using SQLite as a local stand-in database.
+"""
+import asyncio
+import base64
+import io
+import os
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import Base, get_async_db, get_db
+from app.models import Poly
+from app.routers import poly_async_router
+from app.services import fill_polyline_cropped, job_service
+from app.services.mask_encoding import encode_packed
+from app.services.spatial_index import spatial_index
+from app.utils.vertex_encoding import encode_vertices
+from main import app, include_routers
+
+client = TestClient(app)
+
+
+@pytest.fixture(name="database")
+def fixture_database(tmp_path):
+    """
+    Serve the API from a fresh SQLite database.
+    """
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'polys.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    def get_test_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    spatial_index.clear()
+    yield tmp_path / "polys.db"
+    app.dependency_overrides.clear()
+    spatial_index.clear()
+
+    # remove the files of the created polys
+    session = session_factory()
+    for poly in session.query(Poly).all():
+        for path in [poly.imagefile, poly.arrayfile]:
+            if path and os.path.isfile(path):
+                os.remove(path)
+    session.close()
+
+
+def test_create_and_read_poly(database):
+    """
+    Test creating, listing, reading and deleting a poly item.
+    """
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_triangle",
+            "npinput": "[[1, 1], [5, 5], [5, 1]]",
+            "algorithm": "scanline",
+            "fileformat": "rle",
+        },
+    )
+    assert response.status_code == 201
+    poly_id = response.json()["id"]
+
+    response = client.post(
+        "/api/v1/polys",
+        json={"name": "api_triangle", "npinput": "[[1, 1]]", "algorithm": "fast"},
+    )
+    assert response.status_code == 400
+
+    polys = client.get("/api/v1/polys").json()
+    assert [poly["name"] for poly in polys] == ["api_triangle"]
+    assert polys[0]["xoffset"] == 1
+
+    poly = client.get(f"/api/v1/polys/{poly_id}").json()
+    assert poly["fileformat"] == "rle"
+
+    tile = client.get(f"/api/v1/polys/{poly_id}/mask/tile?row=0&col=0&size=8")
+    assert np.load(io.BytesIO(tile.content)).sum() == 15
+
+    preview = client.get(f"/api/v1/polys/{poly_id}/preview")
+    assert preview.headers["content-type"] == "image/png"
+
+    poly = client.get(f"/api/v1/polys/{poly_id}").json()
+    assert client.delete(f"/api/v1/polys/{poly_id}").status_code == 200
+    assert client.get(f"/api/v1/polys/{poly_id}").status_code == 404
+
+    # remove the files
+    for path in [poly["imagefile"], poly["arrayfile"]]:
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def test_mask_range_download(database):
+    """
+    Test downloading a byte range of a stored mask.
+    """
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_range",
+            "npinput": "[[10, 10], [10, 50], [50, 50], [50, 10]]",
+            "algorithm": "fast",
+            "fileformat": "packed",
+        },
+    )
+    poly_id = response.json()["id"]
+
+    full = client.get(f"/api/v1/polys/{poly_id}/mask")
+    partial = client.get(
+        f"/api/v1/polys/{poly_id}/mask", headers={"Range": "bytes=4-11"}
+    )
+
+    assert full.status_code == 200
+    assert partial.status_code == 206
+    assert partial.content == full.content[4:12]
+    assert partial.headers["content-range"] == f"bytes 4-11/{len(full.content)}"
+
+
+def test_batch(database):
+    """
+    Test a batch with an invalid and a duplicated item.
+    """
+    response = client.post(
+        "/api/v1/polys/batch",
+        json=[
+            {
+                "name": "api_batch",
+                "npinput": "[[1, 1], [4, 4], [4, 1]]",
+                "algorithm": "fast",
+            },
+            {
+                "name": "api_batch",
+                "npinput": "[[1, 1], [4, 4], [4, 1]]",
+                "algorithm": "fast",
+            },
+            {"name": "api_batch_2", "npinput": "[[1, 1]", "algorithm": "fast"},
+        ],
+    )
+    result = response.json()
+
+    assert result["created"] == 1
+    assert result["failed"] == 2
+    assert [item["status"] for item in result["items"]] == [
+        "created",
+        "failed",
+        "failed",
+    ]
+
+
+def test_async_reads(database):
+    """
+    Test the async read endpoints on the async SQLite driver.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+    session_factory = sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_test_async_db():
+        async with session_factory() as session:
+            yield session
+
+    client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_async",
+            "npinput": "[[1, 1], [4, 4], [4, 1]]",
+            "algorithm": "fast",
+        },
+    )
+
+    async_app = FastAPI()
+    async_app.include_router(poly_async_router, prefix="/api/v1")
+    async_app.dependency_overrides[get_async_db] = get_test_async_db
+    async_client = TestClient(async_app)
+
+    polys = async_client.get("/api/v1/polys").json()
+    assert [poly["name"] for poly in polys] == ["api_async"]
+    assert async_client.get("/api/v1/polys/999").status_code == 404
+
+    asyncio.run(engine.dispose())
+
+
+def test_async_routes_order(database):
+    """
+    Test that the literal routes still resolve with DATABASE_ASYNC enabled.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+    session_factory = sessionmaker(
+        bind=engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def get_test_async_db():
+        async with session_factory() as session:
+            yield session
+
+    async_app = FastAPI()
+    include_routers(async_app, use_async=True)
+    async_app.dependency_overrides.update(app.dependency_overrides)
+    async_app.dependency_overrides[get_async_db] = get_test_async_db
+    async_client = TestClient(async_app)
+
+    response = async_client.get("/api/v1/polys/cache")
+    assert response.status_code == 200
+    assert "hits" in response.json()
+
+    poly_id = async_client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_order",
+            "npinput": "[[1, 1], [4, 4], [4, 1]]",
+            "algorithm": "fast",
+        },
+    ).json()["id"]
+    assert async_client.get(f"/api/v1/polys/{poly_id}").json()["name"] == "api_order"
+    assert async_client.get("/api/v1/polys/jobs/missing").status_code == 404
+
+    asyncio.run(engine.dispose())
+
+
+def test_paginated_listing(database):
+    """
+    Test keyset pagination, filters and field selection of the listing.
+    """
+    for index, algorithm in enumerate(["fast", "scanline", "fast"]):
+        client.post(
+            "/api/v1/polys",
+            json={
+                "name": f"api_page_{index}",
+                "npinput": f"[[1, 1], [{index + 4}, 4], [4, 1]]",
+                "algorithm": algorithm,
+            },
+        )
+    client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api%other",
+            "npinput": "[[1.5, 1], [9, 4], [4, 1]]",
+            "algorithm": "fast",
+        },
+    )
+
+    first = client.get("/api/v1/polys?limit=2")
+    assert [poly["name"] for poly in first.json()] == ["api_page_0", "api_page_1"]
+    assert "npinput" not in first.json()[0]
+
+    after_id = first.headers["x-next-after-id"]
+    second = client.get(f"/api/v1/polys?limit=2&after_id={after_id}")
+    assert [poly["name"] for poly in second.json()] == ["api_page_2", "api%other"]
+
+    polys = client.get("/api/v1/polys?algorithm=fast&name_prefix=api_").json()
+    assert [poly["name"] for poly in polys] == ["api_page_0", "api_page_2"]
+
+    polys = client.get("/api/v1/polys?fields=npinput&name_prefix=api%25").json()
+    assert polys == [
+        {
+            "id": polys[0]["id"],
+            "name": "api%other",
+            "npinput": "[[1.5, 1.0], [9.0, 4.0], [4.0, 1.0]]",
+        }
+    ]
+
+    assert client.get("/api/v1/polys?fields=secret").status_code == 400
+
+
+def test_binary_vertices(database):
+    """
+    Test creating poly items from typed, base64 and raw binary vertices.
+    """
+    points = np.array([[1, 1], [5, 5], [5, 1]], dtype="<i4")
+    encoded = base64.b64encode(points.tobytes()).decode()
+
+    typed = client.post(
+        "/api/v1/polys",
+        json={"name": "api_typed", "vertices": points.tolist(), "algorithm": "fast"},
+    )
+    packed = client.post(
+        "/api/v1/polys",
+        json={"name": "api_base64", "npbinary": encoded, "algorithm": "fast"},
+    )
+    raw = client.post(
+        "/api/v1/polys/binary?name=api_raw&algorithm=fast",
+        content=points.tobytes(),
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert [typed.status_code, packed.status_code, raw.status_code] == [201] * 3
+
+    poly = client.get(f"/api/v1/polys/{raw.json()['id']}").json()
+    assert poly["npbinary"] == encoded
+    assert poly["npinput"] is None
+
+    # whole number JSON vertices are only stored as bytes
+    text = client.post(
+        "/api/v1/polys",
+        json={"name": "api_text", "npinput": str(points.tolist()), "algorithm": "fast"},
+    )
+    poly = client.get(f"/api/v1/polys/{text.json()['id']}").json()
+    assert poly["npbinary"] == encoded
+    assert poly["npinput"] is None
+
+    # one vertex source only, whole int32 pairs only
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_both",
+            "npinput": "[[1, 1], [5, 5], [5, 1]]",
+            "npbinary": encoded,
+            "algorithm": "fast",
+        },
+    )
+    assert response.status_code == 400
+    response = client.post(
+        "/api/v1/polys/binary?name=api_odd&algorithm=fast",
+        content=points.tobytes()[:-4],
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert response.status_code == 400
+
+
+def test_fractional_vertices(database):
+    """
+    Test typed fractional vertices are kept as JSON text, so the poly item
+    can be read back and edited.
+    """
+    vertices = [[10.5, 10.25], [10.5, 60.75], [60.5, 35.5]]
+    response = client.post(
+        "/api/v1/polys",
+        json={"name": "api_fractional", "vertices": vertices, "algorithm": "scanline"},
+    )
+    assert response.status_code == 201
+    created = response.json()
+
+    poly = client.get(f"/api/v1/polys/{created['id']}").json()
+    assert poly["npbinary"] is None
+    assert poly["npinput"] == "[[10.5, 10.25], [10.5, 60.75], [60.5, 35.5]]"
+
+    response = client.patch(
+        f"/api/v1/polys/{created['id']}",
+        json={"edits": [{"index": 2, "vertex": [50.5, 35.5]}]},
+    )
+    assert response.status_code == 200
+
+    vertices[2] = [50.5, 35.5]
+    expected, _ = fill_polyline_cropped(vertices, "scanline", use_cache=False)
+    assert np.array_equal(np.load(response.json()["file_url"]), expected.mask)
+
+    # the mask of the created poly item is not used anymore
+    os.remove(created["file_url"])
+
+
+def test_stage_timings(database):
+    """
+    Test the stage timings are returned and counted in the metrics.
+    """
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_stages",
+            "npinput": "[[3, 3], [40, 7], [9, 33]]",
+            "algorithm": "scanline",
+        },
+    )
+    stages = response.json()["stages"]
+
+    assert {"validate", "parse", "file_lookup", "db_commit", "total"} <= set(stages)
+    assert stages["total"] == pytest.approx(
+        sum(seconds for stage, seconds in stages.items() if stage != "total")
+    )
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert (
+        'poly_stage_seconds_count{algorithm="scanline",stage="db_commit"}'
+        in metrics.text
+    )
+
+
+def test_composite(database):
+    """
+    Test creating a labelled composite and reading a tile of it.
+    """
+    response = client.post(
+        "/api/v1/polys/composite",
+        json={
+            "name": "api_composite",
+            "regions": [
+                {
+                    "label": 1000,
+                    "vertices": [[0, 0], [0, 9], [9, 9], [9, 0]],
+                    "holes": [[[3, 3], [3, 6], [6, 6], [6, 3]]],
+                },
+                {"label": 2, "vertices": [[5, 5], [5, 14], [14, 14], [14, 5]]},
+            ],
+        },
+    )
+    assert response.status_code == 201
+    assert response.json()["regions"] == 2
+
+    tile = client.get(f"/api/v1/polys/{response.json()['id']}/mask/tile?size=16")
+    labels = np.load(io.BytesIO(tile.content))
+    assert labels.dtype == np.uint16
+    assert labels[1, 1] == 1000 and labels[4, 4] == 0 and labels[12, 12] == 2
+
+    response = client.post(
+        "/api/v1/polys/composite",
+        json={
+            "name": "api_composite_2",
+            "regions": [{"label": 1, "vertices": [[0, 0], [0, 9], [9, 9]]}],
+            "overlap": "middle",
+        },
+    )
+    assert response.status_code == 400
+
+
+def test_containing_polys(database):
+    """
+    Test the containment query against created, deleted and restarted
+    indexes.
+    """
+    square = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_square",
+            "vertices": [[0, 0], [0, 300], [300, 300], [300, 0]],
+            "algorithm": "scanline",
+        },
+    ).json()["id"]
+    triangle = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_triangle",
+            "npinput": "[[100, 100], [100, 600], [600, 100]]",
+            "algorithm": "scanline",
+        },
+    ).json()["id"]
+
+    points = [[10, 10], [200, 200], [400, 150], [350.5, 340.5], [900, 900]]
+    expected = [[square], [square, triangle], [triangle], [triangle], []]
+    response = client.post("/api/v1/polys/contains", json={"points": points})
+    assert response.json()["matches"] == expected
+
+    # rebuilt from the stored vertices
+    spatial_index.clear()
+    response = client.post("/api/v1/polys/contains", json={"points": points})
+    assert response.json()["matches"] == expected
+
+    poly = client.get(f"/api/v1/polys/{square}").json()
+    client.delete(f"/api/v1/polys/{square}")
+    response = client.post("/api/v1/polys/contains", json={"points": points})
+    assert response.json()["matches"] == [[], [triangle], [triangle], [triangle], []]
+
+    os.remove(poly["imagefile"])
+
+
+def test_containing_polys_of_other_sessions(database):
+    """
+    Test edits and deletes stored through another session reach the index.
+    """
+    moved, deleted = [
+        client.post(
+            "/api/v1/polys",
+            json={
+                "name": f"api_other_{index}",
+                "npinput": "[[0, 0], [0, 100], [100, 100], [100, 0]]",
+                "algorithm": "fast",
+            },
+        ).json()["id"]
+        for index in range(2)
+    ]
+    points = [[50, 50], [550, 550]]
+    response = client.post("/api/v1/polys/contains", json={"points": points})
+    assert response.json()["matches"] == [[moved, deleted], []]
+
+    # another worker moves one square and deletes the other
+    engine = create_engine(f"sqlite:///{database}")
+    session = sessionmaker(bind=engine)()
+    poly = session.get(Poly, moved)
+    new_points = np.array([[500, 500], [500, 600], [600, 600], [600, 500]])
+    poly.npinput = None
+    poly.npvertices = encode_vertices(new_points)
+    session.delete(session.get(Poly, deleted))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+    response = client.post("/api/v1/polys/contains", json={"points": points})
+    assert response.json()["matches"] == [[], [moved]]
+    assert deleted not in spatial_index.ids
+
+
+def test_canvas_size(database):
+    """
+    Test the canvas size is taken from the request.
+    """
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_canvas",
+            "npinput": "[[1, 1], [5, 5], [5, 1]]",
+            "algorithm": "fast",
+            "xsize": 100000,
+            "ysize": 80000,
+        },
+    )
+    assert response.json()["shape"] == [100000, 80000]
+
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_canvas_2",
+            "npinput": "[[1, 1], [5, 5], [5, 1]]",
+            "algorithm": "fast",
+            "xsize": 100000,
+        },
+    )
+    assert response.status_code == 400
+
+
+def test_oversized_flood(database, monkeypatch):
+    """
+    Test a flood fill too large to fill in memory is rejected.
+    """
+    monkeypatch.setattr(job_service, "CHUNKED_FILL_BYTES", 0)
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_oversized_flood",
+            "npinput": "[[1, 1], [5, 5], [5, 1]]",
+            "algorithm": "flood",
+        },
+    )
+    assert response.status_code == 400
+    assert "can only be filled with" in response.json()["detail"]
+
+
+def test_auto_algorithm(database):
+    """
+    Test auto records the engine it picked and the predicted fill time.
+    """
+    response = client.post(
+        "/api/v1/polys",
+        json={
+            "name": "api_auto",
+            "npinput": "[[3, 3], [40, 7], [9, 33]]",
+            "algorithm": "auto",
+        },
+    )
+    assert response.status_code == 201
+    created = response.json()
+    assert created["algorithm"] == "auto"
+    assert created["engine"] in ["rourke", "flood", "fast", "scanline"]
+    assert created["predicted_speed"].endswith(" seconds")
+
+    poly = client.get(f"/api/v1/polys/{created['id']}").json()
+    assert poly["engine"] == created["engine"]
+    assert poly["predictedtime"] > 0
+
+
+def test_edit_vertices(database):
+    """
+    Test moving vertices refills the stored mask without touching the file
+    of another poly item of the same fill.
+    """
+    vertices = [[10, 10], [10, 60], [30, 40], [60, 60], [60, 10]]
+    first, second = [
+        client.post(
+            "/api/v1/polys",
+            json={"name": name, "vertices": vertices, "algorithm": "scanline"},
+        ).json()
+        for name in ["api_edit", "api_edit_2"]
+    ]
+    assert first["file_url"] == second["file_url"]
+
+    response = client.patch(
+        f"/api/v1/polys/{first['id']}",
+        json={"edits": [{"index": 2, "vertex": [50, 20]}]},
+    )
+    assert response.status_code == 200
+    edited = response.json()
+    assert edited["windows"] == [[10, 20, 61, 61]]
+    assert edited["file_url"] != first["file_url"]
+
+    vertices[2] = [50, 20]
+    expected, _ = fill_polyline_cropped(vertices, "scanline", use_cache=False)
+    assert np.array_equal(np.load(edited["file_url"]), expected.mask)
+    assert client.get(f"/api/v1/polys/{first['id']}").json()["npbinary"] == (
+        base64.b64encode(np.array(vertices, "<i4").tobytes()).decode()
+    )
+
+    # the other poly item keeps the mask of the old vertices
+    assert os.path.isfile(second["file_url"])
+    assert np.load(second["file_url"]).sum() > expected.mask.sum()
+
+    # a vertex moved out of the bounding box fills the whole mask again
+    response = client.patch(
+        f"/api/v1/polys/{first['id']}",
+        json={"edits": [{"index": 0, "vertex": [5, 8]}]},
+    )
+    assert response.json()["windows"] is None
+    assert response.json()["offset"] == [5, 8]
+
+    response = client.patch(
+        f"/api/v1/polys/{first['id']}",
+        json={"edits": [{"index": 5, "vertex": [5, 8]}]},
+    )
+    assert response.status_code == 400
+
+    # the mask of the first edit is not used anymore
+    os.remove(edited["file_url"])
+
+
+def test_set_operations(database):
+    """
+    Test comparing and combining two poly items, and filtering the listing
+    by the analytic statistics.
+    """
+    first, second = [
+        client.post(
+            "/api/v1/polys",
+            json={"name": name, "vertices": vertices, "algorithm": "scanline"},
+        ).json()
+        for name, vertices in [
+            ("api_set_a", [[10, 10], [10, 40], [40, 40], [40, 10]]),
+            ("api_set_b", [[30, 30], [30, 70], [50, 70], [50, 30]]),
+        ]
+    ]
+    assert first["area"] == 900.0
+    assert first["perimeter"] == 120.0
+    assert second["centroid"] == [40.0, 50.0]
+
+    response = client.get(f"/api/v1/polys/{first['id']}/compare/{second['id']}")
+    assert response.status_code == 200
+    statistics = response.json()
+    assert statistics["pixels"] == {
+        "first": 961,
+        "second": 861,
+        "intersection": 121,
+        "union": 1701,
+        "difference": 840,
+    }
+    assert statistics["iou"] == pytest.approx(121 / 1701)
+
+    response = client.post(
+        "/api/v1/polys/combine",
+        json={
+            "name": "api_set_union",
+            "operation": "union",
+            "first": first["id"],
+            "second": second["id"],
+            "fileformat": "rle",
+        },
+    )
+    assert response.status_code == 201
+    union = response.json()
+    assert union["algorithm"] == "union"
+    assert union["offset"] == [10, 10]
+    tile = np.load(
+        io.BytesIO(client.get(f"/api/v1/polys/{union['id']}/mask/tile?size=80").content)
+    )
+    assert tile.sum() == 1701
+
+    response = client.post(
+        "/api/v1/polys/combine",
+        json={
+            "name": "api_set_other",
+            "operation": "xor",
+            "first": first["id"],
+            "second": second["id"],
+        },
+    )
+    assert response.status_code == 400
+
+    polys = client.get("/api/v1/polys?min_area=850&max_perimeter=125").json()
+    assert [poly["name"] for poly in polys] == ["api_set_a"]
+    polys = client.get("/api/v1/polys?min_area=100&fields=area").json()
+    assert [poly["area"] for poly in polys] == [900.0, 800.0]
+
+
+def test_streamed_poly(database):
+    """
+    Test streaming the mask file of a poly item while it is filled.
+    """
+    vertices = [[10, 10], [10, 200], [600, 120], [300, 20]]
+    with client.stream(
+        "POST",
+        "/api/v1/polys?stream=true",
+        json={
+            "name": "api_stream",
+            "vertices": vertices,
+            "algorithm": "scanline",
+            "fileformat": "packed",
+            "xsize": 1000,
+            "ysize": 1000,
+        },
+    ) as response:
+        assert response.status_code == 201
+        assert response.headers["x-fill-engine"] == "scanline"
+        body = b"".join(response.iter_bytes())
+
+    assert int(response.headers["content-length"]) == len(body)
+    expected, _ = fill_polyline_cropped(
+        vertices, "scanline", shape=(1000, 1000), use_cache=False
+    )
+    assert body == encode_packed(expected)
+
+    # the poly item is stored with the same bytes once the stream ends
+    poly = client.get("/api/v1/polys?name_prefix=api_stream").json()[0]
+    assert poly["fileformat"] == "packed"
+    assert [poly["xoffset"], poly["yoffset"]] == [10, 10]
+    with open(poly["imagefile"], "rb") as mask_file:
+        assert mask_file.read() == body
+
+    response = client.post(
+        "/api/v1/polys?stream=true",
+        json={"name": "api_stream_npy", "vertices": vertices, "algorithm": "fast"},
+    )
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+"""
+Poly edit tests.
+"""
+import numpy as np
+import pytest
+
+from app.services import fill_polyline_cropped
+from app.services.edit_service import (
+    apply_vertex_edits,
+    dirty_windows,
+    refill_windows,
+)
+
+
+def test_refilled_windows_match_full_fill():
+    """
+    Testing that filling the dirty windows again gives the mask of a full
+    fill of the moved polygon.
+    """
+    rng = np.random.default_rng(11)
+    shape = (120, 120)
+
+    for algorithm in ["rourke", "fast", "scanline"]:
+        for _ in range(4):
+            # the corners keep the bounding box, the other vertices move inside
+            corners = np.array([[10, 10], [10, 90], [90, 90], [90, 10]])
+            points = np.insert(corners, [1, 2, 3, 4], rng.integers(11, 90, (4, 2)), 0)
+            cropped, _ = fill_polyline_cropped(
+                points, algorithm, shape=shape, use_cache=False
+            )
+            mask = cropped.mask.copy()
+
+            edits = [
+                (int(index), rng.uniform(11, 89, 2).tolist())
+                for index in rng.choice([1, 3, 5, 7], 2, replace=False)
+            ]
+            new_points, indices = apply_vertex_edits(points, edits)
+            windows = dirty_windows(points, new_points, indices, shape)
+            pixels = refill_windows(
+                mask, algorithm, new_points, cropped.offset, windows
+            )
+
+            expected, _ = fill_polyline_cropped(
+                new_points, algorithm, shape=shape, use_cache=False
+            )
+            assert 0 < pixels < len(windows) * mask.size
+            assert np.array_equal(mask, expected.mask)
+
+
+def test_vertex_edits():
+    """
+    Testing that the last move of a vertex wins and that indices are checked.
+    """
+    points = np.array([[0, 0], [0, 10], [10, 10], [10, 0]], dtype=np.int32)
+
+    new_points, indices = apply_vertex_edits(points, [(2, (8, 8)), (2, (9, 7))])
+    assert indices == [2]
+    assert new_points.dtype == np.int32
+    assert new_points.tolist() == [[0, 0], [0, 10], [9, 7], [10, 0]]
+
+    # the window covers the moved vertex and its neighbours
+    assert dirty_windows(points, new_points, indices, (20, 20)) == [(0, 0, 11, 11)]
+
+    with pytest.raises(ValueError):
+        apply_vertex_edits(points, [(4, (1, 1))])
@@ -1,9 +1,15 @@
 """
 Poly service tests.
 """
+import numpy as np
 from fastapi.testclient import TestClient
 
-from app.services import fill_polyline
+from app.services import fill_polyline, fill_polyline_cropped, filling_service
+from app.services.composite_fill import fill_composite
+from app.services.filling_service import fill_polyline_chunked
+from app.services.flood_fill import (bresenham, bresenham_outline,
+                                     flood_fill_span)
+from app.services.rourke_fill import point_in_polygons, points_in_polygon
 from main import app
 
 client = TestClient(app)
@@ -123,3 +129,361 @@ def test_rectangle_flood():
     assert (0 in result[0][4][1:6]) == False
     assert (0 in result[0][5][1:6]) == False
     assert (0 in result[0][6][1:6]) == True
+
+
+def test_rectangle_cropped():
+    """
+    Testing the bounding box window of a rectangle shape
+    for every algorithm.
+
+    1 1 1 1 1
+    1 1 1 1 1
+    1 1 1 1 1
+    1 1 1 1 1
+    1 1 1 1 1
+
+    offset = (1, 1)
+    shape = (19200, 10800)
+    """
+    points = [[1, 1], [1, 2], [1, 5], [3, 5], [5, 5], [5, 3], [5, 1]]
+
+    for algorithm in ["fast", "rourke", "flood"]:
+        result = fill_polyline_cropped(points, algorithm, 3, 3)
+
+        assert result[0].mask.shape == (5, 5)
+        assert result[0].offset == (1, 1)
+        assert result[0].shape == (19200, 10800)
+        assert result[0].mask.all()
+
+        dense = result[0].to_dense()
+        assert dense.shape == (19200, 10800)
+        assert dense.sum() == 25
+        assert dense[1:6, 1:6].all()
+
+
+def test_cropped_clipped_to_canvas():
+    """
+    Testing that a polygon crossing the canvas border is clipped
+    to the canvas.
+    """
+    points = [[-2, -2], [-2, 3], [3, 3], [3, -2]]
+    result = fill_polyline_cropped(points, "fast", shape=(10, 10))
+
+    assert result[0].offset == (0, 0)
+    assert result[0].mask.shape == (4, 4)
+    assert np.array_equal(
+        result[0].to_dense(),
+        fill_polyline_cropped(points, "rourke", shape=(10, 10))[0].to_dense(),
+    )
+
+
+def test_triangle_scanline():
+    """
+    Testing a triangle shape within the np.array
+    using the vectorized scanline algorithm
+
+    0 0 0 0 0 0 0 0 0 0 0 0 0 ...
+    0 1 0 0 0 0 0 0 0 0 0 0 0 ...
+    0 1 1 0 0 0 0 0 0 0 0 0 0 ...
+    0 1 1 1 0 0 0 0 0 0 0 0 0 ...
+    0 1 1 1 1 0 0 0 0 0 0 0 0 ...
+    0 1 1 1 1 1 0 0 0 0 0 0 0 ...
+    0 0 0 0 0 0 0 0 0 0 0 0 0 ...
+    .............................
+
+    shape = (19200, 10800)
+    """
+    points = [[1, 1], [5, 5], [5, 1]]
+    result = fill_polyline(points, "scanline")
+
+    assert result[0].shape == (19200, 10800)
+    assert (0 in result[0][0][1:6]) == True
+    assert (0 in [result[0][1][1]]) == False
+    assert (0 in result[0][2][1:3]) == False
+    assert (0 in result[0][3][1:4]) == False
+    assert (0 in result[0][4][1:5]) == False
+    assert (0 in result[0][5][1:6]) == False
+    assert (0 in result[0][6][1:6]) == True
+    assert result[0].sum() == 15
+
+
+def test_scanline_matches_rourke():
+    """
+    Testing that the scanline algorithm fills exactly the pixels
+    the rourke algorithm reports as inside, vertex or edge.
+    """
+    rng = np.random.default_rng(0)
+
+    for _ in range(50):
+        points = rng.integers(0, 20, (rng.integers(3, 9), 2)).tolist()
+        rourke = fill_polyline_cropped(points, "rourke", shape=(20, 20))
+        scanline = fill_polyline_cropped(points, "scanline", shape=(20, 20))
+
+        assert np.array_equal(rourke[0].to_dense(), scanline[0].to_dense())
+
+
+def test_scanline_matches_rourke_off_canvas():
+    """
+    Testing that the scanline algorithm matches the rourke algorithm on
+    self intersecting polygons partly off the canvas, where crossings
+    computed from the edge slopes were rounded to the wrong pixel.
+    """
+    points = [
+        [15, 6],
+        [43, -4],
+        [31, 33],
+        [16, 42],
+        [44, 6],
+        [4, 3],
+        [0, 12],
+        [6, -1],
+        [21, 27],
+        [36, 13],
+        [8, 23],
+    ]
+    rourke, _ = fill_polyline_cropped(points, "rourke", shape=(50, 50), use_cache=False)
+    scanline, _ = fill_polyline_cropped(
+        points, "scanline", shape=(50, 50), use_cache=False
+    )
+    assert rourke.to_dense()[37, 15] == 1
+    assert np.array_equal(rourke.to_dense(), scanline.to_dense())
+
+    rng = np.random.default_rng(2)
+    for _ in range(30):
+        points = rng.integers(-5, 55, (rng.integers(3, 13), 2)).tolist()
+        rourke, _ = fill_polyline_cropped(
+            points, "rourke", shape=(50, 50), use_cache=False
+        )
+        scanline, _ = fill_polyline_cropped(
+            points, "scanline", shape=(50, 50), use_cache=False
+        )
+
+        assert np.array_equal(rourke.to_dense(), scanline.to_dense())
+
+
+def test_scanline_matches_rourke_fractional():
+    """
+    Testing that the scanline algorithm matches the rourke algorithm on
+    fractional vertices, where crossings close to a pixel were rounded
+    differently from the pixel test of rourke.
+    """
+    points = [[36.6, 26.3], [26.3, 39.2], [-0.4, 7.8]]
+    rourke, _ = fill_polyline_cropped(points, "rourke", shape=(50, 50), use_cache=False)
+    scanline, _ = fill_polyline_cropped(
+        points, "scanline", shape=(50, 50), use_cache=False
+    )
+    assert np.array_equal(rourke.to_dense(), scanline.to_dense())
+
+    rng = np.random.default_rng(5)
+    for _ in range(30):
+        points = np.round(rng.random((rng.integers(3, 9), 2)) * 44 - 2, 1)
+        rourke, _ = fill_polyline_cropped(
+            points, "rourke", shape=(40, 40), use_cache=False
+        )
+        scanline, _ = fill_polyline_cropped(
+            points, "scanline", shape=(40, 40), use_cache=False
+        )
+
+        assert np.array_equal(rourke.to_dense(), scanline.to_dense())
+
+
+def test_large_flood_without_seed():
+    """
+    Testing a flood fill far beyond the recursion limit with an
+    automatically picked interior seed.
+    """
+    points = [[10, 10], [10, 60], [40, 60], [40, 410], [310, 410], [310, 10]]
+    flood = fill_polyline_cropped(points, "flood")
+    scanline = fill_polyline_cropped(points, "scanline")
+
+    assert flood[0].offset == (10, 10)
+    assert flood[0].mask.sum() > 100000
+    assert np.array_equal(flood[0].mask, scanline[0].mask)
+
+
+def test_flood_seed_on_canvas_edge():
+    """
+    Testing a flood fill seeded on the first row or column of the canvas,
+    the legs of the polygon only meet off the canvas.
+    """
+    points = np.array(
+        [[-10, 0], [-10, 30], [20, 30], [20, 20], [-2, 20], [-2, 10], [20, 10], [20, 0]]
+    )
+
+    # seeded in the right leg on row 0
+    mask = fill_polyline(points, "flood", 25, 0, shape=(50, 50))[0]
+    assert mask[0:20, 21:30].all()
+    assert not mask[0:20, 1:10].any()
+
+    # seeded in the lower leg on column 0
+    mask = fill_polyline(points[:, ::-1], "flood", 0, 25, shape=(50, 50))[0]
+    assert mask[21:30, 0:20].all()
+    assert not mask[1:10, 0:20].any()
+
+
+def test_flood_fill_span_connectivity():
+    """
+    Testing 4 and 8 connectivity of the span flood fill
+    on two regions touching by a corner.
+
+    0 0 1 0 0
+    0 0 1 0 0
+    1 1 0 1 1
+    0 0 1 0 0
+    """
+    arr = np.zeros((4, 5), dtype=np.uint8)
+    arr[0:2, 2] = 1
+    arr[2, [0, 1, 3, 4]] = 1
+    arr[3, 2] = 1
+
+    four = flood_fill_span(0, 0, 0, 2, arr.copy(), connectivity=4)
+    eight = flood_fill_span(0, 0, 0, 2, arr.copy(), connectivity=8)
+
+    assert (four == 2).sum() == 4
+    assert (eight == 2).sum() == 13
+
+
+def test_bresenham_outline_matches_generator():
+    """
+    Testing that the vectorized outline yields the same pixels as the
+    reference bresenham generator run on every edge.
+    """
+    rng = np.random.default_rng(1)
+
+    for _ in range(50):
+        points = rng.integers(-30, 30, (rng.integers(1, 8), 2))
+        closed = np.vstack([points, points[:1]])
+
+        expected = []
+        for start, end in zip(closed[:-1], closed[1:]):
+            expected.extend(bresenham(start[0], start[1], end[0], end[1]))
+
+        rows, columns = bresenham_outline(points[:, 0], points[:, 1])
+
+        assert list(zip(rows.tolist(), columns.tolist())) == expected
+
+
+def test_composite_matches_scanline():
+    """
+    Testing that a single region composite fills the pixels of the scanline
+    algorithm.
+    """
+    rng = np.random.default_rng(2)
+
+    for _ in range(20):
+        points = rng.integers(0, 40, (rng.integers(3, 9), 2))
+        composite, _ = fill_composite([(300, [points])], shape=(40, 40))
+        scanline, _ = fill_polyline_cropped(
+            points, "scanline", shape=(40, 40), use_cache=False
+        )
+
+        assert composite.mask.dtype == np.uint16
+        assert composite.offset == scanline.offset
+        assert np.array_equal(composite.mask == 300, scanline.mask == 1)
+
+
+def test_composite_overlap_and_holes():
+    """
+    Testing the overlap policies and even-odd holes of a composite.
+    """
+    square = [[0, 0], [0, 9], [9, 9], [9, 0]]
+    hole = [[3, 3], [3, 6], [6, 6], [6, 3]]
+    shifted = [[5, 5], [5, 14], [14, 14], [14, 5]]
+
+    last, _ = fill_composite([(1, [square, hole]), (2, [shifted])], shape=(20, 20))
+    first, _ = fill_composite(
+        [(1, [square, hole]), (2, [shifted])], shape=(20, 20), overlap="first"
+    )
+
+    assert last.mask.shape == (15, 15)
+    assert last.mask[4, 4] == 0 and last.mask[3, 3] == 1
+    assert last.mask[7, 7] == 2 and first.mask[7, 7] == 1
+    # the hole of the first region does not cover the second one
+    assert first.mask[5, 5] == 2
+    assert (last.mask == 2).sum() == 100
+
+
+def test_points_in_polygon_matches_point_in_polygons():
+    """
+    Testing that the vectorized point test gives the positions of the
+    reference point_in_polygons.
+    """
+    rng = np.random.default_rng(3)
+
+    for _ in range(50):
+        polygon = rng.integers(0, 20, (rng.integers(3, 9), 2)).astype(np.float64)
+        polygon[: rng.integers(0, 3)] += 0.5
+        points = rng.integers(-2, 22, (200, 2)).astype(np.float64)
+
+        positions = points_in_polygon(
+            polygon[:, 1], polygon[:, 0], points[:, 1], points[:, 0]
+        )
+        expected = [
+            point_in_polygons(polygon[:, 1], polygon[:, 0], column, row)
+            for row, column in points
+        ]
+
+        assert positions.tolist() == expected
+
+
+def test_chunked_matches_in_memory(tmp_path):
+    """
+    Testing that filling band by band into a disk-backed array gives the
+    mask of the in-memory fill.
+    """
+    rng = np.random.default_rng(4)
+    points = rng.integers(0, 60, (9, 2)).astype(np.float64)
+    points[:3] += 0.25
+
+    for algorithm in ["rourke", "fast", "scanline"]:
+        in_memory, _ = fill_polyline_cropped(
+            points, algorithm, shape=(50, 60), use_cache=False
+        )
+        chunked, _ = fill_polyline_chunked(
+            points,
+            algorithm,
+            lambda shape: np.lib.format.open_memmap(
+                tmp_path / f"{algorithm}.npy", "w+", np.uint8, shape
+            ),
+            (50, 60),
+            band_rows=7,
+        )
+        chunked.mask.flush()
+
+        assert chunked.offset == in_memory.offset
+        assert np.array_equal(np.load(tmp_path / f"{algorithm}.npy"), in_memory.mask)
+
+
+def test_parallel_fill_matches_serial(monkeypatch):
+    """
+    Testing that filling bands of rows on several threads gives the mask of
+    the serial fill.
+    """
+    monkeypatch.setattr(filling_service, "PARALLEL_FILL_PIXELS", 0)
+    threaded = []
+    fill_rows_parallel = filling_service.fill_rows_parallel
+
+    def record_parallel_fill(*args):
+        threaded.append(args)
+        return fill_rows_parallel(*args)
+
+    monkeypatch.setattr(filling_service, "fill_rows_parallel", record_parallel_fill)
+    rng = np.random.default_rng(7)
+
+    for _ in range(5):
+        points = rng.integers(0, 80, (11, 2)).astype(np.float64)
+        points[:4] += 0.5
+
+        for algorithm in ["rourke", "fast", "scanline"]:
+            serial, _ = fill_polyline_cropped(
+                points, algorithm, shape=(80, 80), use_cache=False, workers=1
+            )
+            parallel, _ = fill_polyline_cropped(
+                points, algorithm, shape=(80, 80), use_cache=False, workers=4
+            )
+
+            assert parallel.offset == serial.offset
+            assert np.array_equal(parallel.mask, serial.mask)
+
+    # rourke and fast hold the GIL, they are always filled by one thread
+    assert len(threaded) == 5
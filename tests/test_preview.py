@@ -0,0 +1,75 @@
+"""
+Preview rendering tests.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.services import preview_service
+from app.services.file_management import FILE_FORMATS, MaskFileRows
+from app.services.filling_service import fill_polyline_cropped
+from app.services.mask_encoding import encode_packed, encode_rle
+from app.services.preview_service import (
+    PREVIEW_MODES,
+    downsample_mask,
+    render_preview,
+)
+
+
+def test_downsample_max_and_mean():
+    """
+    Test block max and block mean downsampling.
+
+    1 1 0 0 0
+    1 0 0 0 0
+    0 0 0 0 0
+    """
+    mask = np.zeros((3, 5), dtype=np.uint8)
+    mask[0, 0:2] = 1
+    mask[1, 0] = 1
+
+    block_max = downsample_mask(mask, max_size=3, mode="max")
+    block_mean = downsample_mask(mask, max_size=3, mode="mean")
+
+    assert block_max.shape == (2, 3)
+    assert block_max.tolist() == [[255, 0, 0], [0, 0, 0]]
+    assert block_mean.tolist() == [[191, 0, 0], [0, 0, 0]]
+
+
+def test_render_preview_size():
+    """
+    Test that the PNG preview fits the maximum size.
+    """
+    mask = np.ones((1000, 250), dtype=np.uint8)
+    image = Image.open(io.BytesIO(render_preview(mask, max_size=100)))
+
+    assert image.size == (25, 100)
+    assert image.mode == "L"
+    assert np.asarray(image).min() == 255
+
+
+def test_downsample_stored_mask_in_bands(monkeypatch, tmp_path):
+    """
+    Test a stored mask read and downsampled a few rows at a time gives the
+    preview of the whole mask, in every storage format.
+    """
+    monkeypatch.setattr(preview_service, "PREVIEW_BAND_PIXELS", 200)
+    cropped, _ = fill_polyline_cropped(
+        [[3, 2], [90, 40], [50, 77], [10, 60]], "scanline", use_cache=False
+    )
+
+    for file_format in FILE_FORMATS:
+        path = tmp_path / f"mask{FILE_FORMATS[file_format]}"
+        if file_format == "npy":
+            np.save(path, cropped.mask)
+        elif file_format == "packed":
+            path.write_bytes(encode_packed(cropped))
+        else:
+            path.write_bytes(encode_rle(cropped))
+
+        for mode in PREVIEW_MODES:
+            assert np.array_equal(
+                downsample_mask(MaskFileRows(path), max_size=10, mode=mode),
+                downsample_mask(cropped.mask, max_size=10, mode=mode),
+            )
@@ -0,0 +1,70 @@
+"""
+Span list tests.
+"""
+import numpy as np
+
+from app.services.filling_service import fill_polyline_cropped
+from app.services.mask_encoding import decode_rle, encode_rle
+from app.services.span_list import (
+    SpanList,
+    decode_spans,
+    encode_spans,
+    fill_polyline_spans,
+    merge_spans,
+)
+
+
+def test_scanline_spans_match_mask():
+    """
+    Test the runs computed without a mask are the runs of the scanline mask,
+    for whole and fractional vertices partly off the canvas.
+    """
+    rng = np.random.default_rng(5)
+    shape = (60, 70)
+
+    for _ in range(20):
+        points = rng.uniform(-10, 80, (int(rng.integers(3, 12)), 2))
+        if rng.random() < 0.5:
+            points = np.round(points).astype(np.int64)
+
+        spans, _ = fill_polyline_spans(points, "scanline", shape)
+        cropped, _ = fill_polyline_cropped(
+            points, "scanline", shape=shape, use_cache=False
+        )
+
+        assert spans.offset == cropped.offset
+        assert np.array_equal(spans.runs, SpanList.from_cropped(cropped).runs)
+        assert np.array_equal(spans.to_dense(), cropped.to_dense())
+        assert spans.area() == int(cropped.mask.sum())
+        assert encode_spans(spans) == encode_rle(cropped)
+
+
+def test_span_conversions_and_queries():
+    """
+    Test converting spans from and to masks, the rle format and looking up
+    pixels.
+    """
+    nparr = np.zeros((10, 12), dtype=np.uint8)
+    nparr[2, 3:6] = 1
+    nparr[2, 8] = 1
+    nparr[5, 4:10] = 1
+
+    spans = SpanList.from_dense(nparr)
+    assert spans.offset == (2, 3)
+    assert spans.runs.tolist() == [[0, 0, 3], [0, 5, 6], [3, 1, 7]]
+    assert np.array_equal(spans.to_dense(), nparr)
+    assert spans.area() == 10
+
+    rows, columns = np.nonzero(np.ones_like(nparr))
+    assert np.array_equal(spans.contains(rows, columns), nparr[rows, columns] == 1)
+    assert not spans.contains([-1, 20], [3, 3]).any()
+
+    decoded = decode_spans(encode_spans(spans))
+    assert np.array_equal(decoded.runs, spans.runs)
+    assert np.array_equal(decode_rle(encode_spans(spans)).to_dense(), nparr)
+
+    # overlapping and touching spans are merged into one run
+    runs = merge_spans(
+        np.array([1, 0, 1, 1]), np.array([4, 2, 0, 2]), np.array([6, 3, 3, 4]), 8
+    )
+    assert runs.tolist() == [[0, 2, 3], [1, 0, 6]]
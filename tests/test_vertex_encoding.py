@@ -0,0 +1,66 @@
+"""
+Vertex encoding tests.
+"""
+import numpy as np
+import pytest
+
+from app.utils.vertex_encoding import (
+    decode_vertices_base64,
+    decode_vertices_binary,
+    decode_vertices_json,
+    decode_vertices_list,
+    encode_vertices,
+    encode_vertices_base64,
+)
+
+
+def test_vertex_round_trip():
+    """
+    Test all vertex sources decode to the same int32 array.
+    """
+    text = "[[10, 20], [30, 40], [50, 10]]"
+    points = decode_vertices_json(text)
+    data = encode_vertices(points)
+
+    assert points.dtype == np.dtype("<i4")
+    assert len(data) == 3 * 8
+    np.testing.assert_array_equal(decode_vertices_binary(data), points)
+    np.testing.assert_array_equal(
+        decode_vertices_base64(encode_vertices_base64(data)), points
+    )
+    np.testing.assert_array_equal(
+        decode_vertices_list([(10, 20), (30, 40), (50, 10)]), points
+    )
+
+
+def test_binary_vertices_are_not_copied():
+    """
+    Test raw vertex bytes are viewed in place.
+    """
+    data = np.arange(8, dtype="<i4").tobytes()
+    points = decode_vertices_binary(data)
+
+    assert points.shape == (4, 2)
+    assert not points.flags.writeable
+    assert points.base is not None
+
+
+def test_fractional_vertices():
+    """
+    Test fractional vertices keep their precision and are not stored as int32.
+    """
+    points = decode_vertices_json("[[1.5, 2], [3, 4], [5, 1]]")
+
+    assert points.dtype == np.float64
+    assert encode_vertices(points) is None
+
+
+@pytest.mark.parametrize(
+    "text", ["[]", "[[1, 2, 3]]", '[["a", "b"]]', "[[1, 2], [3]]", "[[1, NaN]]"]
+)
+def test_invalid_vertices(text):
+    """
+    Test malformed vertex lists are rejected.
+    """
+    with pytest.raises(ValueError):
+        decode_vertices_json(text)
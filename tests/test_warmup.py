@@ -0,0 +1,40 @@
+"""
+Lazy import and warm-up tests.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services.cost_model import ENGINES
+from app.services.warmup_service import warm_up
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_app_import_skips_engines_and_renderers():
+    """
+    Test importing the API does not load scikit-image nor Pillow.
+    """
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, main; print(sorted({'skimage', 'PIL'} & set(sys.modules)))",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+    assert output.strip() == "[]"
+
+
+def test_warm_up_runs_every_engine():
+    """
+    Test the warm-up fills with every engine and renders a preview.
+    """
+    timings = warm_up()
+
+    assert set(timings) == {*ENGINES, "preview"}
+    assert "skimage.draw" in sys.modules and "PIL.Image" in sys.modules